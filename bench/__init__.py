@@ -0,0 +1,3 @@
+"""
+Сценарии нагрузочного тестирования и бенчмарки eMoneyBot.
+"""
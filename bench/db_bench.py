@@ -0,0 +1,310 @@
+"""
+Микробенчмарки функций src/database.py на базе данных реального масштаба.
+
+База заполняется быстрым генератором (одна транзакция, executemany без индексов
+и триггеров, которые затем создает init_db), после чего каждая публичная функция
+вызывается несколько раз. Результат сохраняется в JSON, чтобы сравнивать прогоны
+до и после изменений индексов, PRAGMA и работы с подключениями.
+
+Запуск:
+    python -m bench.db_bench --db /tmp/bench.db --json before.json
+    python -m bench.db_bench --db /tmp/bench.db --json after.json --baseline before.json
+
+Заполненная база переиспользуется между прогонами (--reseed создает ее заново).
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Тексты обращений берутся из небольшого набора, чтобы генерация не тормозила заполнение
+TEXTS = (
+    "Все отлично, спасибо!",
+    "Долго ждал ответа оператора, но вопрос решили.",
+    "Подскажите, как изменить реквизиты для вывода средств?",
+    "Почему комиссия отличается от указанной на сайте?",
+    "Удобный бот, пользуюсь каждый день.",
+)
+RESPONSES = ("Спасибо за отзыв!", "Ответили вам в личные сообщения.", None)
+YEAR = 365 * 24 * 3600
+
+
+# =============================================
+# Заполнение базы данных
+# =============================================
+def _users(count: int) -> Iterator[Tuple]:
+    for user_id in range(1, count + 1):
+        yield user_id, f"user{user_id}", 0, 0, None
+
+
+def _items(rng: random.Random, count: int, users: int, answered: float, rating: bool) -> Iterator[Tuple]:
+    now = int(time.time())
+    for _ in range(count):
+        user_id = rng.randint(1, users)
+        response = rng.choice(RESPONSES[:-1]) if rng.random() < answered else None
+        row = (user_id, f"user{user_id}", rng.choice(TEXTS), response, now - rng.randrange(YEAR))
+        yield (row[:2] + (rng.randint(1, 5),) + row[2:]) if rating else row
+
+
+def seed_database(path: str, users: int, reviews: int, questions: int, answered: float, seed: int) -> float:
+    """
+    Заполняет базу данных пользователями, отзывами и вопросами.
+    Схема создается init_db. Перед вставкой индексы, триггеры и таблица счетчиков
+    удаляются, а после нее повторный init_db создает их заново и заполняет user_stats
+    одним запросом - так вставка не обновляет индексы и счетчики на каждой строке.
+
+    Args:
+        path (str): Путь к файлу базы данных
+        users (int): Число пользователей
+        reviews (int): Число отзывов
+        questions (int): Число вопросов
+        answered (float): Доля обращений с ответом администратора
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        float: Время заполнения в секундах
+    """
+    from src.database import database_path, init_db
+
+    started = time.perf_counter()
+    path_token = database_path.set(path)
+    asyncio.run(init_db())
+
+    rng = random.Random(seed)
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("PRAGMA synchronous = OFF")
+    objects = db.execute(
+        "SELECT type, name FROM sqlite_master "
+        "WHERE type IN ('index', 'trigger') AND name NOT LIKE 'sqlite_autoindex%'"
+    ).fetchall()
+    db.execute("BEGIN")
+    for kind, name in objects:
+        db.execute(f"DROP {kind.upper()} {name}")
+    db.execute("DROP TABLE user_stats")
+    db.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?)", _users(users))
+    db.executemany(
+        "INSERT INTO reviews (user_id, username, rating, review_text, admin_response, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        _items(rng, reviews, users, answered, rating=True)
+    )
+    db.executemany(
+        "INSERT INTO questions (user_id, username, question_text, admin_response, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        _items(rng, questions, users, answered, rating=False)
+    )
+    db.execute("COMMIT")
+    db.close()
+
+    asyncio.run(init_db())
+    database_path.reset(path_token)
+    return time.perf_counter() - started
+
+
+# =============================================
+# Замеры
+# =============================================
+class Case:
+    """Один замер: имя и фабрика вызова функции базы данных"""
+
+    def __init__(self, name: str, call: Callable[[int], Awaitable[Any]], repeat: int) -> None:
+        """
+        Args:
+            name (str): Имя замера в отчете
+            call (Callable): Принимает номер повтора и возвращает корутину для замера
+            repeat (int): Число повторов
+        """
+        self.name = name
+        self.call = call
+        self.repeat = repeat
+
+
+def build_cases(args: argparse.Namespace) -> List[Case]:
+    from src import database
+    from src.quota import SubmissionQuota, build_policies, review_quota
+    from src.config import REVIEW_QUOTAS
+
+    rng = random.Random(args.seed + 1)
+    user = lambda i: rng.randint(1, args.users)
+    review = lambda i: rng.randint(1, args.reviews)
+    question = lambda i: rng.randint(1, args.questions)
+    new_user = lambda i: args.users + 1 + i
+    repeat, heavy = args.repeat, args.heavy_repeat
+
+    # Квота без кэша: каждая проверка читает время отзывов из базы данных
+    cold_quota = SubmissionQuota(build_policies(REVIEW_QUOTAS), database.get_recent_review_times, 1)
+
+    return [
+        Case("get_user", lambda i: database.get_user(user(i)), repeat),
+        Case("add_user", lambda i: database.add_user(new_user(i), f"bench{i}"), repeat),
+        Case("get_admin_ids", lambda i: database.get_admin_ids(), repeat),
+        Case("ban_user", lambda i: database.ban_user(new_user(i), "bench"), repeat),
+        Case("unban_user", lambda i: database.unban_user(new_user(i)), repeat),
+        Case("check_super_admin", lambda i: database.check_super_admin(), repeat),
+        Case("get_recent_review_times", lambda i: database.get_recent_review_times(user(i), 1), repeat),
+        Case("review_quota.allows(cold)", lambda i: cold_quota.allows(user(i)), repeat),
+        Case("review_quota.allows(warm)", lambda i: review_quota.allows(i % 10 + 1), repeat),
+        Case("get_user_stats", lambda i: database.get_user_stats(user(i)), repeat),
+        Case("has_reviews_with_responses", lambda i: database.has_reviews_with_responses(user(i)), repeat),
+        Case("has_questions_with_responses", lambda i: database.has_questions_with_responses(user(i)), repeat),
+        Case("get_user_reviews", lambda i: database.get_user_reviews(user(i)), repeat),
+        Case("get_user_reviews(with_responses)",
+             lambda i: database.get_user_reviews(user(i), with_responses_only=True), repeat),
+        Case("get_user_questions", lambda i: database.get_user_questions(user(i)), repeat),
+        Case("get_user_questions(with_responses)",
+             lambda i: database.get_user_questions(user(i), with_responses_only=True), repeat),
+        Case("get_review_by_id", lambda i: database.get_review_by_id(review(i)), repeat),
+        Case("get_questions_by_id", lambda i: database.get_questions_by_id(question(i)), repeat),
+        Case("create_review", lambda i: database.create_review(user(i), "bench", 5, "bench"), repeat),
+        Case("create_question", lambda i: database.create_question(user(i), "bench", "bench?"), repeat),
+        Case("add_review_response", lambda i: database.add_review_response(review(i), "bench"), repeat),
+        Case("add_question_response", lambda i: database.add_question_response(question(i), "bench"), repeat),
+        Case("claim_reply", lambda i: database.claim_reply("reviews", review(i), 1, 600), repeat),
+        Case("release_reply_claim", lambda i: database.release_reply_claim("reviews", review(i), 1), repeat),
+        Case("get_all_reviews(without_answers)", lambda i: database.get_all_reviews("without_answers"), heavy),
+        Case("get_all_questions(without_answers)", lambda i: database.get_all_questions("without_answers"), heavy),
+        Case("get_all_reviews(all)", lambda i: database.get_all_reviews("all"), heavy),
+        Case("get_all_questions(all)", lambda i: database.get_all_questions("all"), heavy),
+    ]
+
+
+async def run_case(case: Case) -> Dict[str, Any]:
+    timings: List[float] = []
+    rows = None
+    for i in range(case.repeat):
+        started = time.perf_counter()
+        result = await case.call(i)
+        timings.append(time.perf_counter() - started)
+        if isinstance(result, list):
+            rows = len(result)
+
+    timings.sort()
+    report = {
+        "repeat": case.repeat,
+        "min_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+    }
+    if rows is not None:
+        report["rows"] = rows
+    return report
+
+
+def environment(path: str) -> Dict[str, Any]:
+    db = sqlite3.connect(path)
+    pragmas = {
+        name: db.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in ("journal_mode", "synchronous", "page_size", "cache_size", "mmap_size")
+    }
+    indexes = [row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex%' ORDER BY name"
+    )]
+    db.close()
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "pragmas": pragmas,
+        "indexes": indexes,
+        "db_size_bytes": os.path.getsize(path),
+    }
+
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    previous = (baseline or {}).get("results", {})
+    width = max(len(name) for name in results)
+    header = f"{'function'.ljust(width)}  {'median ms':>10}  {'p95 ms':>10}  {'rows':>8}"
+    print(header + ("  {:>8}".format("vs base") if previous else ""))
+    for name, result in results.items():
+        line = (
+            f"{name.ljust(width)}  {result['median_ms']:>10.3f}  {result['p95_ms']:>10.3f}  "
+            f"{str(result.get('rows', '')):>8}"
+        )
+        if name in previous and previous[name]["median_ms"]:
+            line += f"  {result['median_ms'] / previous[name]['median_ms']:>7.2f}x"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк функций базы данных eMoneyBot")
+    parser.add_argument("--db", default="data/bench.db", help="файл базы данных для бенчмарка")
+    parser.add_argument("--reseed", action="store_true", help="заполнить базу заново")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--answered", type=float, default=0.95, help="доля обращений с ответом")
+    parser.add_argument("--repeat", type=int, default=200, help="повторов для точечных запросов")
+    parser.add_argument("--heavy-repeat", type=int, default=3, help="повторов для выборок всех обращений")
+    parser.add_argument("--only", help="замерять только функции, имя которых содержит подстроку")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="сохранить результат в JSON-файл")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    # Настройки читаются src/config.py при импорте, поэтому задаются до импорта src.database
+    os.environ.setdefault("SLOW_QUERY_MS", "1000000")
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    seed_time = None
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    if not os.path.exists(args.db):
+        print(f"Заполнение {args.db}: {args.users} пользователей, {args.reviews} отзывов, {args.questions} вопросов...")
+        seed_time = seed_database(args.db, args.users, args.reviews, args.questions, args.answered, args.seed)
+        print(f"Заполнено за {seed_time:.1f} с")
+
+    # Бенчмарк меняет данные, поэтому замеры идут на копии заполненной базы
+    work_path = args.db + ".run"
+    with sqlite3.connect(args.db) as source, sqlite3.connect(work_path) as target:
+        source.backup(target)
+
+    from src.database import database_path
+    database_path.set(work_path)
+
+    async def run_all() -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for case in build_cases(args):
+            if args.only and args.only not in case.name:
+                continue
+            results[case.name] = await run_case(case)
+        return results
+
+    try:
+        results = asyncio.run(run_all())
+        env = environment(work_path)
+    finally:
+        os.remove(work_path)
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "parameters": vars(args),
+        "seed_time_sec": round(seed_time, 2) if seed_time is not None else None,
+        "environment": env,
+        "results": results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Бенчмарк выгрузки отзывов и вопросов в Excel (src/admin/admin_utils.py).
+
+Для каждого размера набора данных заполняется отдельная база (bench/db_bench.py),
+и export_reviews_excel / export_questions_excel вызываются так же, как из меню
+администратора: запросы к Bot API уходят в локальный имитатор (bench/fake_api.py),
+который считает размер полученного документа.
+
+Каждый замер выполняется в отдельном процессе, чтобы пиковый RSS не накапливался
+между замерами. Записываются время выполнения, пик памяти Python (tracemalloc),
+пиковый RSS процесса, размер файла и число байт, полученных имитатором.
+
+Запуск (из корня репозитория, где лежит каталог templates/):
+    python -m bench.export_bench --sizes 10000 100000 1000000 --json export.json
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+BOT_TOKEN = "123456:EXPORTBENCH"
+ADMIN_ID = 1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss в Linux измеряется в килобайтах, в macOS - в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+# =============================================
+# Один замер (выполняется в отдельном процессе)
+# =============================================
+async def measure_export(db_path: str, kind: str, trace_memory: bool) -> Dict[str, Any]:
+    """
+    Выполняет одну выгрузку и измеряет ее.
+
+    Args:
+        db_path (str): Путь к заполненной базе данных
+        kind (str): Что выгружать ('reviews' или 'questions')
+        trace_memory (bool): Включать ли tracemalloc (замедляет выгрузку)
+
+    Returns:
+        Dict[str, Any]: Результаты замера
+    """
+    from aiogram import types
+    from bench.fake_api import FaultConfig, start_fake_api
+    from src.admin.admin_utils import export_questions_excel, export_reviews_excel
+    from src.app import AppConfig, create_app
+    from src.database import database_path
+
+    port = _free_port()
+    api, runner = await start_fake_api("127.0.0.1", port, FaultConfig())
+    app = create_app(AppConfig(
+        token=BOT_TOKEN,
+        database_path=db_path,
+        super_admin_id=0,
+        api_server=f"http://127.0.0.1:{port}",
+        record_path=None
+    ))
+    bot = app.bot
+    # Выгрузка вызывается напрямую, а не через диспетчер, поэтому базу задаем сами
+    database_path.set(db_path)
+    try:
+        # Выгрузка редактирует сообщение с кнопкой, поэтому оно должно существовать
+        menu = await bot.send_message(ADMIN_ID, "bench")
+        callback = types.CallbackQuery.model_validate(
+            {
+                "id": "1",
+                "from": {"id": ADMIN_ID, "is_bot": False, "first_name": "admin"},
+                "chat_instance": "1",
+                "data": f"admin_export_{kind}_excel",
+                "message": menu.model_dump(by_alias=True, exclude_none=True),
+            },
+            context={"bot": bot}
+        )
+        export = export_reviews_excel if kind == "reviews" else export_questions_excel
+
+        exports_before = set(os.listdir("exports")) if os.path.isdir("exports") else set()
+        rss_before = _max_rss_bytes()
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await export(callback)
+        wall_time = time.perf_counter() - started
+        python_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        tracemalloc.stop()
+
+        created = sorted(set(os.listdir("exports")) - exports_before)
+        file_size = sum(os.path.getsize(os.path.join("exports", name)) for name in created)
+        return {
+            "wall_time_sec": round(wall_time, 3),
+            "tracemalloc_peak_bytes": python_peak,
+            "max_rss_bytes": _max_rss_bytes(),
+            "max_rss_growth_bytes": _max_rss_bytes() - rss_before,
+            "file_size_bytes": file_size,
+            "bytes_sent_to_api": api.stats()["bytes_received"],
+            "files": [os.path.join("exports", name) for name in created],
+        }
+    finally:
+        await app.close()
+        await runner.cleanup()
+
+
+def worker(args: argparse.Namespace) -> None:
+    """Точка входа дочернего процесса: заполняет базу при необходимости и делает один замер"""
+    os.environ["SLOW_QUERY_MS"] = "1000000"
+
+    seed_time = None
+    if not os.path.exists(args.db):
+        from bench.db_bench import seed_database
+        seed_time = seed_database(args.db, min(10_000, args.rows), args.rows, args.rows, 0.95, args.seed)
+
+    result = asyncio.run(measure_export(args.db, args.kind, not args.no_tracemalloc))
+    result["seed_time_sec"] = round(seed_time, 2) if seed_time is not None else None
+    if not args.keep:
+        for path in result["files"]:
+            os.remove(path)
+    print(json.dumps(result))
+
+
+# =============================================
+# Запуск замеров
+# =============================================
+def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for rows in args.sizes:
+        db_path = os.path.join(args.data_dir, f"export_{rows}.db")
+        for kind in args.kinds:
+            command = [
+                sys.executable, "-m", "bench.export_bench", "--worker",
+                "--db", db_path, "--rows", str(rows), "--kind", kind, "--seed", str(args.seed),
+            ]
+            if args.no_tracemalloc:
+                command.append("--no-tracemalloc")
+            if args.keep:
+                command.append("--keep")
+            print(f"Выгрузка {kind}: {rows} строк...", flush=True)
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(completed.stderr, file=sys.stderr)
+                results.append({"kind": kind, "rows": rows, "error": completed.stderr.strip().splitlines()[-1:]})
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append({"kind": kind, "rows": rows, **result})
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    mb = 1024 * 1024
+    print(f"{'kind':>10}  {'rows':>8}  {'time s':>8}  {'py peak MB':>10}  {'max RSS MB':>10}  {'file MB':>8}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['kind']:>10}  {result['rows']:>8}  ошибка: {result['error']}")
+            continue
+        peak = result["tracemalloc_peak_bytes"]
+        peak_text = f"{peak / mb:.1f}" if peak is not None else "-"
+        print(
+            f"{result['kind']:>10}  {result['rows']:>8}  {result['wall_time_sec']:>8.2f}  {peak_text:>10}  "
+            f"{result['max_rss_bytes'] / mb:>10.1f}  {result['file_size_bytes'] / mb:>8.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк выгрузки в Excel")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="число отзывов и вопросов в наборах данных")
+    parser.add_argument("--kinds", nargs="+", default=["reviews", "questions"], choices=["reviews", "questions"])
+    parser.add_argument("--data-dir", default="data/export_bench", help="каталог для заполненных баз")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="не включать tracemalloc (время без накладных расходов трассировки)")
+    parser.add_argument("--keep", action="store_true", help="не удалять созданные файлы выгрузки")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="сохранить результат в JSON-файл")
+    # Параметры дочернего процесса
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--kind", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = run(args)
+    print_results(results)
+    if args.json:
+        report = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("worker", "db", "rows", "kind")},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
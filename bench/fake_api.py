@@ -0,0 +1,385 @@
+"""
+Локальный имитатор Telegram Bot API для нагрузочного тестирования без обращения к Telegram.
+
+Запуск:
+    python -m bench.fake_api --port 8081 --latency-ms 30 --jitter-ms 20 --rate-limit 0.01
+
+Бот подключается к имитатору через переменную окружения
+TELEGRAM_API_SERVER=http://127.0.0.1:8081.
+
+Служебные адреса имитатора:
+    POST /_fake/bot{token}/updates - добавить обновления (JSON-объект или список) в очередь getUpdates
+    GET  /_fake/stats              - количество вызовов, 429 и ошибок по методам (JSON)
+    POST /_fake/reset              - сбросить очереди, сообщения и статистику
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiohttp import web
+
+
+@dataclass
+class FaultConfig:
+    """Настройки задержек и ошибок, которые имитатор добавляет к ответам"""
+    latency_ms: float = 0.0      # Базовая задержка ответа
+    jitter_ms: float = 0.0       # Случайная добавка к задержке (0..jitter_ms)
+    rate_limit: float = 0.0      # Доля запросов, получающих 429 Too Many Requests
+    retry_after: int = 1         # retry_after в ответах 429 (секунды)
+    error_rate: float = 0.0      # Доля запросов, получающих 500 Internal Server Error
+    seed: Optional[int] = None   # Зерно генератора для воспроизводимых прогонов
+
+
+class FakeBotApi:
+    """
+    Имитатор Bot API: хранит очереди обновлений и отправленные сообщения
+    для каждого токена и отвечает на запросы в формате Telegram.
+    """
+
+    def __init__(self, faults: FaultConfig) -> None:
+        """
+        Args:
+            faults (FaultConfig): Настройки задержек и ошибок
+        """
+        self.faults = faults
+        self.random = random.Random(faults.seed)
+        self._updates: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        # (токен, chat_id) -> {message_id: (текст, клавиатура)}
+        self._messages: Dict[Tuple[str, int], Dict[int, Tuple[str, Optional[str]]]] = defaultdict(dict)
+        self._next_message_id: Dict[Tuple[str, int], int] = defaultdict(lambda: 1)
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.bytes_received = 0
+        self.handlers = {
+            "getMe": self.get_me,
+            "getUpdates": self.get_updates,
+            "deleteWebhook": self.return_true,
+            "sendMessage": self.send_message,
+            "editMessageText": self.edit_message_text,
+            "editMessageReplyMarkup": self.edit_message_reply_markup,
+            "deleteMessage": self.delete_message,
+            "deleteMessages": self.delete_messages,
+            "answerCallbackQuery": self.return_true,
+            "sendDocument": self.send_document,
+        }
+
+    # =============================================
+    # Служебные операции
+    # =============================================
+    def push_updates(self, token: str, updates: List[Dict[str, Any]]) -> None:
+        """
+        Добавляет обновления в очередь getUpdates бота.
+
+        Args:
+            token (str): Токен бота
+            updates (List[Dict[str, Any]]): Обновления в формате Bot API
+        """
+        queue = self._updates[token]
+        for update in updates:
+            queue.put_nowait(update)
+
+    def find_message(
+        self,
+        token: str,
+        chat_id: int,
+        prefix: str = ""
+    ) -> Optional[Tuple[int, Optional[str], List[str]]]:
+        """
+        Ищет последнее сообщение бота в чате, у которого есть кнопка
+        с callback_data, начинающимся с prefix (для сценариев, нажимающих кнопки).
+        Без prefix возвращает просто последнее сообщение.
+
+        Args:
+            token (str): Токен бота
+            chat_id (int): ID чата
+            prefix (str): Начало callback_data нужной кнопки
+
+        Returns:
+            Tuple[int, str, List[str]]: ID сообщения, текст и callback_data всех кнопок
+            или None, если подходящего сообщения нет
+        """
+        messages = self._messages.get((token, chat_id)) or {}
+        for message_id in sorted(messages, reverse=True):
+            text, markup = messages[message_id]
+            buttons = []
+            if markup:
+                for row in json.loads(markup).get("inline_keyboard", []):
+                    buttons.extend(button["callback_data"] for button in row if button.get("callback_data"))
+            if not prefix or any(data.startswith(prefix) for data in buttons):
+                return message_id, text, buttons
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "rate_limited": dict(self.rate_limited),
+            "errors": dict(self.errors),
+            "bytes_received": self.bytes_received,
+            "pending_updates": {token[:8]: queue.qsize() for token, queue in self._updates.items()},
+        }
+
+    def reset(self) -> None:
+        self._updates.clear()
+        self._messages.clear()
+        self._next_message_id.clear()
+        self.calls.clear()
+        self.rate_limited.clear()
+        self.errors.clear()
+        self.bytes_received = 0
+
+    # =============================================
+    # Методы Bot API
+    # =============================================
+    @staticmethod
+    def _bot_id(token: str) -> int:
+        return int(token.split(":", 1)[0])
+
+    def _message(self, token: str, chat_id: int, message_id: int, text: Optional[str], **extra) -> Dict[str, Any]:
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": self._bot_id(token), "is_bot": True, "first_name": "FakeBot"},
+        }
+        if text is not None:
+            message["text"] = text
+        message.update(extra)
+        return message
+
+    def _store_message(self, token: str, chat_id: int, text: Optional[str], markup: Optional[str]) -> int:
+        key = (token, chat_id)
+        message_id = self._next_message_id[key]
+        self._next_message_id[key] = message_id + 1
+        self._messages[key][message_id] = (text, markup)
+        return message_id
+
+    async def return_true(self, token: str, params: Dict[str, Any]) -> Any:
+        return True
+
+    async def get_me(self, token: str, params: Dict[str, Any]) -> Any:
+        return {
+            "id": self._bot_id(token),
+            "is_bot": True,
+            "first_name": "FakeBot",
+            "username": f"fake_{self._bot_id(token)}_bot",
+        }
+
+    async def get_updates(self, token: str, params: Dict[str, Any]) -> Any:
+        queue = self._updates[token]
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        offset = int(params.get("offset") or 0)
+        updates = []
+        if queue.empty() and timeout:
+            # Длинный опрос: ждем первое обновление не дольше timeout
+            try:
+                updates.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                return []
+        while not queue.empty() and len(updates) < limit:
+            updates.append(queue.get_nowait())
+        return [update for update in updates if update["update_id"] >= offset]
+
+    async def send_message(self, token: str, params: Dict[str, Any]) -> Any:
+        chat_id = int(params["chat_id"])
+        text = params.get("text")
+        message_id = self._store_message(token, chat_id, text, params.get("reply_markup"))
+        return self._message(token, chat_id, message_id, text)
+
+    async def edit_message_text(self, token: str, params: Dict[str, Any]) -> Any:
+        chat_id, message_id = int(params["chat_id"]), int(params["message_id"])
+        messages = self._messages[(token, chat_id)]
+        if message_id not in messages:
+            raise FakeApiError(400, "Bad Request: message to edit not found")
+        new = (params.get("text"), params.get("reply_markup"))
+        if messages[message_id] == new:
+            raise FakeApiError(
+                400,
+                "Bad Request: message is not modified: specified new message content and reply markup "
+                "are exactly the same as a current content and reply markup of the message"
+            )
+        messages[message_id] = new
+        return self._message(token, chat_id, message_id, new[0])
+
+    async def edit_message_reply_markup(self, token: str, params: Dict[str, Any]) -> Any:
+        chat_id, message_id = int(params["chat_id"]), int(params["message_id"])
+        messages = self._messages[(token, chat_id)]
+        if message_id not in messages:
+            raise FakeApiError(400, "Bad Request: message to edit not found")
+        text = messages[message_id][0]
+        messages[message_id] = (text, params.get("reply_markup"))
+        return self._message(token, chat_id, message_id, text)
+
+    async def delete_message(self, token: str, params: Dict[str, Any]) -> Any:
+        messages = self._messages[(token, int(params["chat_id"]))]
+        if messages.pop(int(params["message_id"]), None) is None:
+            raise FakeApiError(400, "Bad Request: message to delete not found")
+        return True
+
+    async def delete_messages(self, token: str, params: Dict[str, Any]) -> Any:
+        messages = self._messages[(token, int(params["chat_id"]))]
+        for message_id in json.loads(params["message_ids"]):
+            messages.pop(int(message_id), None)
+        return True
+
+    async def send_document(self, token: str, params: Dict[str, Any]) -> Any:
+        chat_id = int(params["chat_id"])
+        document = params.get("document")
+        if isinstance(document, str) and document.startswith("attach://"):
+            # Файл передан отдельной частью multipart-запроса
+            document = params.get(document[len("attach://"):])
+        size = len(document.file.read()) if isinstance(document, web.FileField) else 0
+        self.bytes_received += size
+        message_id = self._store_message(token, chat_id, None, params.get("reply_markup"))
+        file_name = document.filename if isinstance(document, web.FileField) else "document"
+        return self._message(
+            token, chat_id, message_id, None,
+            caption=params.get("caption"),
+            document={
+                "file_id": f"fake-{chat_id}-{message_id}",
+                "file_unique_id": f"fake-{chat_id}-{message_id}",
+                "file_name": file_name,
+                "file_size": size,
+            }
+        )
+
+    # =============================================
+    # HTTP
+    # =============================================
+    async def handle_method(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        method = request.match_info["method"]
+        self.calls[method] += 1
+
+        handler = self.handlers.get(method)
+        if handler is None:
+            return _error(404, "Not Found: method not found")
+
+        params: Dict[str, Any] = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+
+        # getUpdates - длинный опрос, искусственные задержки и ошибки к нему не применяются
+        if method != "getUpdates":
+            delay = self.faults.latency_ms + self.random.random() * self.faults.jitter_ms
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            roll = self.random.random()
+            if roll < self.faults.rate_limit:
+                self.rate_limited[method] += 1
+                return _error(
+                    429,
+                    f"Too Many Requests: retry after {self.faults.retry_after}",
+                    parameters={"retry_after": self.faults.retry_after}
+                )
+            if roll < self.faults.rate_limit + self.faults.error_rate:
+                self.errors[method] += 1
+                return _error(500, "Internal Server Error")
+
+        try:
+            result = await handler(token, params)
+        except FakeApiError as e:
+            self.errors[method] += 1
+            return _error(e.code, e.description)
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_push(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.push_updates(request.match_info["token"], payload if isinstance(payload, list) else [payload])
+        return web.json_response({"ok": True})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({"ok": True})
+
+    def make_app(self) -> web.Application:
+        """
+        Создает aiohttp-приложение имитатора.
+
+        Returns:
+            web.Application: Приложение с адресами Bot API и служебными адресами
+        """
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/_fake/bot{token}/updates", self.handle_push)
+        app.router.add_get("/_fake/stats", self.handle_stats)
+        app.router.add_post("/_fake/reset", self.handle_reset)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        return app
+
+
+class FakeApiError(Exception):
+    """Ошибка Bot API, которую имитатор возвращает клиенту"""
+
+    def __init__(self, code: int, description: str) -> None:
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+def _error(code: int, description: str, parameters: Optional[Dict[str, Any]] = None) -> web.Response:
+    payload: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        payload["parameters"] = parameters
+    return web.json_response(payload, status=code)
+
+
+async def start_fake_api(host: str, port: int, faults: FaultConfig) -> Tuple[FakeBotApi, web.AppRunner]:
+    """
+    Запускает имитатор в текущем цикле событий (для использования из других сценариев).
+
+    Args:
+        host (str): Адрес для прослушивания
+        port (int): Порт для прослушивания
+        faults (FaultConfig): Настройки задержек и ошибок
+
+    Returns:
+        Tuple[FakeBotApi, web.AppRunner]: Имитатор и запущенный сервер (остановка через cleanup())
+    """
+    api = FakeBotApi(faults)
+    runner = web.AppRunner(api.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return api, runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальный имитатор Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="базовая задержка ответа")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="случайная добавка к задержке")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответах 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"Имитатор Bot API: http://{args.host}:{args.port}")
+    web.run_app(FakeBotApi(faults).make_app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
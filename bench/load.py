@@ -0,0 +1,334 @@
+"""
+Нагрузочный сценарий: тысячи виртуальных пользователей и администраторов
+проходят основные сценарии бота через настоящий диспетчер (create_app, src/app.py).
+Исходящие запросы бота уходят в локальный имитатор Bot API (bench/fake_api.py),
+база данных создается заново во временном файле.
+
+Запуск:
+    python -m bench.load --users 2000 --admins 10 --latency-ms 30 --json load.json
+
+Отчет по каждому сценарию: число обновлений, пропускная способность,
+p50/p95/p99 задержки обработки обновления, среднее число запросов к базе данных
+и к Bot API на одно обновление.
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram.types import Update
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.tracing import current_trace
+from bench.fake_api import FakeBotApi, FaultConfig, start_fake_api
+
+if TYPE_CHECKING:
+    from src.app import App
+
+BOT_TOKEN = "123456:LOADTEST"
+ADMIN_ID_BASE = 900_000_000
+USER_ID_BASE = 100_000_000
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Возвращает перцентиль по методу ближайшего ранга.
+
+    Args:
+        values (List[float]): Отсортированные значения
+        fraction (float): Доля от 0 до 1 (например, 0.95)
+
+    Returns:
+        float: Значение перцентиля (0, если значений нет)
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class FlowStats:
+    """Статистика обновлений одного сценария"""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.db_calls = 0
+        self.api_calls = 0
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def report(self, wall_time: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "updates": count,
+            "errors": sum(self.errors.values()),
+            "error_types": dict(self.errors),
+            "throughput_per_sec": round(count / wall_time, 1) if wall_time else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "db_calls_per_update": round(self.db_calls / count, 2) if count else 0.0,
+            "api_calls_per_update": round(self.api_calls / count, 2) if count else 0.0,
+        }
+
+
+class LoadTest:
+    """
+    Подает обновления в диспетчер бота от имени виртуальных пользователей
+    и собирает задержки и трассировки каждого обновления.
+    """
+
+    def __init__(self, app: "App", api: FakeBotApi, think_ms: float, seed: int) -> None:
+        """
+        Args:
+            app (App): Собранный экземпляр бота
+            api (FakeBotApi): Запущенный имитатор Bot API
+            think_ms (float): Пауза виртуального пользователя между действиями
+            seed (int): Зерно генератора случайных чисел
+        """
+        self.app = app
+        self.api = api
+        self.think = think_ms / 1000
+        self.random = random.Random(seed)
+        self.update_ids = itertools.count(1)
+        self.flows: Dict[str, FlowStats] = defaultdict(FlowStats)
+        self._traces: Dict[int, Any] = {}
+
+    # =============================================
+    # Отправка обновлений
+    # =============================================
+    def collect_trace(self, handler, event, data):
+        """Внешний middleware, сохраняющий трассировку обновления для отчета"""
+        trace = current_trace.get()
+        if trace is not None:
+            self._traces[event.update_id] = trace
+        return handler(event, data)
+
+    async def _feed(self, flow: str, payload: Dict[str, Any]) -> None:
+        update_id = next(self.update_ids)
+        update = Update.model_validate({"update_id": update_id, **payload})
+        stats = self.flows[flow]
+        started = time.perf_counter()
+        try:
+            await self.app.dp.feed_update(self.app.bot, update)
+        except Exception as e:
+            stats.errors[type(e).__name__] += 1
+        stats.latencies.append(time.perf_counter() - started)
+
+        trace = self._traces.pop(update_id, None)
+        if trace is not None:
+            for span in trace.spans:
+                if span["name"].startswith("db."):
+                    stats.db_calls += 1
+                elif span["name"].startswith("api."):
+                    stats.api_calls += 1
+        if self.think:
+            await asyncio.sleep(self.think * (0.5 + self.random.random()))
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    async def send_text(self, flow: str, user_id: int, text: str) -> None:
+        await self._feed(flow, {"message": {
+            "message_id": next(self.update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }})
+
+    async def click(self, flow: str, user_id: int, data: str) -> None:
+        # Нажимаем кнопку в том сообщении, где она есть: после ответа
+        # администратора последним может оказаться уведомление
+        last = self.api.find_message(BOT_TOKEN, user_id, data) or self.api.find_message(BOT_TOKEN, user_id)
+        message_id = last[0] if last else 1
+        await self._feed(flow, {"callback_query": {
+            "id": str(next(self.update_ids)),
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": self.app.bot.id, "is_bot": True, "first_name": "FakeBot"},
+                "text": last[1] if last and last[1] else "-",
+            },
+        }})
+
+    def buttons(self, user_id: int, prefix: str) -> List[str]:
+        last = self.api.find_message(BOT_TOKEN, user_id, prefix)
+        return [data for data in (last[2] if last else []) if data.startswith(prefix)]
+
+    # =============================================
+    # Сценарии пользователей
+    # =============================================
+    async def user_session(self, user_id: int, iterations: int) -> None:
+        await self.send_text("start", user_id, "/start")
+        for _ in range(iterations):
+            # Отзыв: оценка и текст
+            await self.click("review", user_id, "leave_review")
+            await self.click("review", user_id, f"rating_{self.random.randint(1, 5)}")
+            await self.send_text("review", user_id, f"Отзыв пользователя {user_id}")
+
+            # Вопрос
+            await self.click("question", user_id, "ask_question")
+            await self.send_text("question", user_id, f"Вопрос пользователя {user_id}?")
+
+            # История с сортировкой и листанием страниц
+            history_type = self.random.choice(("reviews", "questions"))
+            await self.click("history", user_id, "my_reviews")
+            await self.click("history", user_id, f"history_{history_type}")
+            await self.click("history", user_id, f"filter_all_{history_type}")
+            await self.click("history", user_id, f"sort_{self.random.choice(('new', 'old'))}_{history_type}_all")
+            for page in self.buttons(user_id, "page_")[:2]:
+                await self.click("history", user_id, page)
+            await self.click("history", user_id, "back_to_main")
+
+    async def admin_session(self, admin_id: int, iterations: int) -> None:
+        await self.send_text("admin_start", admin_id, "/start")
+        for _ in range(iterations):
+            history_type = self.random.choice(("reviews", "questions"))
+            await self.click("admin_history", admin_id, f"admin_history_{history_type}")
+            await self.click("admin_history", admin_id, f"admin_show_all_{history_type}_without_answers")
+            await self.click("admin_history", admin_id, f"admin_sort_new_{history_type}_without_answers")
+            for _ in range(3):
+                pages = self.buttons(admin_id, "admin_page_")
+                if not pages:
+                    break
+                await self.click("admin_history", admin_id, pages[-1])
+
+            # Ответ на текущее обращение
+            replies = self.buttons(admin_id, "admin_reply_")
+            if replies:
+                await self.click("admin_reply", admin_id, replies[0])
+                await self.send_text("admin_reply", admin_id, f"Ответ администратора {admin_id}")
+            await self.click("admin_history", admin_id, "back_to_main")
+
+
+async def seed_admins(database_path: str, admins: int) -> None:
+    import aiosqlite
+    async with aiosqlite.connect(database_path) as db:
+        await db.executemany(
+            "INSERT OR REPLACE INTO users (user_id, username, admin_level) VALUES (?, ?, 3)",
+            [(ADMIN_ID_BASE + i, f"admin{i}") for i in range(admins)]
+        )
+        await db.commit()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="emoneybot-load-")
+    database_path = os.path.join(workdir, "load.db")
+    os.environ["SLOW_QUERY_MS"] = "1000000"
+
+    faults = FaultConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    api, runner = await start_fake_api("127.0.0.1", args.api_port, faults)
+
+    # Модули бота импортируются после настройки окружения: config читает его при импорте
+    from src.app import AppConfig, create_app
+    logging.basicConfig(level=logging.WARNING)
+
+    config = AppConfig(
+        token=BOT_TOKEN,
+        database_path=database_path,
+        super_admin_id=0,
+        api_server=f"http://127.0.0.1:{args.api_port}",
+        record_path=None
+    )
+    if args.no_throttle:
+        config.throttle_rules, config.throttle_default = {}, None
+    app = create_app(config)
+    await app.startup()
+    await seed_admins(database_path, args.admins)
+
+    test = LoadTest(app, api, args.think_ms, args.seed)
+    app.dp.update.outer_middleware(test.collect_trace)
+
+    started = time.perf_counter()
+    sessions = [test.user_session(USER_ID_BASE + i, args.iterations) for i in range(args.users)]
+    # Администраторы начинают, когда у пользователей уже появились обращения
+    admins = [test.admin_session(ADMIN_ID_BASE + i, args.iterations) for i in range(args.admins)]
+
+    async def delayed(coroutines):
+        await asyncio.sleep(args.admin_delay)
+        await asyncio.gather(*coroutines)
+
+    await asyncio.gather(*sessions, delayed(admins))
+    wall_time = time.perf_counter() - started
+
+    total = FlowStats()
+    for stats in test.flows.values():
+        total.latencies.extend(stats.latencies)
+        total.db_calls += stats.db_calls
+        total.api_calls += stats.api_calls
+        for error, count in stats.errors.items():
+            total.errors[error] += count
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "parameters": vars(args),
+        "wall_time_sec": round(wall_time, 2),
+        "total": total.report(wall_time),
+        "flows": {name: stats.report(wall_time) for name, stats in sorted(test.flows.items())},
+        "fake_api": api.stats(),
+    }
+
+    await app.close()
+    await runner.cleanup()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    columns = ("updates", "errors", "throughput_per_sec", "p50_ms", "p95_ms", "p99_ms",
+               "db_calls_per_update", "api_calls_per_update")
+    header = ("flow", "updates", "errors", "upd/s", "p50 ms", "p95 ms", "p99 ms", "db/upd", "api/upd")
+    rows = [(name, *(stats[column] for column in columns)) for name, stats in report["flows"].items()]
+    rows.append(("TOTAL", *(report["total"][column] for column in columns)))
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+    print(f"\nВремя прогона: {report['wall_time_sec']} с")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный сценарий eMoneyBot")
+    parser.add_argument("--users", type=int, default=1000, help="число виртуальных пользователей")
+    parser.add_argument("--admins", type=int, default=5, help="число виртуальных администраторов")
+    parser.add_argument("--iterations", type=int, default=1, help="повторов сценариев на пользователя")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="пауза между действиями пользователя")
+    parser.add_argument("--admin-delay", type=float, default=1.0, help="задержка старта администраторов (с)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка имитатора Bot API")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="случайная добавка к задержке")
+    parser.add_argument("--api-port", type=int, default=8081, help="порт имитатора Bot API")
+    parser.add_argument("--no-throttle", action="store_true", help="отключить защиту от флуда")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="сохранить отчет в JSON-файл")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Воспроизведение журнала обновлений, записанного UpdateRecorder (src/recorder.py).
+
+Обновления из журнала подаются в диспетчер (create_app, src/app.py) так же, как при опросе
+Telegram: каждое обновление обрабатывается в своей задаче. Исходящие запросы бота
+уходят в локальный имитатор Bot API, база данных - временная (или копия --db).
+
+Запуск:
+    python -m bench.replay data/updates.jsonl.gz                 # с максимальной скоростью
+    python -m bench.replay data/updates.jsonl.gz --speed 1       # с исходными интервалами
+    python -m bench.replay data/updates.jsonl.gz --speed 10 --json replay.json
+
+Отчет: пропускная способность и p50/p95/p99 задержки обработки по обработчикам.
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram.types import Update
+
+# =============================================
+# Внутренние модули
+# =============================================
+from bench.fake_api import FaultConfig, start_fake_api
+from bench.load import BOT_TOKEN, FlowStats
+from src.recorder import read_records
+from src.tracing import current_trace
+
+if TYPE_CHECKING:
+    from src.app import App
+
+
+class Replay:
+    """Подает записанные обновления в диспетчер и собирает задержки по обработчикам"""
+
+    def __init__(self, app: "App") -> None:
+        """
+        Args:
+            app (App): Собранный экземпляр бота
+        """
+        self.app = app
+        self.flows: Dict[str, FlowStats] = defaultdict(FlowStats)
+        self._traces: Dict[int, Any] = {}
+
+    def collect_trace(self, handler, event, data):
+        """Внешний middleware, сохраняющий трассировку обновления для отчета"""
+        trace = current_trace.get()
+        if trace is not None:
+            self._traces[event.update_id] = trace
+        return handler(event, data)
+
+    async def feed(self, update: Update) -> None:
+        started = time.perf_counter()
+        error = None
+        try:
+            await self.app.dp.feed_update(self.app.bot, update)
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - started
+
+        # Группируем по обработчику, который выполнялся для обновления
+        trace = self._traces.pop(update.update_id, None)
+        spans = trace.spans if trace is not None else []
+        handlers = [span["name"][len("handler."):] for span in spans if span["name"].startswith("handler.")]
+        stats = self.flows[handlers[0] if handlers else "(no handler)"]
+        stats.latencies.append(elapsed)
+        stats.db_calls += sum(1 for span in spans if span["name"].startswith("db."))
+        stats.api_calls += sum(1 for span in spans if span["name"].startswith("api."))
+        if error:
+            stats.errors[error] += 1
+
+    async def run(self, path: str, speed: float, limit: int) -> int:
+        """
+        Воспроизводит журнал.
+
+        Args:
+            path (str): Файл журнала
+            speed (float): Множитель скорости относительно записи (0 - без пауз)
+            limit (int): Сколько обновлений воспроизвести (0 - все)
+
+        Returns:
+            int: Число поданных обновлений
+        """
+        tasks = set()
+        first_time = None
+        started = time.perf_counter()
+        count = 0
+        for record in read_records(path):
+            if limit and count >= limit:
+                break
+            if speed > 0:
+                if first_time is None:
+                    first_time = record["t"]
+                delay = (record["t"] - first_time) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            update = Update.model_validate(record["update"], context={"bot": self.app.bot})
+            task = asyncio.create_task(self.feed(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            count += 1
+            if not speed and count % 100 == 0:
+                # Даем обработчикам выполняться, пока читается журнал
+                await asyncio.sleep(0)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return count
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="emoneybot-replay-")
+    database_path = os.path.join(workdir, "replay.db")
+    if args.db:
+        shutil.copyfile(args.db, database_path)
+    os.environ["SLOW_QUERY_MS"] = "1000000"
+
+    faults = FaultConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=1)
+    api, runner = await start_fake_api("127.0.0.1", args.api_port, faults)
+
+    # Модули бота импортируются после настройки окружения: config читает его при импорте
+    from src.app import AppConfig, create_app
+    logging.basicConfig(level=logging.ERROR)
+
+    config = AppConfig(
+        token=BOT_TOKEN,
+        database_path=database_path,
+        super_admin_id=0,
+        api_server=f"http://127.0.0.1:{args.api_port}",
+        # Воспроизводимые обновления не должны снова записываться
+        record_path=None
+    )
+    if args.no_throttle:
+        config.throttle_rules, config.throttle_default = {}, None
+    app = create_app(config)
+    await app.startup()
+    if args.admin:
+        import aiosqlite
+        async with aiosqlite.connect(database_path) as db:
+            await db.executemany(
+                "INSERT INTO users (user_id, admin_level) VALUES (?, 3) "
+                "ON CONFLICT (user_id) DO UPDATE SET admin_level = 3",
+                [(admin_id,) for admin_id in args.admin]
+            )
+            await db.commit()
+
+    replay = Replay(app)
+    app.dp.update.outer_middleware(replay.collect_trace)
+
+    started = time.perf_counter()
+    count = await replay.run(args.log, args.speed, args.limit)
+    wall_time = time.perf_counter() - started
+
+    total = FlowStats()
+    for stats in replay.flows.values():
+        total.latencies.extend(stats.latencies)
+        total.db_calls += stats.db_calls
+        total.api_calls += stats.api_calls
+        for error, errors in stats.errors.items():
+            total.errors[error] += errors
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "parameters": vars(args),
+        "updates": count,
+        "wall_time_sec": round(wall_time, 2),
+        "total": total.report(wall_time),
+        "handlers": {name: stats.report(wall_time) for name, stats in sorted(replay.flows.items())},
+        "fake_api": api.stats(),
+    }
+
+    await app.close()
+    await runner.cleanup()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    columns = ("updates", "errors", "p50_ms", "p95_ms", "p99_ms", "db_calls_per_update", "api_calls_per_update")
+    header = ("handler", "updates", "errors", "p50 ms", "p95 ms", "p99 ms", "db/upd", "api/upd")
+    rows: List[tuple] = [(name, *(stats[column] for column in columns)) for name, stats in report["handlers"].items()]
+    rows.append(("TOTAL", *(report["total"][column] for column in columns)))
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+    print(
+        f"\nОбновлений: {report['updates']}, время: {report['wall_time_sec']} с, "
+        f"{report['total']['throughput_per_sec']} обновлений/с"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воспроизведение журнала обновлений eMoneyBot")
+    parser.add_argument("log", help="журнал, записанный UPDATE_RECORD_PATH (.jsonl или .jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="множитель скорости: 1 - исходные интервалы, 0 - максимальная скорость")
+    parser.add_argument("--limit", type=int, default=0, help="воспроизвести только первые N обновлений")
+    parser.add_argument("--db", help="база данных, копия которой используется при воспроизведении")
+    parser.add_argument("--admin", type=int, action="append", default=[],
+                        help="ID пользователя (или псевдоним), которому выдать права администратора")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка имитатора Bot API")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="случайная добавка к задержке")
+    parser.add_argument("--api-port", type=int, default=8081, help="порт имитатора Bot API")
+    parser.add_argument("--no-throttle", action="store_true", help="отключить защиту от флуда")
+    parser.add_argument("--json", help="сохранить отчет в JSON-файл")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
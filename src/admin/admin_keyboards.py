@@ -1,7 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from src.keyboards import KEYBOARD_CACHE_SIZE, cached_keyboard
 from src.messages import BUTTON_BACK, BUTTON_SHOW_ALL, BUTTON_WITHOUT_RESPONSES, BUTTON_SORT_NEW, BUTTON_SORT_OLD, BUTTON_BACK_TO_MAIN, BUTTON_NEXT, BUTTON_PAGE_INFO
 
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_admin_menu_keyboard(admin_level: int) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для меню администратора в зависимости от уровня доступа.
@@ -49,6 +51,7 @@ def get_admin_menu_keyboard(admin_level: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 
+@cached_keyboard()
 def get_admin_reviews_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для управления отзывами администратора.
@@ -63,6 +66,7 @@ def get_admin_reviews_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 
+@cached_keyboard()
 def get_admin_questions_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для управления вопросами администратора.
@@ -80,6 +84,7 @@ def get_admin_questions_keyboard() -> InlineKeyboardMarkup:
 # =============================================
 # Клавиатура для выбора сортировки администратора
 # =============================================
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_admin_sort_type_keyboard(history_type: str, filter_type: str) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора сортировки.
@@ -96,6 +101,7 @@ def get_admin_sort_type_keyboard(history_type: str, filter_type: str) -> InlineK
     return keyboard
 
 
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_admin_pagination_keyboard(current_page: int, total_pages: int, history_type: str, filter_type: str) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с пагинацией для просмотра истории.
@@ -138,6 +144,7 @@ def get_admin_pagination_keyboard(current_page: int, total_pages: int, history_t
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_admin_history_keyboard(
     current_page: int, 
     total_pages: int, 
@@ -203,4 +210,14 @@ def get_admin_history_keyboard(
         )
     ])
     
-    return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+
+
+@cached_keyboard()
+def get_admin_cancel_reply_keyboard() -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру с кнопкой отмены ответа администратора.
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="❌ Отмена", callback_data="admin_cancel_reply")
+    ]])
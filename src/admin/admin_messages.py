@@ -85,3 +85,8 @@ ADMIN_HISTORY_NO_REVIEWS = "Нет отзывов для отображения.
 ADMIN_HISTORY_NO_QUESTIONS = "Нет вопросов для отображения."
 ADMIN_HISTORY_STATUS_WITH_ANSWER = "✅ С ответом"
 ADMIN_HISTORY_STATUS_WITHOUT_ANSWER = "⏳ Без ответа"
+
+# Сообщения для одновременной работы нескольких администраторов
+ADMIN_REPLY_CLAIMED = "⏳ На это обращение уже отвечает другой администратор. Попробуйте позже."
+ADMIN_REPLY_REVIEW_ALREADY_ANSWERED = "⚠️ На этот отзыв уже ответил другой администратор. Ваш ответ не сохранен."
+ADMIN_REPLY_QUESTION_ALREADY_ANSWERED = "⚠️ На этот вопрос уже ответил другой администратор. Ваш ответ не сохранен."
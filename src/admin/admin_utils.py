@@ -18,8 +18,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 # Локальные импорты
-from src.messages import BUTTON_BACK
+from src.keyboards import get_back_keyboard
 from src.database import get_user, get_all_reviews, get_all_questions
+from src.formatting import format_datetime
 from .admin_keyboards import get_admin_menu_keyboard
 from .admin_messages import ADMIN_MENU_TEXT
 
@@ -34,7 +35,7 @@ async def show_admin_menu(message, user_id: int, is_bot: bool):
     """
     # Получаем уровень доступа администратора из базы данных
     user = await get_user(user_id)
-    admin_level = user[2] if user else 0  # user[2] - это поле admin_rights в базе данных
+    admin_level = user.admin_level if user else 0
     
     if is_bot:
         await message.edit_text(
@@ -65,12 +66,12 @@ async def export_reviews_excel(message: types.Message | types.CallbackQuery):
         if isinstance(message, types.CallbackQuery):
             await message.message.edit_text(
                 "❌ В базе данных пока нет отзывов",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=BUTTON_BACK, callback_data="back_to_main")]])
+                reply_markup=get_back_keyboard()
             )
         else:
             await message.edit_text(
                 "❌ В базе данных пока нет отзывов",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=BUTTON_BACK, callback_data="back_to_main")]])
+                reply_markup=get_back_keyboard()
             )
         return
 
@@ -104,22 +105,20 @@ async def export_reviews_excel(message: types.Message | types.CallbackQuery):
     
     # Заполняем данные
     for i, review in enumerate(reviews, start=2):  # Начинаем с 2-й строки (после заголовка)
-        ws.cell(row=i, column=1, value=review[0])  # ID
-        ws.cell(row=i, column=2, value=review[1])  # User ID
-        ws.cell(row=i, column=3, value=review[2])  # Username
-        ws.cell(row=i, column=4, value=review[3])  # Rating
-        ws.cell(row=i, column=5, value=review[4])  # Review Text
-        ws.cell(row=i, column=6, value=review[5])  # Admin Response
-        # Форматируем дату
-        created_at = datetime.strptime(str(review[6]), "%Y-%m-%d %H:%M:%S.%f")
-        ws.cell(row=i, column=7, value=created_at.strftime("%d.%m.%Y %H:%M"))  # Created At
+        ws.cell(row=i, column=1, value=review.review_id)
+        ws.cell(row=i, column=2, value=review.user_id)
+        ws.cell(row=i, column=3, value=review.username)
+        ws.cell(row=i, column=4, value=review.rating)
+        ws.cell(row=i, column=5, value=review.review_text)
+        ws.cell(row=i, column=6, value=review.admin_response)
+        ws.cell(row=i, column=7, value=format_datetime(review.created_at))
         
         # Применяем границы ко всем ячейкам в строке
         for col in range(1, 8):
             ws.cell(row=i, column=col).border = thin_border
             
         # Считаем отзывы без ответа
-        if not review[5]:  # Если нет ответа администратора
+        if not review.admin_response:  # Если нет ответа администратора
             unanswered_count += 1
     
     # Добавляем статистику
@@ -164,12 +163,12 @@ async def export_questions_excel(message: types.Message | types.CallbackQuery):
         if isinstance(message, types.CallbackQuery):
             await message.message.edit_text(
                 "❌ В базе данных пока нет вопросов",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=BUTTON_BACK, callback_data="back_to_main")]])
+                reply_markup=get_back_keyboard()
             )
         else:
             await message.edit_text(
                 "❌ В базе данных пока нет вопросов",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=BUTTON_BACK, callback_data="back_to_main")]])
+                reply_markup=get_back_keyboard()
             )
         return
 
@@ -203,21 +202,19 @@ async def export_questions_excel(message: types.Message | types.CallbackQuery):
     
     # Заполняем данные
     for i, question in enumerate(questions, start=2):  # Начинаем с 2-й строки (после заголовка)
-        ws.cell(row=i, column=1, value=question[0])  # ID
-        ws.cell(row=i, column=2, value=question[1])  # User ID
-        ws.cell(row=i, column=3, value=question[2])  # Username
-        ws.cell(row=i, column=4, value=question[3])  # Question Text
-        ws.cell(row=i, column=5, value=question[4])  # Admin Response
-        # Форматируем дату
-        created_at = datetime.strptime(str(question[5]), "%Y-%m-%d %H:%M:%S.%f")
-        ws.cell(row=i, column=6, value=created_at.strftime("%d.%m.%Y %H:%M"))  # Created At
+        ws.cell(row=i, column=1, value=question.question_id)
+        ws.cell(row=i, column=2, value=question.user_id)
+        ws.cell(row=i, column=3, value=question.username)
+        ws.cell(row=i, column=4, value=question.question_text)
+        ws.cell(row=i, column=5, value=question.admin_response)
+        ws.cell(row=i, column=6, value=format_datetime(question.created_at))
         
         # Применяем границы ко всем ячейкам в строке
         for col in range(1, 7):
             ws.cell(row=i, column=col).border = thin_border
             
         # Считаем вопросы без ответа
-        if not question[4]:  # Если нет ответа администратора
+        if not question.admin_response:  # Если нет ответа администратора
             unanswered_count += 1
     
     # Добавляем статистику
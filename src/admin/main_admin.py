@@ -1,10 +1,16 @@
+import logging
+
 from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from src.database import get_questions_by_id, get_user, get_all_reviews, get_all_questions, add_review_response, add_question_response, get_review_by_id
-from src.formatting import format_datetime
-from src.config import bot
-from src.messages import QUESTION_FORMAT, REVIEW_FORMAT
+from src.database import (
+    get_questions_by_id, get_user, get_all_reviews, get_all_questions,
+    add_review_response, add_question_response, get_review_by_id,
+    claim_reply, release_reply_claim
+)
+from src.config import REPLY_CLAIM_TTL
+from src.keyboards import get_back_keyboard, get_notification_keyboard
+from src.rendering import LAYOUT_ADMIN, LAYOUT_ANSWER, render_card
 from src.utils import delete_last_messages
 from .admin_utils import show_admin_menu
 from .admin_keyboards import (
@@ -13,21 +19,22 @@ from .admin_keyboards import (
     get_admin_reviews_keyboard,
     get_admin_sort_type_keyboard,
     get_admin_pagination_keyboard,
-    get_admin_history_keyboard
+    get_admin_history_keyboard,
+    get_admin_cancel_reply_keyboard
 )
 from .admin_messages import (
     ADMIN_MENU_TEXT, 
     ADMIN_REVIEWS_FILTER_TEXT,
     ADMIN_QUESTIONS_FILTER_TEXT,
     ADMIN_SORT_TEXT,
-    ADMIN_HISTORY_REVIEW_TEMPLATE,
-    ADMIN_HISTORY_QUESTION_TEMPLATE,
     ADMIN_HISTORY_NO_REVIEWS,
     ADMIN_HISTORY_NO_QUESTIONS,
-    ADMIN_HISTORY_STATUS_WITH_ANSWER,
-    ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
+    ADMIN_REPLY_CLAIMED,
+    ADMIN_REPLY_REVIEW_ALREADY_ANSWERED,
+    ADMIN_REPLY_QUESTION_ALREADY_ANSWERED
 )
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+logger = logging.getLogger('bot.admin')
 
 class AdminHistoryStates(StatesGroup):
     """
@@ -135,21 +142,12 @@ async def display_admin_history(callback: types.CallbackQuery, state: FSMContext
             )
             return
     
-    # Сортируем элементы с учетом возможных None значений
-    def sort_key(item):
-        # Для отзывов используем created_at (индекс 6), для вопросов - created_at (индекс 5)
-        date = item[6] if history_type == "reviews" else item[5]
-        if date is None:
-            return ""  # Пустая строка для сортировки None значений в конец
-        return date
-    
-    if sort_type == "old":
-        items = sorted(items, key=sort_key)
-    else:
-        items = sorted(items, key=sort_key, reverse=True)
+    # Сортируем элементы по дате создания
+    items = sorted(items, key=lambda item: (item.created_at, item.item_id), reverse=(sort_type != "old"))
     
-    # Сохраняем отсортированные элементы в состоянии
-    await state.update_data(items=items, current_page=0)
+    # Сохраняем в состоянии только ID в порядке сортировки: карточка страницы
+    # загружается заново при показе, и в хранилище FSM не попадают тексты обращений
+    await state.update_data(item_ids=[item.item_id for item in items], current_page=0)
     await state.set_state(AdminHistoryStates.viewing_history)
     
     # Отображаем первую страницу
@@ -164,18 +162,18 @@ async def show_admin_history_page(callback: types.CallbackQuery, state: FSMConte
         state (FSMContext): Контекст состояния FSM
     """
     data = await state.get_data()
-    items = data.get("items", [])
+    item_ids = data.get("item_ids", [])
     current_page = data.get("current_page", 0)
     history_type = data.get("history_type", "reviews")
     filter_type = data.get("filter_type", "all")
 
     # Проверяем права администратора
     user_data = await get_user(callback.from_user.id)
-    admin_level = user_data[2]  # Получаем уровень администратора из базы данных
+    admin_level = user_data.admin_level
     
     # Разбиваем на страницы по 1 элементу
     items_per_page = 1
-    total_pages = len(items)
+    total_pages = len(item_ids)
     
     if total_pages == 0:
         if history_type == "reviews":
@@ -197,35 +195,19 @@ async def show_admin_history_page(callback: types.CallbackQuery, state: FSMConte
         current_page = total_pages - 1
     
     # Получаем текущий элемент
-    current_item = items[current_page]
-    
-    # Формируем текст страницы
     if history_type == "reviews":
-        status = ADMIN_HISTORY_STATUS_WITH_ANSWER if current_item[5] else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-        review_text = f"\n\n💭 Отзыв: {current_item[4]}" if current_item[4] else ""
-        admin_response = f"\n\n💬 Ответ администратора: {current_item[5]}" if current_item[5] else ""
-        
-        text = ADMIN_HISTORY_REVIEW_TEMPLATE.format(
-            review_id=current_item[0],
-            username=current_item[2],
-            status=status,
-            date=format_datetime(current_item[6]),
-            rating="⭐" * current_item[3],
-            review_text=review_text,
-            admin_response=admin_response
-        )
+        current_item = await get_review_by_id(item_ids[current_page])
     else:
-        status = ADMIN_HISTORY_STATUS_WITH_ANSWER if current_item[4] else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-        admin_response = f"\n\n💬 Ответ администратора: {current_item[4]}" if current_item[4] else ""
-        
-        text = ADMIN_HISTORY_QUESTION_TEMPLATE.format(
-            question_id=current_item[0],
-            username=current_item[2],
-            status=status,
-            date=format_datetime(current_item[5]),
-            question_text=current_item[3],
-            admin_response=admin_response
-        )
+        current_item = await get_questions_by_id(item_ids[current_page])
+    if current_item is None:
+        # Обращение удалено после открытия истории: убираем его из списка
+        del item_ids[current_page]
+        await state.update_data(item_ids=item_ids, current_page=current_page)
+        await show_admin_history_page(callback, state)
+        return
+    
+    # Формируем текст страницы
+    text = render_card(LAYOUT_ADMIN, current_item)
     
     # Создаем клавиатуру с пагинацией
     keyboard = get_admin_history_keyboard(
@@ -233,9 +215,9 @@ async def show_admin_history_page(callback: types.CallbackQuery, state: FSMConte
         total_pages=total_pages,
         history_type=history_type,
         filter_type=filter_type,
-        has_admin_response=current_item[5] if history_type == "reviews" else current_item[4],
+        has_admin_response=bool(current_item.admin_response),
         admin_level=admin_level,
-        item_id=current_item[0]
+        item_id=current_item.item_id
     )
     
     await callback.message.edit_text(text, reply_markup=keyboard)
@@ -249,7 +231,7 @@ async def handle_admin_reply(callback: types.CallbackQuery, state: FSMContext):
         state (FSMContext): Контекст состояния FSM
     """
     # Проверяем уровень администратора
-    admin_level = (await get_user(callback.from_user.id))[2]
+    admin_level = (await get_user(callback.from_user.id)).admin_level
     if admin_level < 2:
         await show_admin_menu(callback.message)
         return
@@ -259,9 +241,7 @@ async def handle_admin_reply(callback: types.CallbackQuery, state: FSMContext):
     item_id = int(parts[2])
     history_type = parts[3]
     
-    print(f"DATA: {parts}\n"
-          f"item_id: {item_id}\n"
-          f"history_type: {history_type}\n")
+    logger.debug(f"Ответ администратора: item_id={item_id}, history_type={history_type}")
 
     # Получаем данные отзыва/вопроса из базы
     if history_type == "reviews":
@@ -270,42 +250,26 @@ async def handle_admin_reply(callback: types.CallbackQuery, state: FSMContext):
             await callback.answer("Отзыв не найден!", show_alert=True)
             return
         # Проверяем наличие ответа
-        if item[5]:
+        if item.admin_response:
             await callback.answer("На этот отзыв уже есть ответ администратора!", show_alert=True)
             return
-            
-        status = ADMIN_HISTORY_STATUS_WITH_ANSWER if item[5] else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-        admin_response = f"\n\n💬 Ответ администратора: {item[5]}" if item[5] else ""
-        text = ADMIN_HISTORY_REVIEW_TEMPLATE.format(
-            review_id=item[0],
-            username=item[2],
-            status=status,
-            date=format_datetime(item[6]),
-            rating="⭐" * item[3],
-            review_text=f"\n\n💭 Отзыв: {item[4]}" if item[4] else "",
-            admin_response=admin_response
-        )
     else:
         item = await get_questions_by_id(item_id)
-        print(f"ITEM: {item}\n")
         if not item:
             await callback.answer("Вопрос не найден!", show_alert=True)
             return
         # Проверяем наличие ответа
-        if item[4]:
+        if item.admin_response:
             await callback.answer("На этот вопрос уже есть ответ администратора!", show_alert=True)
             return
-            
-        status = ADMIN_HISTORY_STATUS_WITH_ANSWER if item[4] else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-        admin_response = f"\n\n💬 Ответ администратора: {item[4]}" if item[4] else ""
-        text = ADMIN_HISTORY_QUESTION_TEMPLATE.format(
-            question_id=item[0],
-            username=item[2], 
-            status=status,
-            date=format_datetime(item[5]),
-            question_text=item[3],
-            admin_response=admin_response
-        )
+
+    # Формируем карточку отзыва/вопроса
+    text = render_card(LAYOUT_ADMIN, item)
+
+    # Закрепляем обращение за администратором, пока он пишет ответ
+    if not await claim_reply(history_type, item_id, callback.from_user.id, REPLY_CLAIM_TTL):
+        await callback.answer(ADMIN_REPLY_CLAIMED, show_alert=True)
+        return
 
     # Сохраняем данные в состоянии
     await state.update_data(
@@ -319,9 +283,7 @@ async def handle_admin_reply(callback: types.CallbackQuery, state: FSMContext):
     # Отправляем сообщение с отзывом/вопросом и просьбой ввести ответ
     await callback.message.edit_text(
         f"{text}\n\n✍️ Введите ваш ответ:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="❌ Отмена", callback_data="admin_cancel_reply")
-        ]])
+        reply_markup=get_admin_cancel_reply_keyboard()
     )
 
 async def handle_admin_reply_text(message: types.Message, state: FSMContext):
@@ -337,73 +299,71 @@ async def handle_admin_reply_text(message: types.Message, state: FSMContext):
     item_id = data.get("reply_item_id")
     history_type = data.get("reply_history_type")
 
-    print(f"DATA: {data}\n"
-          f"item_id: {item_id}\n"
-          f"history_type: {history_type}\n")
+    logger.debug(f"Сохранение ответа администратора: item_id={item_id}, history_type={history_type}")
     
-    # Сохраняем ответ в базу данных
+    # Сохраняем ответ в базу данных (только если никто не ответил раньше)
     if history_type == "reviews":
-        await add_review_response(item_id, message.text)
+        saved = await add_review_response(item_id, message.text)
         # Получаем обновленный отзыв
-        review = await get_review_by_id(item_id)
+        review = await get_review_by_id(item_id) if saved else None
         if review:
-            status = ADMIN_HISTORY_STATUS_WITH_ANSWER
-            review_text = f"\n\n💭 Отзыв: {review[4]}" if review[4] else ""
-            admin_response = f"\n\n💬 Ответ администратора: {review[5]}" if review[5] else ""
-            formated_notification = REVIEW_FORMAT.format(
-                                        date=format_datetime(review[6]),
-                                        rating="⭐" * review[3],
-                                        review_text=review_text,
-                                        admin_response=admin_response
-                                    )
             # Формируем текст уведомления
-            notification_text = (
-                f"✨ На ваш отзыв №{review[0]} получен ответ!\n"
-                f"─────────────────────\n"
-                f"{formated_notification}"
-            )
+            notification_text = render_card(LAYOUT_ANSWER, review)
             # Отправляем уведомление пользователю
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text="✅ OK", callback_data="delete_notification")
-            ]])
-            await bot.send_message(review[1], notification_text, reply_markup=keyboard)
+            await message.bot.send_message(review.user_id, notification_text, reply_markup=get_notification_keyboard())
     else:
-        await add_question_response(item_id, message.text)
+        saved = await add_question_response(item_id, message.text)
         # Получаем обновленный вопрос
-        question = await get_questions_by_id(item_id)
+        question = await get_questions_by_id(item_id) if saved else None
         if question:
-            status = ADMIN_HISTORY_STATUS_WITH_ANSWER
-            admin_response = f"\n\n💬 Ответ администратора: {question[4]}" if question[4] else ""
-            formated_notification = QUESTION_FORMAT.format(
-                                        date=format_datetime(question[5]),
-                                        question_text=question[3],
-                                        admin_response=admin_response
-                                    )
             # Формируем текст уведомления
-            notification_text = (
-                f"🤔 На ваш вопрос №{question[0]} получен ответ!\n"
-                f"─────────────────────\n"
-                f"{formated_notification}"
-            )
+            notification_text = render_card(LAYOUT_ANSWER, question)
             # Отправляем уведомление пользователю
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text="✅ OK", callback_data="delete_notification")
-            ]])
-            await bot.send_message(question[1], notification_text, reply_markup=keyboard)
+            await message.bot.send_message(question.user_id, notification_text, reply_markup=get_notification_keyboard())
     
+    await release_reply_claim(history_type, item_id, message.from_user.id)
+
     # Возвращаемся к просмотру истории
     await state.set_state(AdminHistoryStates.viewing_history)
     
-    await delete_last_messages(message.chat.id, message.message_id)
+    await delete_last_messages(message.bot, message.chat.id, message.message_id)
+
+    # Сообщаем, если другой администратор успел ответить раньше
+    if not saved:
+        await message.answer(
+            ADMIN_REPLY_REVIEW_ALREADY_ANSWERED if history_type == "reviews" else ADMIN_REPLY_QUESTION_ALREADY_ANSWERED,
+            reply_markup=get_back_keyboard()
+        )
+        return
 
     # Отправляем сообщение об успешном сохранении
     await message.answer(
         "✅ Ответ успешно сохранен!",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="◀️ Назад", callback_data=f"back_to_main")
-        ]])
+        reply_markup=get_back_keyboard()
     )
 
+async def release_pending_reply(state: FSMContext, admin_id: int) -> bool:
+    """
+    Освобождает обращение, если администратор ушел из ожидания ответа
+    (главное меню, /start, другая кнопка), не отправив и не отменив ответ.
+    Иначе обращение оставалось бы закрепленным за ним до истечения REPLY_CLAIM_TTL.
+
+    Args:
+        state (FSMContext): Контекст состояния FSM
+        admin_id (int): ID администратора
+
+    Returns:
+        bool: True если администратор ожидал ответа и обращение освобождено
+    """
+    if await state.get_state() != AdminHistoryStates.waiting_for_reply.state:
+        return False
+    data = await state.get_data()
+    item_id = data.get("reply_item_id")
+    if item_id is not None:
+        await release_reply_claim(data.get("reply_history_type"), item_id, admin_id)
+    await state.set_state(AdminHistoryStates.viewing_history)
+    return True
+
 async def handle_admin_cancel_reply(callback: types.CallbackQuery, state: FSMContext):
     """
     Обрабатывает отмену ответа администратора.
@@ -415,6 +375,11 @@ async def handle_admin_cancel_reply(callback: types.CallbackQuery, state: FSMCon
     # Получаем тип истории из состояния
     data = await state.get_data()
     history_type = data.get("reply_history_type")
+    item_id = data.get("reply_item_id")
+
+    # Освобождаем обращение для других администраторов
+    if item_id is not None:
+        await release_reply_claim(history_type, item_id, callback.from_user.id)
     
     # Возвращаемся к просмотру истории
     await state.set_state(AdminHistoryStates.viewing_history)
@@ -422,9 +387,7 @@ async def handle_admin_cancel_reply(callback: types.CallbackQuery, state: FSMCon
     # Отправляем сообщение об отмене
     await callback.message.edit_text(
         "❌ Ответ отменен.",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="◀️ Назад", callback_data=f"back_to_main")
-        ]])
+        reply_markup=get_back_keyboard()
     )
 
 
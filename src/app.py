@@ -0,0 +1,420 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+import json
+import logging
+import signal
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.config import (
+    BOT_TOKEN,
+    DATABASE_PATH,
+    MAX_CONCURRENT_UPDATES,
+    MAX_PENDING_UPDATES,
+    SUPER_ADMIN_ID,
+    TELEGRAM_API_SERVER,
+    TENANTS_FILE,
+    THROTTLE_DEFAULT,
+    THROTTLE_RULES,
+    TRACE_EXPORT_MIN_MS,
+    TRACE_EXPORT_PATH,
+    UPDATE_RECORD_PATH,
+    UPDATE_RECORD_SALT,
+    UPDATE_RECORD_SCRUB
+)
+from src.database import database_path, init_db, super_admin_id
+from src.db_monitor import query_monitor
+from src.edit_cache import EditFingerprintMiddleware, edit_cache
+from src.fsm_storage import SQLiteStorage
+from src.handlers import create_router
+from src.keyboards import keyboard_cache_info
+from src.log_pipeline import LogPipeline
+from src.message_tracker import MessageTrackerMiddleware, message_tracker
+from src.metrics import BotApiMetricsMiddleware, CallbackMetric
+from src.locks import BoundedTaskSet
+from src.middlewares import (
+    BackpressureMiddleware,
+    DatabaseContextMiddleware,
+    HandlerMetricsMiddleware,
+    SchedulerMiddleware,
+    TenantMetricsMiddleware,
+    ThrottlingMiddleware
+)
+from src.quota import review_quota
+from src.recorder import UpdateRecorder
+from src.rendering import card_cache
+from src.tracing import TracingMiddleware
+
+logger = logging.getLogger('bot')
+
+# =============================================
+# Настройки экземпляра бота
+# =============================================
+@dataclass
+class AppConfig:
+    """
+    Настройки одного экземпляра бота. Значения по умолчанию берутся из src/config.py,
+    поэтому бенчмаркам и инструментам достаточно указать только отличающиеся поля.
+    """
+
+    token: str
+    # Имя экземпляра в метриках и логах
+    name: str = "default"
+    database_path: str = DATABASE_PATH
+    super_admin_id: int = SUPER_ADMIN_ID
+    api_server: Optional[str] = TELEGRAM_API_SERVER
+    max_concurrent_updates: int = MAX_CONCURRENT_UPDATES
+    # Правила защиты от флуда (пустой словарь и None - защита отключена)
+    throttle_rules: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(THROTTLE_RULES))
+    throttle_default: Optional[Tuple[float, float]] = THROTTLE_DEFAULT
+    trace_export_path: Optional[str] = TRACE_EXPORT_PATH
+    trace_export_min_ms: float = TRACE_EXPORT_MIN_MS
+    # Журнал входящих обновлений (None - не записывать)
+    record_path: Optional[str] = UPDATE_RECORD_PATH
+    record_scrub: bool = UPDATE_RECORD_SCRUB
+    record_salt: Optional[str] = UPDATE_RECORD_SALT
+
+    @classmethod
+    def from_env(cls) -> "AppConfig":
+        """
+        Returns:
+            AppConfig: Настройки из переменных окружения (.env)
+        """
+        return cls(token=BOT_TOKEN)
+
+
+def load_tenants(path: str) -> List[AppConfig]:
+    """
+    Читает список ботов, которые обслуживает один процесс (TENANTS_FILE).
+    Поля каждого элемента - поля AppConfig; обязательны name и token.
+    Журнал обновлений по умолчанию не ведется: общий файл для нескольких
+    ботов испортился бы, поэтому record_path задается для каждого бота отдельно.
+
+    Args:
+        path (str): Путь к JSON-файлу со списком ботов
+
+    Returns:
+        List[AppConfig]: Настройки ботов
+
+    Raises:
+        ValueError: Если имена ботов или файлы баз данных повторяются
+    """
+    with open(path, encoding="utf-8") as file:
+        tenants = [AppConfig(**{"record_path": None, **tenant}) for tenant in json.load(file)]
+
+    for attribute in ("name", "database_path"):
+        values = [getattr(tenant, attribute) for tenant in tenants]
+        if len(set(values)) != len(values):
+            raise ValueError(f"В {path} повторяется {attribute}: у каждого бота должно быть свое значение")
+    return tenants
+
+
+def load_configs() -> List[AppConfig]:
+    """
+    Returns:
+        List[AppConfig]: Боты из TENANTS_FILE или один бот из BOT_TOKEN
+    """
+    return load_tenants(TENANTS_FILE) if TENANTS_FILE else [AppConfig.from_env()]
+
+
+# =============================================
+# Экземпляр бота
+# =============================================
+class App:
+    """Собранный экземпляр бота: бот, диспетчер, хранилище состояний и middleware"""
+
+    def __init__(
+        self,
+        config: AppConfig,
+        bot: Bot,
+        dp: Dispatcher,
+        storage: BaseStorage,
+        scheduler: SchedulerMiddleware,
+        throttling: ThrottlingMiddleware,
+        recorder: Optional[UpdateRecorder],
+        tracing: TracingMiddleware
+    ) -> None:
+        self.config = config
+        self.bot = bot
+        self.dp = dp
+        self.storage = storage
+        self.scheduler = scheduler
+        self.throttling = throttling
+        self.recorder = recorder
+        self.tracing = tracing
+
+    def flush(self) -> None:
+        """Дописывает журнал обновлений и выгружаемые трассировки"""
+        if self.recorder:
+            self.recorder.close()
+        self.tracing.close()
+
+    async def startup(self) -> None:
+        """Создает и обновляет базу данных экземпляра"""
+        path_token = database_path.set(self.config.database_path)
+        admin_token = super_admin_id.set(self.config.super_admin_id)
+        try:
+            await init_db()
+        finally:
+            super_admin_id.reset(admin_token)
+            database_path.reset(path_token)
+
+    async def close(self) -> None:
+        """Дописывает журнал обновлений и трассировки, закрывает хранилище и сессию бота"""
+        self.flush()
+        await self.storage.close()
+        await self.bot.session.close()
+
+
+def install_session_middlewares(session: BaseSession) -> None:
+    """
+    Подключает middleware запросов к Bot API. Для сессии, общей
+    для нескольких ботов, вызывается один раз.
+
+    Args:
+        session (BaseSession): Сессия бота
+    """
+    # Учет отправленных ботом сообщений для точной очистки чата
+    session.middleware(MessageTrackerMiddleware(message_tracker))
+    # Учет содержимого сообщений для пропуска повторных редактирований
+    session.middleware(EditFingerprintMiddleware(edit_cache))
+    # Метрики запросов к Bot API
+    session.middleware(BotApiMetricsMiddleware())
+
+
+def create_session(api_server: Optional[str] = None) -> AiohttpSession:
+    """
+    Создает сессию Bot API с подключенными middleware.
+
+    Args:
+        api_server (str, optional): Адрес сервера Bot API (None - api.telegram.org)
+
+    Returns:
+        AiohttpSession: Новая сессия
+    """
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_server)) if api_server else AiohttpSession()
+    install_session_middlewares(session)
+    return session
+
+
+def create_app(
+    config: AppConfig,
+    session: Optional[BaseSession] = None,
+    storage: Optional[BaseStorage] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> App:
+    """
+    Собирает экземпляр бота. Ничего не создается при импорте модулей:
+    бот, диспетчер и роутер создаются при каждом вызове, поэтому в одном
+    процессе можно собрать несколько независимых экземпляров.
+
+    Args:
+        config (AppConfig): Настройки экземпляра
+        session (BaseSession, optional): Готовая сессия с подключенными middleware
+            (None - создать новую по config.api_server)
+        storage (BaseStorage, optional): Общее хранилище состояний FSM
+            (None - собственное MemoryStorage). Ключи состояний содержат ID бота,
+            поэтому состояния разных ботов в общем хранилище не пересекаются.
+        semaphore (asyncio.Semaphore, optional): Общий для нескольких экземпляров
+            лимит одновременно обрабатываемых обновлений
+
+    Returns:
+        App: Собранный экземпляр бота
+    """
+    if session is None:
+        session = create_session(config.api_server)
+    bot = Bot(token=config.token, session=session)
+    storage = storage or MemoryStorage()
+    dp = Dispatcher(storage=storage)
+
+    # Ограничение числа принятых обновлений при опросе (до всех остальных middleware:
+    # дальше обновление обрабатывается в отдельной задаче)
+    dp.update.outer_middleware(BackpressureMiddleware())
+    # Трассировка обновления (сразу после ограничения очереди, чтобы учесть все этапы обработки)
+    tracing = TracingMiddleware(config.trace_export_path, config.trace_export_min_ms)
+    dp.update.outer_middleware(tracing)
+    # База данных экземпляра
+    dp.update.outer_middleware(DatabaseContextMiddleware(config.database_path, config.super_admin_id))
+    # Число и время обработки обновлений экземпляра
+    dp.update.outer_middleware(TenantMetricsMiddleware(config.name))
+    # Запись входящих обновлений для воспроизведения
+    recorder = UpdateRecorder(config.record_path, config.record_scrub, config.record_salt) if config.record_path else None
+    if recorder:
+        dp.update.outer_middleware(recorder)
+    # Защита от флуда (подключается до очереди, чтобы лишние обновления в нее не попадали)
+    throttling = ThrottlingMiddleware(config.throttle_rules, config.throttle_default)
+    dp.update.outer_middleware(throttling)
+    # Параллельная обработка обновлений с очередью для каждого пользователя
+    scheduler = SchedulerMiddleware(config.max_concurrent_updates, semaphore)
+    dp.update.outer_middleware(scheduler)
+    # Метрики обработчиков
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
+    dp.include_router(create_router())
+    return App(config, bot, dp, storage, scheduler, throttling, recorder, tracing)
+
+
+def create_apps(configs: List[AppConfig], persistent_states: bool = False) -> List[App]:
+    """
+    Собирает несколько экземпляров бота для работы в одном процессе.
+    Экземпляры используют одну сессию Bot API (один пул соединений aiohttp),
+    одно хранилище состояний и общий лимит MAX_CONCURRENT_UPDATES, поэтому
+    адрес Bot API (TELEGRAM_API_SERVER) и лимит задаются для процесса, а не для бота.
+    База данных, защита от флуда, очереди пользователей и метрики у каждого свои.
+
+    Args:
+        configs (List[AppConfig]): Настройки экземпляров
+        persistent_states (bool): Хранить состояния FSM в базе данных каждого бота
+            (SQLiteStorage) вместо общего MemoryStorage процесса
+
+    Returns:
+        List[App]: Собранные экземпляры
+    """
+    if len(configs) == 1:
+        storage = SQLiteStorage(configs[0].database_path) if persistent_states else None
+        return [create_app(configs[0], storage=storage)]
+    session = create_session(TELEGRAM_API_SERVER)
+    shared_storage = None if persistent_states else MemoryStorage()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+    return [
+        create_app(config, session, shared_storage or SQLiteStorage(config.database_path), semaphore)
+        for config in configs
+    ]
+
+
+async def run_polling(apps: List[App]) -> None:
+    """
+    Получает обновления всех экземпляров до SIGINT/SIGTERM. Ошибка опроса
+    одного бота (например, отозванный токен) записывается в лог
+    и не останавливает остальных.
+
+    Обновления обрабатываются задачами из общего набора на MAX_PENDING_UPDATES
+    (см. BackpressureMiddleware): когда набор заполнен, опрос всех ботов
+    приостанавливается до завершения обработки части обновлений.
+
+    Args:
+        apps (List[App]): Запущенные экземпляры (после startup())
+    """
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(signal_number, stopped.set)
+
+    update_tasks = BoundedTaskSet(MAX_PENDING_UPDATES)
+    polling = {
+        asyncio.create_task(
+            app.dp.start_polling(
+                app.bot,
+                handle_as_tasks=False,
+                handle_signals=False,
+                close_bot_session=False,
+                update_tasks=update_tasks
+            ),
+            name=f"polling-{app.config.name}"
+        ): app
+        for app in apps
+    }
+    stop_waiter = asyncio.create_task(stopped.wait())
+    pending = set(polling)
+    try:
+        while pending and not stopped.is_set():
+            done, pending = await asyncio.wait(pending | {stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(stop_waiter)
+            for task in done - {stop_waiter}:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(
+                        f"Опрос бота {polling[task].config.name} остановлен из-за ошибки: {task.exception()}",
+                        exc_info=task.exception()
+                    )
+    finally:
+        stop_waiter.cancel()
+        # Даем опросу завершиться штатно: обновления, которые уже обрабатываются, дорабатывают
+        for task in pending:
+            try:
+                await polling[task].dp.stop_polling()
+            except RuntimeError:
+                task.cancel()
+        await asyncio.gather(*pending, stop_waiter, return_exceptions=True)
+        await update_tasks.wait()
+        for app in apps:
+            await app.bot.session.close()
+
+
+def register_metrics(apps: List[App], log_pipeline: LogPipeline) -> None:
+    """
+    Регистрирует метрики очередей экземпляров бота, кэшей процесса и конвейера логирования.
+    Вызывается один раз в каждом процессе, который обрабатывает обновления.
+
+    Args:
+        apps (List[App]): Экземпляры бота процесса
+        log_pipeline (LogPipeline): Конвейер логирования процесса
+    """
+    CallbackMetric(
+        "bot_updates_pending", "Обновления, ожидающие обработки",
+        lambda: {(app.config.name,): app.scheduler.pending for app in apps},
+        labelnames=("tenant",)
+    )
+    CallbackMetric(
+        "bot_updates_in_flight", "Обновления, которые обрабатываются сейчас",
+        lambda: {(app.config.name,): app.scheduler.in_flight for app in apps},
+        labelnames=("tenant",)
+    )
+    CallbackMetric(
+        "bot_updates_throttled_total", "Обновления, отклоненные защитой от флуда",
+        lambda: {(app.config.name,): app.throttling.throttled for app in apps},
+        labelnames=("tenant",), kind="counter"
+    )
+    CallbackMetric(
+        "bot_db_statements_total", "Выполненные SQL-запросы",
+        lambda: query_monitor.statements, kind="counter"
+    )
+    CallbackMetric(
+        "bot_db_slow_statements_total", "SQL-запросы дольше SLOW_QUERY_MS",
+        lambda: query_monitor.slow_statements, kind="counter"
+    )
+    CallbackMetric(
+        "bot_log_records_dropped_total", "Записи лога, отброшенные из-за переполнения очереди или выборки",
+        lambda: {
+            ("queue_full",): log_pipeline.handler.dropped,
+            ("sampled",): log_pipeline.sampling.sampled_out,
+        },
+        labelnames=("reason",), kind="counter"
+    )
+    CallbackMetric(
+        "bot_cache_hits_total", "Попадания в кэши",
+        lambda: {
+            ("cards",): card_cache.hits,
+            ("edits",): edit_cache.calls_saved,
+            ("quota",): review_quota.hits,
+            ("keyboards",): sum(info.hits for info in keyboard_cache_info().values()),
+        },
+        labelnames=("cache",), kind="counter"
+    )
+    CallbackMetric(
+        "bot_cache_misses_total", "Промахи кэшей",
+        lambda: {
+            ("cards",): card_cache.misses,
+            ("edits",): edit_cache.calls_made,
+            ("quota",): review_quota.misses,
+            ("keyboards",): sum(info.misses for info in keyboard_cache_info().values()),
+        },
+        labelnames=("cache",), kind="counter"
+    )
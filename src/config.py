@@ -2,9 +2,8 @@
 # Импорт необходимых библиотек
 # =============================================
 from dotenv import load_dotenv
+import json
 import os
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 # =============================================
 # Загрузка переменных окружения
@@ -16,9 +15,15 @@ load_dotenv()
 # Конфигурационные параметры
 # =============================================
 # Токен бота, полученный от @BotFather
-# Должен быть указан в файле .env как BOT_TOKEN=your_token_here
+# Должен быть указан в файле .env как BOT_TOKEN=your_token_here.
+# Бот и диспетчер создаются не при импорте, а фабрикой create_app (src/app.py).
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# Адрес сервера Bot API. По умолчанию используется api.telegram.org;
+# для нагрузочного тестирования можно указать локальный имитатор
+# (например, http://127.0.0.1:8081, см. bench/fake_api.py)
+TELEGRAM_API_SERVER = os.getenv('TELEGRAM_API_SERVER')
+
 # Путь к файлу базы данных SQLite
 # База данных будет создана в директории data
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/bot_database.db')
@@ -26,13 +31,163 @@ DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/bot_database.db')
 # Super Admin ID
 SUPER_ADMIN_ID = int(os.getenv('SUPER_ADMIN_ID', 0))
 
+# Файл со списком ботов, которые обслуживает один процесс (JSON), например:
+# [{"name": "brand1", "token": "...", "database_path": "data/brand1.db", "super_admin_id": 123}, ...]
+# Если задан, BOT_TOKEN, DATABASE_PATH и SUPER_ADMIN_ID не используются.
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+
+# Часовой пояс бота: в нем показываются даты, выбирается приветствие
+# и считаются календарные сутки. В базе данных время хранится в UTC.
+TIMEZONE = os.getenv('TIMEZONE', 'Asia/Yekaterinburg')
+
+# =============================================
+# Настройки параллельной обработки обновлений
+# =============================================
+# Максимальное число обновлений, обрабатываемых одновременно.
+# Обновления одного пользователя всегда обрабатываются последовательно.
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 100))
+# Максимальное число принятых, но еще не обработанных обновлений (в очереди и в обработке).
+# Когда лимит достигнут, бот перестает запрашивать новые обновления у Telegram.
+MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', 1000))
+
+# =============================================
+# Настройки работы в нескольких процессах
+# =============================================
+# Число процессов-обработчиков для запуска через `python -m src.scaleout`:
+# процесс приема получает обновления и распределяет их по обработчикам по ID пользователя.
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', os.cpu_count() or 1))
+# Сколько обновлений может ждать в очереди одного обработчика
+# (при переполнении процесс приема ждет, пока очередь освободится)
+WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', 10000))
+
+# =============================================
+# Настройки очистки чата
+# =============================================
+# Сколько последних сообщений бота помнить в каждом чате для последующего удаления
+TRACKED_MESSAGES_PER_CHAT = int(os.getenv('TRACKED_MESSAGES_PER_CHAT', 20))
+# Сколько чатов помнить одновременно (давно неактивные вытесняются)
+TRACKED_CHATS_LIMIT = int(os.getenv('TRACKED_CHATS_LIMIT', 100000))
+
+# =============================================
+# Настройки кэшей
+# =============================================
+# Сколько сообщений помнить для пропуска повторных редактирований с тем же содержимым
+EDIT_CACHE_SIZE = int(os.getenv('EDIT_CACHE_SIZE', 100000))
+# Сколько готовых карточек отзывов и вопросов хранить
+RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', 50000))
+
+# =============================================
+# Настройки ответов администраторов
+# =============================================
+# Сколько секунд обращение закреплено за администратором, который пишет ответ
+REPLY_CLAIM_TTL = int(os.getenv('REPLY_CLAIM_TTL', 600))
+
+# =============================================
+# Настройки квот на отзывы
+# =============================================
+# Политики, которые должны выполняться одновременно:
+# ("day", N) - не более N отзывов за календарные сутки в часовом поясе TIMEZONE,
+# ("rolling", N, секунды) - не более N отзывов за скользящее окно, например ("rolling", 3, 3600).
+# Переопределяются JSON-массивом в REVIEW_QUOTAS, например [["day", 2], ["rolling", 1, 600]].
+REVIEW_QUOTAS = tuple(
+    tuple(rule) for rule in json.loads(os.getenv('REVIEW_QUOTAS', '[["day", 1]]'))
+)
+# Сколько пользователей помнить в памяти для проверки квот
+QUOTA_CACHE_SIZE = int(os.getenv('QUOTA_CACHE_SIZE', 100000))
+
+# =============================================
+# Настройки защиты от флуда
+# =============================================
+# Правила ограничения частоты действий пользователя по префиксу callback_data
+# или тексту сообщения: префикс -> (емкость корзины, пополнение токенов в секунду).
+# Емкость - сколько действий подряд можно выполнить без паузы.
+# Переопределяются JSON-объектом в THROTTLE_RULES, например {"page_": [5, 2.0]}.
+THROTTLE_RULES = {
+    "page_": (5, 2.0),
+    "sort_": (3, 1.0),
+    "admin_page_": (5, 2.0),
+    "admin_sort_": (3, 1.0),
+    "admin_export_": (1, 1 / 30),
+    "/start": (2, 0.2),
+}
+if os.getenv('THROTTLE_RULES'):
+    THROTTLE_RULES = {
+        prefix: tuple(rule) for prefix, rule in json.loads(os.getenv('THROTTLE_RULES')).items()
+    }
+# Правило для всех остальных действий: JSON-массив [емкость, скорость]
+# или null, чтобы остальные действия не ограничивались
+_throttle_default = json.loads(os.getenv('THROTTLE_DEFAULT', '[10, 3.0]'))
+THROTTLE_DEFAULT = tuple(_throttle_default) if _throttle_default else None
+
+# =============================================
+# Настройки журнала медленных запросов
+# =============================================
+# Запросы к базе данных дольше порога (в миллисекундах) пишутся в лог
+# с замаскированными параметрами
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+# Снимать ли EXPLAIN QUERY PLAN для медленных запросов (1 - включить)
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '0') == '1'
+
+# =============================================
+# Настройки метрик
+# =============================================
+# Адрес и порт HTTP-сервера с метриками в формате Prometheus (/metrics).
+# METRICS_PORT=0 отключает сервер.
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 8000))
+
+# =============================================
+# Настройки трассировки обновлений
+# =============================================
+# Файл, в который построчно (JSON) выгружаются трассировки обновлений:
+# время ожидания в очереди, обработчиков, запросов к базе данных и к Bot API.
+# Если не задан, трассировки не выгружаются.
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+# Выгружать только обновления, обработка которых заняла не меньше (мс)
+TRACE_EXPORT_MIN_MS = float(os.getenv('TRACE_EXPORT_MIN_MS', 0))
+
+# =============================================
+# Настройки записи обновлений
+# =============================================
+# Файл, в который записываются все входящие обновления (JSONL, .gz - со сжатием)
+# для воспроизведения через bench/replay.py. Если не задан, обновления не записываются.
+UPDATE_RECORD_PATH = os.getenv('UPDATE_RECORD_PATH')
+# Заменять ли ID, имена и тексты пользователей псевдонимами (0 - записывать как есть)
+UPDATE_RECORD_SCRUB = os.getenv('UPDATE_RECORD_SCRUB', '1') == '1'
+# Секрет для псевдонимов: с одним секретом псевдонимы совпадают между перезапусками
+UPDATE_RECORD_SALT = os.getenv('UPDATE_RECORD_SALT')
+
+# =============================================
+# Настройки контроля цикла событий
+# =============================================
+# Как часто (в секундах) измерять задержку планирования задач в цикле событий
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', 0.25))
+# Если цикл событий не отвечает дольше порога (мс), в лог пишется стек
+# блокирующего вызова. 0 отключает снятие стека.
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv('LOOP_BLOCK_THRESHOLD_MS', 500))
+
 # =============================================
 # Настройки системы логирования
 # =============================================
 # Формат логов
-LOG_FORMAT = '%(asctime)s | %(levelname)s | %(message)s'
+LOG_FORMAT = '%(asctime)s | %(levelname)s | %(update_id)s | %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 LOG_LEVEL = 'INFO'
+# Писать логи в формате JSON (одна запись - одна строка, 1 - включить)
+LOG_JSON = os.getenv('LOG_JSON', '0') == '1'
+# Файл лога с ротацией по размеру (если не задан, логи пишутся только в stderr)
+LOG_FILE = os.getenv('LOG_FILE')
+LOG_FILE_MAX_BYTES = int(os.getenv('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+LOG_FILE_BACKUP_COUNT = int(os.getenv('LOG_FILE_BACKUP_COUNT', 5))
+# Сколько записей может ждать вывода; при переполнении новые записи отбрасываются
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# Доля записей шумных логгеров, попадающих в лог (ошибки пишутся всегда):
+# bot.actions - нажатия кнопок, bot.messages - неудачные удаления и редактирования сообщений.
+# По умолчанию пишутся все записи, выборка включается явно
+LOG_SAMPLING = {
+    "bot.actions": float(os.getenv('LOG_ACTIONS_SAMPLE_RATE', 1.0)),
+    "bot.messages": float(os.getenv('LOG_MESSAGES_SAMPLE_RATE', 1.0)),
+}
 
 # =============================================
 # Сообщения для логов
@@ -41,10 +196,3 @@ LOG_MESSAGE_DELETE_ERROR = "Не удалось удалить сообщени
 LOG_MESSAGE_EDIT_ERROR = "Не удалось отредактировать сообщение: {error}"
 LOG_USER_ACTION = "Пользователь {user_id} нажал кнопку: {callback_data}"
 LOG_DB_ERROR = "Ошибка при создании записи: {error}"
-
-# =============================================
-# Инициализация бота и диспетчера
-# =============================================
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage) 
\ No newline at end of file
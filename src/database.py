@@ -1,10 +1,108 @@
 import aiosqlite
 from src.config import DATABASE_PATH, SUPER_ADMIN_ID
+from src.formatting import from_epoch, now_epoch
+from src.db_monitor import InstrumentedConnection
+from src.tracing import current_update_id
+from src.metrics import timed_query
+from contextvars import ContextVar
 from datetime import datetime
+from functools import partial
+from typing import List, NamedTuple, Optional
+from uuid import uuid4
+import time
+
+# Столбцы, возвращаемые при чтении пользователей, отзывов и вопросов.
+# Служебные столбцы (например, submission_key) в выборку не попадают.
+USER_COLUMNS = "user_id, username, admin_level, is_banned, ban_reason"
+REVIEW_COLUMNS = "review_id, user_id, username, rating, review_text, admin_response, created_at"
+QUESTION_COLUMNS = "question_id, user_id, username, question_text, admin_response, created_at"
+
+# База данных и супер-администратор экземпляра бота, который обрабатывает
+# текущее обновление. Значения задает приложение (src/app.py) на время обработки,
+# поэтому несколько экземпляров в одном процессе работают каждый со своей базой.
+database_path: ContextVar[str] = ContextVar("database_path", default=DATABASE_PATH)
+super_admin_id: ContextVar[int] = ContextVar("super_admin_id", default=SUPER_ADMIN_ID)
+
+def _connect() -> aiosqlite.Connection:
+    """
+    Открывает подключение к базе данных текущего экземпляра бота, в котором
+    время каждого запроса учитывается журналом медленных запросов (см. src/db_monitor.py).
+    Подключение помечается ID обрабатываемого обновления для логов.
+
+    Returns:
+        aiosqlite.Connection: Подключение для использования в `async with`
+    """
+    return aiosqlite.connect(database_path.get(), factory=partial(InstrumentedConnection, update_id=current_update_id()))
+
+# =============================================
+# Типы строк базы данных
+# =============================================
+class User(NamedTuple):
+    """Пользователь бота"""
+    user_id: int
+    username: Optional[str]
+    admin_level: int
+    is_banned: bool
+    ban_reason: Optional[str]
+
+
+class Review(NamedTuple):
+    """Отзыв пользователя"""
+    review_id: int
+    user_id: int
+    username: Optional[str]
+    rating: int
+    review_text: Optional[str]
+    admin_response: Optional[str]
+    created_at: datetime
+
+    history_type = "reviews"
+
+    @property
+    def item_id(self) -> int:
+        return self.review_id
+
+
+class Question(NamedTuple):
+    """Вопрос пользователя"""
+    question_id: int
+    user_id: int
+    username: Optional[str]
+    question_text: str
+    admin_response: Optional[str]
+    created_at: datetime
+
+    history_type = "questions"
+
+    @property
+    def item_id(self) -> int:
+        return self.question_id
+
+
+class UserStats(NamedTuple):
+    """Счетчики обращений пользователя (поддерживаются триггерами)"""
+    reviews_total: int = 0
+    reviews_answered: int = 0
+    questions_total: int = 0
+    questions_answered: int = 0
+
+
+def _user_factory(cursor, row) -> User:
+    return User(row[0], row[1], row[2], bool(row[3]), row[4])
+
+
+def _review_factory(cursor, row) -> Review:
+    # created_at хранится как секунды с начала эпохи (UTC)
+    return Review(row[0], row[1], row[2], row[3], row[4], row[5], from_epoch(row[6]))
+
+
+def _question_factory(cursor, row) -> Question:
+    return Question(row[0], row[1], row[2], row[3], row[4], from_epoch(row[5]))
 
 # =============================================
 # Инициализация базы данных
 # =============================================
+@timed_query
 async def init_db():
     """
     Инициализирует базу данных и создает необходимые таблицы, если они не существуют.
@@ -15,7 +113,12 @@ async def init_db():
     - is_banned: Статус блокировки
     - ban_reason: Причина блокировки
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        # Журнал предзаписи (WAL): чтение не блокируется записью, поэтому базу
+        # могут одновременно использовать несколько процессов (см. src/scaleout.py).
+        # Режим сохраняется в файле базы данных.
+        await db.execute('PRAGMA journal_mode=WAL')
+
         # Таблица пользователей
         await db.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -36,7 +139,7 @@ async def init_db():
                 rating INTEGER NOT NULL,
                 review_text TEXT,
                 admin_response TEXT,
-                created_at TIMESTAMP NOT NULL,
+                created_at INTEGER NOT NULL,
                 FOREIGN KEY (user_id) REFERENCES users(user_id)
             )
         ''')
@@ -49,29 +152,231 @@ async def init_db():
                 username TEXT,
                 question_text TEXT NOT NULL,
                 admin_response TEXT,
-                created_at TIMESTAMP NOT NULL,
+                created_at INTEGER NOT NULL,
                 FOREIGN KEY (user_id) REFERENCES users(user_id)
             )
         ''')
+
+        # Даты, записанные предыдущими версиями бота строками, переводим в секунды (UTC)
+        await _migrate_created_at(db, 'reviews', 'review_id')
+        await _migrate_created_at(db, 'questions', 'question_id')
+
+        # Индексы для выборок истории пользователя и списков по дате
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_reviews_user_created ON reviews (user_id, created_at)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_reviews_created ON reviews (created_at)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_questions_user_created ON questions (user_id, created_at)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_questions_created ON questions (created_at)')
+
+        # Ключ отправки защищает от повторной записи при двойном нажатии
+        # или повторной доставке обновления
+        await _add_column_if_missing(db, 'reviews', 'submission_key', 'TEXT')
+        await _add_column_if_missing(db, 'questions', 'submission_key', 'TEXT')
+        await _require_submission_key(db, 'reviews', 'review_id')
+        await _require_submission_key(db, 'questions', 'question_id')
+        await db.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_submission
+            ON reviews (user_id, submission_key)
+        ''')
+        await db.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_submission
+            ON questions (user_id, submission_key)
+        ''')
+
+        # Счетчики обращений пользователей. Таблица поддерживается триггерами,
+        # поэтому меню фильтров читают одну строку вместо подсчета по таблицам.
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+        ) as cursor:
+            stats_exist = await cursor.fetchone() is not None
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INTEGER PRIMARY KEY,
+                reviews_total INTEGER NOT NULL DEFAULT 0,
+                reviews_answered INTEGER NOT NULL DEFAULT 0,
+                questions_total INTEGER NOT NULL DEFAULT 0,
+                questions_answered INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        await _create_stats_triggers(db, 'reviews')
+        await _create_stats_triggers(db, 'questions')
+        if not stats_exist:
+            # Заполняем счетчики по данным, записанным до появления таблицы
+            await db.execute('''
+                INSERT INTO user_stats (user_id, reviews_total, reviews_answered, questions_total, questions_answered)
+                SELECT user_id, SUM(reviews_total), SUM(reviews_answered), SUM(questions_total), SUM(questions_answered)
+                FROM (
+                    SELECT user_id, COUNT(*) AS reviews_total, COUNT(admin_response) AS reviews_answered,
+                           0 AS questions_total, 0 AS questions_answered
+                    FROM reviews GROUP BY user_id
+                    UNION ALL
+                    SELECT user_id, 0, 0, COUNT(*), COUNT(admin_response)
+                    FROM questions GROUP BY user_id
+                )
+                GROUP BY user_id
+            ''')
+
+        # Таблица временных захватов: администратор, который сейчас пишет ответ
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS reply_claims (
+                item_type TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                admin_id INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (item_type, item_id)
+            )
+        ''')
+
+        # Состояния FSM для SQLiteStorage (src/fsm_storage.py): общие для всех
+        # процессов-обработчиков. data - данные состояния в формате pickle.
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                bot_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                thread_id INTEGER NOT NULL,
+                destiny TEXT NOT NULL,
+                state TEXT,
+                data BLOB,
+                PRIMARY KEY (bot_id, chat_id, user_id, thread_id, destiny)
+            ) WITHOUT ROWID
+        ''')
+
+        # Сообщения бота в чатах, которые обслуживает другой процесс-обработчик
+        # (например, уведомления администраторам), для очистки чата его владельцем
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS tracked_messages (
+                bot_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                PRIMARY KEY (bot_id, chat_id, message_id)
+            ) WITHOUT ROWID
+        ''')
         await db.commit()
         
         # Проверяем и обновляем права супер-администратора
         await check_super_admin()
 
+async def _add_column_if_missing(db: aiosqlite.Connection, table: str, column: str, definition: str):
+    """
+    Добавляет столбец в существующую таблицу, если его еще нет.
+    Используется для обновления баз данных, созданных предыдущими версиями бота.
+
+    Args:
+        db (aiosqlite.Connection): Открытое подключение к базе данных
+        table (str): Имя таблицы
+        column (str): Имя столбца
+        definition (str): Тип и ограничения столбца
+    """
+    async with db.execute(f'PRAGMA table_info({table})') as cursor:
+        columns = [row[1] for row in await cursor.fetchall()]
+    if column not in columns:
+        await db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+async def _migrate_created_at(db: aiosqlite.Connection, table: str, id_column: str):
+    """
+    Переводит created_at, сохраненные строками (локальное время сервера),
+    в целое число секунд с начала эпохи (UTC). Уже переведенные записи не затрагиваются.
+
+    Args:
+        db (aiosqlite.Connection): Открытое подключение к базе данных
+        table (str): Имя таблицы
+        id_column (str): Имя столбца первичного ключа
+    """
+    async with db.execute(
+        f"SELECT {id_column}, created_at FROM {table} WHERE typeof(created_at) = 'text'"
+    ) as cursor:
+        rows = await cursor.fetchall()
+    if rows:
+        # Наивная дата трактуется как локальное время сервера, как ее и записывал datetime.now()
+        await db.executemany(
+            f'UPDATE {table} SET created_at = ? WHERE {id_column} = ?',
+            [(int(datetime.fromisoformat(created_at).timestamp()), item_id) for item_id, created_at in rows]
+        )
+
+async def _require_submission_key(db: aiosqlite.Connection, table: str, id_column: str):
+    """
+    Делает ключ отправки обязательным. Уникальный индекс (user_id, submission_key)
+    не сравнивает NULL между собой, поэтому запись без ключа обходила бы защиту от повторов.
+    Записям предыдущих версий бота присваивается ключ по их ID, а новые записи
+    без ключа отклоняются триггером: SQLite не умеет добавлять NOT NULL
+    к существующему столбцу без пересоздания таблицы.
+
+    Args:
+        db (aiosqlite.Connection): Открытое подключение к базе данных
+        table (str): Имя таблицы ('reviews' или 'questions')
+        id_column (str): Имя столбца первичного ключа
+    """
+    await db.execute(
+        f"UPDATE {table} SET submission_key = 'legacy:' || {id_column} WHERE submission_key IS NULL"
+    )
+    await db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_submission_key_insert BEFORE INSERT ON {table}
+        WHEN NEW.submission_key IS NULL
+        BEGIN
+            SELECT RAISE(ABORT, '{table}.submission_key is required');
+        END
+    ''')
+    await db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_submission_key_update BEFORE UPDATE OF submission_key ON {table}
+        WHEN NEW.submission_key IS NULL
+        BEGIN
+            SELECT RAISE(ABORT, '{table}.submission_key is required');
+        END
+    ''')
+
+async def _create_stats_triggers(db: aiosqlite.Connection, table: str):
+    """
+    Создает триггеры, которые поддерживают счетчики user_stats для таблицы
+    отзывов или вопросов: при добавлении, удалении и изменении ответа администратора.
+
+    Args:
+        db (aiosqlite.Connection): Открытое подключение к базе данных
+        table (str): Имя таблицы ('reviews' или 'questions')
+    """
+    total, answered = f'{table}_total', f'{table}_answered'
+    await db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO user_stats (user_id, {total}, {answered})
+            VALUES (NEW.user_id, 1, NEW.admin_response IS NOT NULL)
+            ON CONFLICT (user_id) DO UPDATE
+            SET {total} = {total} + 1, {answered} = {answered} + excluded.{answered};
+        END
+    ''')
+    await db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_delete AFTER DELETE ON {table}
+        BEGIN
+            UPDATE user_stats
+            SET {total} = {total} - 1, {answered} = {answered} - (OLD.admin_response IS NOT NULL)
+            WHERE user_id = OLD.user_id;
+        END
+    ''')
+    await db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_answer AFTER UPDATE OF admin_response ON {table}
+        WHEN (OLD.admin_response IS NULL) != (NEW.admin_response IS NULL)
+        BEGIN
+            UPDATE user_stats
+            SET {answered} = {answered} + (NEW.admin_response IS NOT NULL) - (OLD.admin_response IS NOT NULL)
+            WHERE user_id = NEW.user_id;
+        END
+    ''')
+
+@timed_query
 async def check_super_admin():
     """
     Проверяет и обновляет права супер-администратора.
     Если пользователь с ID из SUPER_ADMIN_ID существует, но его уровень админки не 4,
     то устанавливает уровень 4.
     """
-    if not SUPER_ADMIN_ID:
+    admin_id = super_admin_id.get()
+    if not admin_id:
         return
         
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         # Проверяем существование пользователя
         async with db.execute(
             'SELECT admin_level FROM users WHERE user_id = ?',
-            (SUPER_ADMIN_ID,)
+            (admin_id,)
         ) as cursor:
             user = await cursor.fetchone()
             
@@ -80,20 +385,21 @@ async def check_super_admin():
                 if user[0] != 4:
                     await db.execute(
                         'UPDATE users SET admin_level = 4 WHERE user_id = ?',
-                        (SUPER_ADMIN_ID,)
+                        (admin_id,)
                     )
                     await db.commit()
             else:
                 # Если пользователь не существует, создаем с уровнем 4
                 await db.execute(
                     'INSERT INTO users (user_id, admin_level) VALUES (?, 4)',
-                    (SUPER_ADMIN_ID,)
+                    (admin_id,)
                 )
                 await db.commit()
 
 # =============================================
 # Операции с пользователями
 # =============================================
+@timed_query
 async def add_user(user_id: int, username: str):
     """
     Добавляет нового пользователя в базу данных.
@@ -103,14 +409,15 @@ async def add_user(user_id: int, username: str):
         user_id (int): ID пользователя в Telegram
         username (str): Имя пользователя
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         await db.execute(
             'INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)',
             (user_id, username)
         )
         await db.commit()
 
-async def get_user(user_id: int):
+@timed_query
+async def get_user(user_id: int) -> Optional[User]:
     """
     Получает информацию о пользователе по его ID.
 
@@ -118,19 +425,33 @@ async def get_user(user_id: int):
         user_id (int): ID пользователя в Telegram
 
     Returns:
-        tuple: Кортеж с данными пользователя (user_id, username, admin_level, is_banned, ban_reason)
+        User: Данные пользователя (user_id, username, admin_level, is_banned, ban_reason)
         или None, если пользователь не найден
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        db.row_factory = _user_factory
         async with db.execute(
-            'SELECT * FROM users WHERE user_id = ?',
+            f'SELECT {USER_COLUMNS} FROM users WHERE user_id = ?',
             (user_id,)
         ) as cursor:
             return await cursor.fetchone()
 
+@timed_query
+async def get_admin_ids() -> List[int]:
+    """
+    Получает ID всех администраторов (уровень доступа больше 0).
+
+    Returns:
+        List[int]: Список ID администраторов
+    """
+    async with _connect() as db:
+        async with db.execute('SELECT user_id FROM users WHERE admin_level > 0') as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
 # =============================================
 # Управление блокировкой пользователей
 # =============================================
+@timed_query
 async def ban_user(user_id: int, reason: str):
     """
     Блокирует пользователя и устанавливает причину блокировки.
@@ -139,13 +460,14 @@ async def ban_user(user_id: int, reason: str):
         user_id (int): ID пользователя в Telegram
         reason (str): Причина блокировки
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         await db.execute(
             'UPDATE users SET is_banned = 1, ban_reason = ? WHERE user_id = ?',
             (reason, user_id)
         )
         await db.commit()
 
+@timed_query
 async def unban_user(user_id: int):
     """
     Разблокирует пользователя и удаляет причину блокировки.
@@ -153,7 +475,7 @@ async def unban_user(user_id: int):
     Args:
         user_id (int): ID пользователя в Telegram
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
         await db.execute(
             'UPDATE users SET is_banned = 0, ban_reason = NULL WHERE user_id = ?',
             (user_id,)
@@ -163,73 +485,88 @@ async def unban_user(user_id: int):
 # =============================================
 # Управление отзывами
 # =============================================
-async def create_review(user_id: int, username: str, rating: int, review_text: str = None):
+@timed_query
+async def create_review(
+    user_id: int,
+    username: str,
+    rating: int,
+    review_text: str = None,
+    submission_key: str = None
+):
     """
     Создает новый отзыв.
+    Если отзыв с таким же ключом отправки у пользователя уже есть,
+    запись не создается (INSERT OR IGNORE по уникальному индексу).
+    Без ключа отправки отзыву выдается новый ключ, и от повторов он не защищен.
 
     Args:
         user_id (int): ID пользователя
         username (str): Имя пользователя
         rating (int): Оценка (1-5)
         review_text (str, optional): Текст отзыва
+        submission_key (str, optional): Уникальный ключ отправки
         
     Returns:
-        int: ID созданного отзыва
+        int: ID созданного отзыва или None, если это повторная отправка
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    if submission_key is None:
+        submission_key = uuid4().hex
+    async with _connect() as db:
         cursor = await db.execute(
-            '''INSERT INTO reviews (user_id, username, rating, review_text, created_at)
-               VALUES (?, ?, ?, ?, ?)
+            '''INSERT OR IGNORE INTO reviews (user_id, username, rating, review_text, created_at, submission_key)
+               VALUES (?, ?, ?, ?, ?, ?)
                RETURNING review_id''',
-            (user_id, username, rating, review_text, datetime.now())
+            (user_id, username, rating, review_text, now_epoch(), submission_key)
         )
-        review_id = (await cursor.fetchone())[0]
+        row = await cursor.fetchone()
         await db.commit()
-        return review_id
+        return row[0] if row else None
 
-async def add_review_response(review_id: int, response: str):
+@timed_query
+async def add_review_response(review_id: int, response: str) -> bool:
     """
     Добавляет ответ администратора на отзыв.
+    Ответ записывается только если на отзыв еще никто не ответил,
+    поэтому поздний ответ второго администратора не перезапишет первый.
 
     Args:
         review_id (int): ID отзыва
         response (str): Текст ответа администратора
+
+    Returns:
+        bool: True если ответ сохранен, False если отзыв не найден или уже имеет ответ
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute(
-            'UPDATE reviews SET admin_response = ? WHERE review_id = ?',
+    async with _connect() as db:
+        cursor = await db.execute(
+            'UPDATE reviews SET admin_response = ? WHERE review_id = ? AND admin_response IS NULL',
             (response, review_id)
         )
         await db.commit()
+        return cursor.rowcount == 1
 
-async def can_leave_review_today(user_id: int) -> bool:
+@timed_query
+async def get_recent_review_times(user_id: int, limit: int) -> List[int]:
     """
-    Проверяет, может ли пользователь оставить отзыв сегодня.
-    
+    Получает время создания последних отзывов пользователя.
+    Используется для проверки квот на отзывы (см. src/quota.py).
+
     Args:
         user_id (int): ID пользователя
-        
+        limit (int): Сколько последних отзывов вернуть
+
     Returns:
-        bool: True если пользователь может оставить отзыв, False если уже оставлял сегодня
+        List[int]: Время создания в секундах с начала эпохи, от старых к новым
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Получаем дату последнего отзыва пользователя
+    async with _connect() as db:
+        # Обратный проход по индексу (user_id, created_at) без сортировки
         async with db.execute(
-            "SELECT created_at FROM reviews WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
-            (user_id,)
+            "SELECT created_at FROM reviews WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+            (user_id, limit)
         ) as cursor:
-            last_review = await cursor.fetchone()
-            
-            if not last_review:
-                return True  # Если отзывов нет, можно оставить
-                
-            last_review_date = datetime.fromisoformat(last_review[0])
-            today = datetime.now()
-            
-            # Проверяем, что последний отзыв был не сегодня
-            return last_review_date.date() < today.date()
+            return [row[0] for row in reversed(await cursor.fetchall())]
 
-async def get_user_reviews(user_id: int, with_responses_only: bool = False, sort_by_date: bool = True):
+@timed_query
+async def get_user_reviews(user_id: int, with_responses_only: bool = False, sort_by_date: bool = True) -> List[Review]:
     """
     Получает отзывы пользователя с возможностью фильтрации и сортировки.
     Если запрошены только отзывы с ответами, но их нет, автоматически возвращает все отзывы.
@@ -240,67 +577,85 @@ async def get_user_reviews(user_id: int, with_responses_only: bool = False, sort
         sort_by_date (bool): Если True, сортирует по дате (новые сверху)
         
     Returns:
-        list: Список отзывов пользователя
+        List[Review]: Список отзывов пользователя
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Сначала проверяем, есть ли отзывы с ответами, если запрошены только они
+    async with _connect() as db:
+        # Если ответов нет, вместо пустого списка показываем все отзывы
         if with_responses_only:
-            query = "SELECT * FROM reviews WHERE user_id = ? AND admin_response IS NOT NULL"
-            async with db.execute(query, (user_id,)) as cursor:
-                items = await cursor.fetchall()
-                if not items:  # Если нет отзывов с ответами, возвращаем все отзывы
+            async with db.execute(
+                'SELECT reviews_answered FROM user_stats WHERE user_id = ?',
+                (user_id,)
+            ) as cursor:
+                stats = await cursor.fetchone()
+                if not stats or not stats[0]:
                     with_responses_only = False
         
-        query = "SELECT * FROM reviews WHERE user_id = ?"
+        db.row_factory = _review_factory
+        query = f"SELECT {REVIEW_COLUMNS} FROM reviews WHERE user_id = ?"
         if with_responses_only:
             query += " AND admin_response IS NOT NULL"
         if sort_by_date:
-            query += " ORDER BY created_at DESC"
+            query += " ORDER BY created_at DESC, review_id DESC"
         async with db.execute(query, (user_id,)) as cursor:
             return await cursor.fetchall()
 
 # =============================================
 # Управление вопросами
 # =============================================
-async def create_question(user_id: int, username: str, question_text: str):
+@timed_query
+async def create_question(user_id: int, username: str, question_text: str, submission_key: str = None):
     """
     Создает новый вопрос.
+    Если вопрос с таким же ключом отправки у пользователя уже есть,
+    запись не создается (INSERT OR IGNORE по уникальному индексу).
+    Без ключа отправки вопросу выдается новый ключ, и от повторов он не защищен.
 
     Args:
         user_id (int): ID пользователя
         username (str): Имя пользователя
         question_text (str): Текст вопроса
+        submission_key (str, optional): Уникальный ключ отправки
         
     Returns:
-        int: ID созданного вопроса
+        int: ID созданного вопроса или None, если это повторная отправка
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    if submission_key is None:
+        submission_key = uuid4().hex
+    async with _connect() as db:
         cursor = await db.execute(
-            '''INSERT INTO questions (user_id, username, question_text, created_at)
-               VALUES (?, ?, ?, ?)
+            '''INSERT OR IGNORE INTO questions (user_id, username, question_text, created_at, submission_key)
+               VALUES (?, ?, ?, ?, ?)
                RETURNING question_id''',
-            (user_id, username, question_text, datetime.now())
+            (user_id, username, question_text, now_epoch(), submission_key)
         )
-        question_id = (await cursor.fetchone())[0]
+        row = await cursor.fetchone()
         await db.commit()
-        return question_id
+        return row[0] if row else None
 
-async def add_question_response(question_id: int, response: str):
+@timed_query
+async def add_question_response(question_id: int, response: str) -> bool:
     """
     Добавляет ответ администратора на вопрос.
+    Ответ записывается только если на вопрос еще никто не ответил,
+    поэтому поздний ответ второго администратора не перезапишет первый.
 
     Args:
         question_id (int): ID вопроса
         response (str): Текст ответа администратора
+
+    Returns:
+        bool: True если ответ сохранен, False если вопрос не найден или уже имеет ответ
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute(
-            'UPDATE questions SET admin_response = ? WHERE question_id = ?',
+    async with _connect() as db:
+        cursor = await db.execute(
+            'UPDATE questions SET admin_response = ? WHERE question_id = ? AND admin_response IS NULL',
             (response, question_id)
         )
         await db.commit()
+        return cursor.rowcount == 1
 
-async def get_user_questions(user_id: int, with_responses_only: bool = False, sort_by_date: bool = True):
+@timed_query
+async def get_user_questions(user_id: int, with_responses_only: bool = False, sort_by_date: bool = True) -> List[Question]:
     """
     Получает вопросы пользователя с возможностью фильтрации и сортировки.
     Если запрошены только вопросы с ответами, но их нет, автоматически возвращает все вопросы.
@@ -311,25 +666,48 @@ async def get_user_questions(user_id: int, with_responses_only: bool = False, so
         sort_by_date (bool): Если True, сортирует по дате (новые сверху)
         
     Returns:
-        list: Список вопросов пользователя
+        List[Question]: Список вопросов пользователя
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Сначала проверяем, есть ли вопросы с ответами, если запрошены только они
+    async with _connect() as db:
+        # Если ответов нет, вместо пустого списка показываем все вопросы
         if with_responses_only:
-            query = "SELECT * FROM questions WHERE user_id = ? AND admin_response IS NOT NULL"
-            async with db.execute(query, (user_id,)) as cursor:
-                items = await cursor.fetchall()
-                if not items:  # Если нет вопросов с ответами, возвращаем все вопросы
+            async with db.execute(
+                'SELECT questions_answered FROM user_stats WHERE user_id = ?',
+                (user_id,)
+            ) as cursor:
+                stats = await cursor.fetchone()
+                if not stats or not stats[0]:
                     with_responses_only = False
         
-        query = "SELECT * FROM questions WHERE user_id = ?"
+        db.row_factory = _question_factory
+        query = f"SELECT {QUESTION_COLUMNS} FROM questions WHERE user_id = ?"
         if with_responses_only:
             query += " AND admin_response IS NOT NULL"
         if sort_by_date:
-            query += " ORDER BY created_at DESC"
+            query += " ORDER BY created_at DESC, question_id DESC"
         async with db.execute(query, (user_id,)) as cursor:
             return await cursor.fetchall()
 
+@timed_query
+async def get_user_stats(user_id: int) -> UserStats:
+    """
+    Получает счетчики отзывов и вопросов пользователя одним запросом по первичному ключу.
+
+    Args:
+        user_id (int): ID пользователя
+
+    Returns:
+        UserStats: Всего отзывов/вопросов и сколько из них с ответами
+    """
+    async with _connect() as db:
+        async with db.execute(
+            'SELECT reviews_total, reviews_answered, questions_total, questions_answered '
+            'FROM user_stats WHERE user_id = ?',
+            (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return UserStats(*row) if row else UserStats()
+
 async def has_reviews_with_responses(user_id: int) -> bool:
     """
     Проверяет, есть ли у пользователя отзывы с ответами.
@@ -340,11 +718,7 @@ async def has_reviews_with_responses(user_id: int) -> bool:
     Returns:
         bool: True если есть отзывы с ответами, False если нет
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        query = "SELECT COUNT(*) FROM reviews WHERE user_id = ? AND admin_response IS NOT NULL"
-        async with db.execute(query, (user_id,)) as cursor:
-            count = await cursor.fetchone()
-            return count[0] > 0
+    return (await get_user_stats(user_id)).reviews_answered > 0
 
 async def has_questions_with_responses(user_id: int) -> bool:
     """
@@ -356,13 +730,10 @@ async def has_questions_with_responses(user_id: int) -> bool:
     Returns:
         bool: True если есть вопросы с ответами, False если нет
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        query = "SELECT COUNT(*) FROM questions WHERE user_id = ? AND admin_response IS NOT NULL"
-        async with db.execute(query, (user_id,)) as cursor:
-            count = await cursor.fetchone()
-            return count[0] > 0
+    return (await get_user_stats(user_id)).questions_answered > 0
 
-async def get_all_reviews(filter_type: str = "all") -> list:
+@timed_query
+async def get_all_reviews(filter_type: str = "all") -> List[Review]:
     """
     Получает все отзывы с возможностью фильтрации.
     
@@ -370,18 +741,20 @@ async def get_all_reviews(filter_type: str = "all") -> list:
         filter_type (str): Тип фильтрации ('all' или 'without_answers')
         
     Returns:
-        list: Список отзывов
+        List[Review]: Список отзывов
     """
-    query = "SELECT * FROM reviews"
+    query = f"SELECT {REVIEW_COLUMNS} FROM reviews"
     if filter_type == "without_answers":
         query += " WHERE admin_response IS NULL"
-    query += " ORDER BY created_at DESC"
+    query += " ORDER BY created_at DESC, review_id DESC"
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        db.row_factory = _review_factory
         async with db.execute(query) as cursor:
             return await cursor.fetchall()
 
-async def get_all_questions(filter_type: str = "all") -> list:
+@timed_query
+async def get_all_questions(filter_type: str = "all") -> List[Question]:
     """
     Получает все вопросы с возможностью фильтрации.
     
@@ -389,18 +762,20 @@ async def get_all_questions(filter_type: str = "all") -> list:
         filter_type (str): Тип фильтрации ('all' или 'without_answers')
         
     Returns:
-        list: Список вопросов
+        List[Question]: Список вопросов
     """
-    query = "SELECT * FROM questions"
+    query = f"SELECT {QUESTION_COLUMNS} FROM questions"
     if filter_type == "without_answers":
         query += " WHERE admin_response IS NULL"
-    query += " ORDER BY created_at DESC"
+    query += " ORDER BY created_at DESC, question_id DESC"
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        db.row_factory = _question_factory
         async with db.execute(query) as cursor:
             return await cursor.fetchall()
 
-async def get_review_by_id(review_id: int):
+@timed_query
+async def get_review_by_id(review_id: int) -> Optional[Review]:
     """
     Получает отзыв по его ID.
     
@@ -408,16 +783,18 @@ async def get_review_by_id(review_id: int):
         review_id (int): ID отзыва
         
     Returns:
-        tuple: Данные отзыва или None, если отзыв не найден
+        Review: Данные отзыва или None, если отзыв не найден
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        db.row_factory = _review_factory
         async with db.execute(
-            'SELECT * FROM reviews WHERE review_id = ?',
+            f'SELECT {REVIEW_COLUMNS} FROM reviews WHERE review_id = ?',
             (review_id,)
         ) as cursor:
             return await cursor.fetchone()
 
-async def get_questions_by_id(question_id: int):
+@timed_query
+async def get_questions_by_id(question_id: int) -> Optional[Question]:
     """
     Получает вопрос по его ID.
     
@@ -425,11 +802,114 @@ async def get_questions_by_id(question_id: int):
         question_id (int): ID вопроса
         
     Returns:
-        tuple: Данные вопроса или None, если вопрос не найден
+        Question: Данные вопроса или None, если вопрос не найден
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connect() as db:
+        db.row_factory = _question_factory
         async with db.execute(
-            'SELECT * FROM questions WHERE question_id = ?',
+            f'SELECT {QUESTION_COLUMNS} FROM questions WHERE question_id = ?',
             (question_id,)
         ) as cursor:
             return await cursor.fetchone()
+
+
+# =============================================
+# Захват обращений администраторами
+# =============================================
+@timed_query
+async def claim_reply(item_type: str, item_id: int, admin_id: int, ttl: float) -> bool:
+    """
+    Временно закрепляет отзыв или вопрос за администратором, который пишет ответ.
+    Захват удается, если обращение свободно, захват другого администратора истек
+    или обращение уже закреплено за этим же администратором (тогда захват продлевается).
+
+    Args:
+        item_type (str): Тип обращения ('reviews' или 'questions')
+        item_id (int): ID отзыва или вопроса
+        admin_id (int): ID администратора
+        ttl (float): Время действия захвата в секундах
+
+    Returns:
+        bool: True если обращение закреплено за администратором
+    """
+    now = time.time()
+    async with _connect() as db:
+        cursor = await db.execute(
+            '''INSERT INTO reply_claims (item_type, item_id, admin_id, expires_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT (item_type, item_id) DO UPDATE
+               SET admin_id = excluded.admin_id, expires_at = excluded.expires_at
+               WHERE reply_claims.admin_id = excluded.admin_id OR reply_claims.expires_at < ?''',
+            (item_type, item_id, admin_id, now + ttl, now)
+        )
+        await db.commit()
+        return cursor.rowcount == 1
+
+@timed_query
+async def release_reply_claim(item_type: str, item_id: int, admin_id: int):
+    """
+    Снимает захват обращения, если он принадлежит администратору.
+
+    Args:
+        item_type (str): Тип обращения ('reviews' или 'questions')
+        item_id (int): ID отзыва или вопроса
+        admin_id (int): ID администратора
+    """
+    async with _connect() as db:
+        await db.execute(
+            'DELETE FROM reply_claims WHERE item_type = ? AND item_id = ? AND admin_id = ?',
+            (item_type, item_id, admin_id)
+        )
+        await db.commit()
+
+# =============================================
+# Сообщения бота в чатах других процессов
+# =============================================
+@timed_query
+async def add_tracked_message(bot_id: int, chat_id: int, message_id: int, per_chat: int):
+    """
+    Запоминает сообщение, отправленное в чат, который обслуживает другой
+    процесс-обработчик (src/scaleout.py). В чате хранятся только последние сообщения.
+
+    Args:
+        bot_id (int): ID бота
+        chat_id (int): ID чата
+        message_id (int): ID сообщения
+        per_chat (int): Сколько последних сообщений хранить в чате
+    """
+    async with _connect() as db:
+        await db.execute(
+            'INSERT OR IGNORE INTO tracked_messages (bot_id, chat_id, message_id) VALUES (?, ?, ?)',
+            (bot_id, chat_id, message_id)
+        )
+        await db.execute(
+            '''DELETE FROM tracked_messages
+               WHERE bot_id = ? AND chat_id = ? AND message_id NOT IN (
+                   SELECT message_id FROM tracked_messages
+                   WHERE bot_id = ? AND chat_id = ?
+                   ORDER BY message_id DESC LIMIT ?
+               )''',
+            (bot_id, chat_id, bot_id, chat_id, per_chat)
+        )
+        await db.commit()
+
+@timed_query
+async def pop_tracked_messages(bot_id: int, chat_id: int) -> List[int]:
+    """
+    Возвращает и забывает сообщения бота в чате, отправленные другими процессами-обработчиками.
+
+    Args:
+        bot_id (int): ID бота
+        chat_id (int): ID чата
+
+    Returns:
+        List[int]: ID сообщений в порядке отправки
+    """
+    async with _connect() as db:
+        cursor = await db.execute(
+            'DELETE FROM tracked_messages WHERE bot_id = ? AND chat_id = ? RETURNING message_id',
+            (bot_id, chat_id)
+        )
+        rows = await cursor.fetchall()
+        await db.commit()
+        return sorted(row[0] for row in rows)
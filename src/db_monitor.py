@@ -0,0 +1,222 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.config import SLOW_QUERY_EXPLAIN, SLOW_QUERY_MS
+
+logger = logging.getLogger('bot.sql')
+
+
+def redact_params(parameters: Any) -> str:
+    """
+    Заменяет значения параметров запроса их типами, чтобы тексты отзывов,
+    вопросов и причин блокировки не попадали в логи.
+
+    Args:
+        parameters (Any): Параметры запроса (последовательность или словарь)
+
+    Returns:
+        str: Описание параметров, например "(int, str[12])"
+    """
+    def describe(value: Any) -> str:
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {describe(value)}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(describe(value) for value in parameters or ()) + ")"
+
+
+# =============================================
+# Журнал медленных запросов
+# =============================================
+class QueryMonitor:
+    """
+    Собирает время выполнения SQL-запросов и пишет в лог запросы,
+    которые выполнялись дольше порога. По требованию (explain=True) для медленного
+    запроса дополнительно снимается EXPLAIN QUERY PLAN: план каждого текста
+    запроса снимается один раз, так что полные сканирования таблиц видны сразу.
+
+    Время измеряется в потоке aiosqlite и включает выполнение запроса
+    и чтение всех его строк, но не ожидание в очереди подключения.
+    У каждого подключения свой поток, поэтому счетчики и кэш планов
+    изменяются под блокировкой.
+    """
+
+    def __init__(self, threshold_ms: float, explain: bool = False) -> None:
+        """
+        Args:
+            threshold_ms (float): Порог медленного запроса в миллисекундах
+            explain (bool): Снимать ли план выполнения медленных запросов
+        """
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.statements = 0
+        self.slow_statements = 0
+        self._plans: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        connection: sqlite3.Connection,
+        sql: str,
+        parameters: Any,
+        elapsed: float
+    ) -> None:
+        """
+        Учитывает выполненный запрос. Вызывается из потока подключения.
+
+        Args:
+            connection (sqlite3.Connection): Подключение, выполнившее запрос
+            sql (str): Текст запроса
+            parameters (Any): Параметры запроса
+            elapsed (float): Время выполнения в секундах
+        """
+        slow = elapsed >= self.threshold
+        with self._lock:
+            self.statements += 1
+            if slow:
+                self.slow_statements += 1
+        if not slow:
+            return
+
+        statement = " ".join(sql.split())
+        # Запрос выполняется в потоке aiosqlite, поэтому ID обновления
+        # берется из подключения, а не из контекста задачи
+        extra = {"update_id": getattr(connection, "update_id", None) or "-"}
+        logger.warning(
+            f"Медленный запрос ({elapsed * 1000:.1f} мс): {statement} "
+            f"параметры={redact_params(parameters)}",
+            extra=extra
+        )
+        if self.explain:
+            plan = self._explain(connection, sql, parameters)
+            if plan:
+                logger.warning("План запроса:\n" + "\n".join(plan), extra=extra)
+
+    def _explain(self, connection: sqlite3.Connection, sql: str, parameters: Any) -> Optional[List[str]]:
+        with self._lock:
+            if sql in self._plans:
+                return self._plans[sql]
+        try:
+            # Обычный курсор: без замера времени и без фабрики строк подключения
+            cursor = sqlite3.Cursor(connection)
+            cursor.row_factory = None
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        except sqlite3.Error:
+            # Некоторые запросы (PRAGMA, DDL) не поддерживают EXPLAIN QUERY PLAN
+            plan = None
+        else:
+            plan = [row[-1] for row in rows]
+        # План мог одновременно снять другой поток: в логе остается первый
+        with self._lock:
+            return self._plans.setdefault(sql, plan)
+
+
+# Общий монитор запросов
+query_monitor = QueryMonitor(SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN)
+
+
+# =============================================
+# Подключение с замером времени запросов
+# =============================================
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, измеряющий время каждого запроса вместе с чтением результата.
+    Запрос считается завершенным, когда прочитаны все строки, начат
+    следующий запрос, курсор или подключение закрыты.
+    """
+
+    _statement: Optional[Tuple[str, Any]] = None
+    _elapsed = 0.0
+
+    def _finish(self) -> None:
+        if self._statement is not None:
+            sql, parameters = self._statement
+            self._statement = None
+            query_monitor.record(self.connection, sql, parameters, self._elapsed)
+
+    def _run(self, method, sql: str, parameters: Any):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return method(self, sql, parameters)
+        finally:
+            self._elapsed = time.perf_counter() - started
+            self._statement = (sql, parameters)
+            if self.description is None:
+                # Запрос без результата (INSERT, UPDATE, DDL) уже выполнен полностью
+                self._finish()
+
+    def execute(self, sql: str, parameters: Any = ()):
+        return self._run(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def _timed_fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self._timed_fetch(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size: int = 1):
+        rows = self._timed_fetch(sqlite3.Cursor.fetchmany, size)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(sqlite3.Cursor.fetchall)
+        self._finish()
+        return rows
+
+    def close(self) -> None:
+        self._finish()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Подключение SQLite, все курсоры которого измеряют время запросов.
+    Передается в aiosqlite.connect(..., factory=InstrumentedConnection).
+    """
+
+    def __init__(self, *args, update_id: Optional[int] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.update_id = update_id  # ID обновления, для которого открыто подключение
+        self._cursors: "weakref.WeakSet[InstrumentedCursor]" = weakref.WeakSet()
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    def execute(self, sql: str, parameters: Any = ()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self) -> None:
+        # Завершаем учет запросов, результат которых прочитан не до конца
+        for cursor in list(self._cursors):
+            cursor._finish()
+        super().close()
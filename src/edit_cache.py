@@ -0,0 +1,142 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import (
+    DeleteMessage, DeleteMessages, EditMessageReplyMarkup, EditMessageText, SendMessage, TelegramMethod
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup, Message
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.config import EDIT_CACHE_SIZE
+
+
+# =============================================
+# Кэш содержимого сообщений
+# =============================================
+class EditFingerprintCache:
+    """
+    Помнит отпечаток (текст + клавиатура) последнего отображенного содержимого
+    каждого сообщения бота. Если новое редактирование совпадает с отпечатком,
+    вызов editMessageText можно не выполнять: Telegram все равно ответил бы
+    ошибкой "message is not modified".
+
+    В процессе-обработчике (src/scaleout.py) отпечатки хранятся только для чатов,
+    которые обслуживает этот процесс (owns_chat): сообщения в чужом чате может
+    изменить другой процесс, и отпечаток этого процесса устарел бы.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Args:
+            max_size (int): Сколько сообщений помнить одновременно
+        """
+        self.max_size = max_size
+        self._fingerprints: "OrderedDict[Tuple[int, int, int], int]" = OrderedDict()
+        self.calls_saved = 0  # Редактирования, пропущенные без запроса к API
+        self.calls_made = 0   # Редактирования, отправленные в API
+        # ID чата -> обслуживает ли его этот процесс (None - все чаты, один процесс)
+        self.owns_chat: Optional[Callable[[int], bool]] = None
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> int:
+        """
+        Вычисляет отпечаток содержимого сообщения.
+
+        Args:
+            text (str): Текст сообщения
+            reply_markup (InlineKeyboardMarkup, optional): Клавиатура сообщения
+
+        Returns:
+            int: Отпечаток содержимого
+        """
+        markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else None
+        return hash((text, markup))
+
+    def is_current(self, key: Tuple[int, int, int], fingerprint: int) -> bool:
+        """
+        Проверяет, отображается ли уже в сообщении такое содержимое.
+
+        Args:
+            key (Tuple[int, int, int]): (ID бота, ID чата, ID сообщения)
+            fingerprint (int): Отпечаток нового содержимого
+
+        Returns:
+            bool: True если содержимое не изменилось
+        """
+        if self.owns_chat is not None and not self.owns_chat(key[1]):
+            return False
+        if self._fingerprints.get(key) == fingerprint:
+            self._fingerprints.move_to_end(key)
+            return True
+        return False
+
+    def store(self, key: Tuple[int, int, int], fingerprint: int) -> None:
+        """
+        Запоминает отображаемое содержимое сообщения.
+
+        Args:
+            key (Tuple[int, int, int]): (ID бота, ID чата, ID сообщения)
+            fingerprint (int): Отпечаток содержимого
+        """
+        if self.owns_chat is not None and not self.owns_chat(key[1]):
+            return
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        if len(self._fingerprints) > self.max_size:
+            self._fingerprints.popitem(last=False)
+
+    def forget(self, key: Tuple[int, int, int]) -> None:
+        """
+        Забывает содержимое сообщения (сообщение удалено или изменено иначе).
+
+        Args:
+            key (Tuple[int, int, int]): (ID бота, ID чата, ID сообщения)
+        """
+        self._fingerprints.pop(key, None)
+
+
+class EditFingerprintMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: запоминает содержимое каждого отправленного
+    и отредактированного сообщения, в том числе правок в обход safe_edit_message.
+    Если сообщение удалено или изменено другим методом, отпечаток сбрасывается.
+    """
+
+    def __init__(self, cache: EditFingerprintCache) -> None:
+        self.cache = cache
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        if isinstance(method, (EditMessageReplyMarkup, DeleteMessage)):
+            self.cache.forget((bot.id, method.chat_id, method.message_id))
+        elif isinstance(method, DeleteMessages):
+            for message_id in method.message_ids:
+                self.cache.forget((bot.id, method.chat_id, message_id))
+
+        result = await make_request(bot, method)
+
+        if isinstance(method, (SendMessage, EditMessageText)) and isinstance(result, Message):
+            self.cache.store(
+                (bot.id, result.chat.id, result.message_id),
+                self.cache.fingerprint(method.text, method.reply_markup)
+            )
+        return result
+
+
+# Общий кэш содержимого сообщений
+edit_cache = EditFingerprintCache(EDIT_CACHE_SIZE)
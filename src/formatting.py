@@ -1,14 +1,67 @@
 from datetime import datetime
+from functools import lru_cache
+import time
 
-def format_datetime(datetime_str: str) -> str:
+from pytz import timezone
+
+from src.config import TIMEZONE
+
+# Часовой пояс, в котором пользователям показываются даты и считаются сутки
+LOCAL_TZ = timezone(TIMEZONE)
+
+
+def now_epoch() -> int:
+    """
+    Возвращает текущее время в формате, в котором даты хранятся в базе данных.
+
+    Returns:
+        int: Количество секунд с начала эпохи (UTC)
+    """
+    return int(time.time())
+
+
+def from_epoch(value: int) -> datetime:
+    """
+    Преобразует время из базы данных в дату с часовым поясом бота.
+
+    Args:
+        value (int): Количество секунд с начала эпохи (UTC)
+
+    Returns:
+        datetime: Дата и время в часовом поясе LOCAL_TZ
     """
-    Форматирует строку с датой и временем.
-    Преобразует ISO формат в читаемый формат даты и времени.
-    
+    return datetime.fromtimestamp(value, LOCAL_TZ)
+
+
+def local_day_start(value: int = None) -> int:
+    """
+    Возвращает начало суток (00:00 в часовом поясе бота), в которые попадает момент времени.
+
     Args:
-        datetime_str (str): Строка с датой и временем в формате ISO
-        
+        value (int, optional): Момент времени в секундах с начала эпохи (по умолчанию - сейчас)
+
+    Returns:
+        int: Начало суток в секундах с начала эпохи (UTC)
+    """
+    local = from_epoch(now_epoch() if value is None else value)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return int(LOCAL_TZ.localize(midnight).timestamp())
+
+
+@lru_cache(maxsize=4096)
+def _format_minute(minute: int) -> str:
+    return from_epoch(minute * 60).strftime("%d.%m.%Y %H:%M")
+
+
+def format_datetime(value: datetime) -> str:
+    """
+    Форматирует дату и время в читаемый вид в часовом поясе бота.
+    Результат кэшируется по минутам, так как секунды не отображаются.
+
+    Args:
+        value (datetime): Дата и время (уже разобранные при чтении из базы данных)
+
     Returns:
         str: Отформатированная дата и время в формате "дд.мм.гггг чч:мм"
     """
-    return datetime.fromisoformat(datetime_str).strftime("%d.%m.%Y %H:%M") 
\ No newline at end of file
+    return _format_minute(int(value.timestamp()) // 60)
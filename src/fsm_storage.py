@@ -0,0 +1,117 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+import pickle
+from typing import Any, Dict, Optional
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.db_monitor import InstrumentedConnection
+
+# Сколько запись ждет освобождения базы другим процессом
+BUSY_TIMEOUT_MS = 5000
+
+
+# =============================================
+# Хранилище состояний FSM в базе данных
+# =============================================
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в таблице fsm_states базы данных бота (создается в init_db).
+    База работает в режиме WAL, поэтому состояния видны всем процессам-обработчикам
+    (src/scaleout.py) и переживают перезапуск обработчика.
+
+    Данные состояния сохраняются через pickle. Обработчики кладут в них только
+    ключи (ID обращений, фильтры, номер страницы), а не строки базы данных,
+    поэтому запись остается маленькой при каждом переходе по страницам.
+    Все состояния процесса пишутся через одно подключение: запись и commit
+    выполняются под блокировкой, чтобы commit одного пользователя
+    не фиксировал половину изменений другого. Пустые записи (без состояния и данных) удаляются, поэтому таблица
+    хранит только пользователей посреди диалога.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Путь к базе данных бота
+        """
+        self.path = path
+        self._db: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    async def _connection(self) -> aiosqlite.Connection:
+        """Открывает подключение при первом обращении и держит его до close()"""
+        if self._db is None:
+            async with self._lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.path, factory=InstrumentedConnection)
+                    # WAL: чтение состояний не ждет записи других процессов;
+                    # при занятой базе запись ждет до 5 секунд, а не падает сразу
+                    await db.execute('PRAGMA journal_mode=WAL')
+                    await db.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+                    self._db = db
+        return self._db
+
+    @staticmethod
+    def _key(key: StorageKey) -> tuple:
+        # NULL в первичном ключе не сравнивается, поэтому сообщения вне темы хранятся с thread_id = 0
+        return key.bot_id, key.chat_id, key.user_id, key.thread_id or 0, key.destiny
+
+    async def _write(self, key: StorageKey, column: str, value: Any, empty: bool) -> None:
+        db = await self._connection()
+        async with self._write_lock:
+            await db.execute(
+                f'''INSERT INTO fsm_states (bot_id, chat_id, user_id, thread_id, destiny, {column})
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (bot_id, chat_id, user_id, thread_id, destiny)
+                    DO UPDATE SET {column} = excluded.{column}''',
+                (*self._key(key), value)
+            )
+            if empty:
+                await db.execute(
+                    '''DELETE FROM fsm_states
+                       WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND thread_id = ? AND destiny = ?
+                         AND state IS NULL AND data IS NULL''',
+                    self._key(key)
+                )
+            await db.commit()
+
+    async def _read(self, key: StorageKey, column: str) -> Any:
+        db = await self._connection()
+        async with db.execute(
+            f'''SELECT {column} FROM fsm_states
+                WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND thread_id = ? AND destiny = ?''',
+            self._key(key)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._write(key, "state", value, value is None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._read(key, "state")
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        value = pickle.dumps(data, pickle.HIGHEST_PROTOCOL) if data else None
+        await self._write(key, "data", value, value is None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self._read(key, "data")
+        return pickle.loads(value) if value else {}
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
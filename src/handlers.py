@@ -0,0 +1,472 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import logging
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import F, Router, types
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+
+# =============================================
+# Локальные модули
+# =============================================
+from src.admin.admin_utils import export_questions_excel, export_reviews_excel
+from src.admin.main_admin import (
+    AdminHistoryStates,
+    display_admin_history,
+    handle_admin_cancel_reply,
+    handle_admin_questions,
+    handle_admin_reply,
+    handle_admin_reply_text,
+    handle_admin_reviews,
+    release_pending_reply,
+    show_admin_history_page,
+    show_admin_questions,
+    show_admin_reviews
+)
+from src.database import (
+    create_question, create_review, get_admin_ids, get_review_by_id,
+    get_user_questions, get_user_reviews
+)
+from src.keyboards import (
+    get_back_keyboard, get_filter_type_keyboard, get_history_type_keyboard,
+    get_main_keyboard, get_notification_keyboard, get_pagination_keyboard,
+    get_review_options_keyboard, get_sort_type_keyboard, get_star_rating_keyboard
+)
+from src.messages import *
+from src.quota import review_quota
+from src.rendering import LAYOUT_ADMIN, render_card
+from src.utils import (
+    check_admin_rights, check_review_limit, check_user_ban, check_user_rights,
+    format_question, format_review, handle_main_menu, handle_text_message,
+    safe_edit_message, split_items_into_pages, start_submission, submission_locks
+)
+
+# Нажатия кнопок пишутся в отдельный логгер, чтобы их можно было прореживать (LOG_SAMPLING)
+actions_logger = logging.getLogger('bot.actions')
+
+# Добавляем состояния для FSM
+class ReviewStates(StatesGroup):
+    """Состояния для процесса создания отзыва"""
+    waiting_for_review_text = State()
+
+class QuestionStates(StatesGroup):
+    """Состояния для процесса создания вопроса"""
+    waiting_for_question_text = State()
+
+class HistoryStates(StatesGroup):
+    """Состояния для просмотра истории"""
+    waiting_for_history_type = State()
+    waiting_for_filter_type = State()
+    waiting_for_sort_type = State()
+
+async def cmd_start(message: types.Message, state: FSMContext):
+    """
+    Обработчик команды /start.
+    """
+    # Администратор ушел из ожидания ответа: освобождаем обращение
+    if await release_pending_reply(state, message.from_user.id):
+        await state.clear()
+    await handle_main_menu(message, is_start=True)
+
+async def handle_back_to_main(callback: types.CallbackQuery, state: FSMContext):
+    """
+    Обработчик возврата в главное меню.
+    """
+    # Очищаем состояние вместе с выбранной оценкой
+    # (и освобождаем обращение, если администратор писал ответ)
+    await release_pending_reply(state, callback.from_user.id)
+    await state.clear()
+
+    # Проверяем права администратора
+    if await check_admin_rights(callback.message):
+        return
+    
+    await handle_main_menu(callback, is_start=False)
+
+async def delete_notification(callback: types.CallbackQuery, state: FSMContext):
+    # Удаляем уведомление при нажатии кнопки OK
+    await callback.message.delete()
+    
+# =============================================
+# Обработчик нажатий на кнопки администратора
+# =============================================
+async def process_admin_callback(callback: types.CallbackQuery, state: FSMContext):
+    
+    if await check_user_rights(callback.message):
+        return
+    # Любая кнопка, кроме отмены и нового ответа, уводит администратора из ожидания ответа
+    if callback.data != "admin_cancel_reply" and not callback.data.startswith("admin_reply_"):
+        await release_pending_reply(state, callback.from_user.id)
+    elif callback.data == "admin_history_reviews":
+        await handle_admin_reviews(callback, state)
+    elif callback.data == "admin_history_questions":
+        await handle_admin_questions(callback, state)
+    elif callback.data == "admin_export_reviews_excel":
+        await export_reviews_excel(callback)
+    elif callback.data == "admin_export_questions_excel":
+        await export_questions_excel(callback)
+    elif callback.data == "admin_show_all_reviews":
+        await show_admin_reviews(callback, state, "all")
+    elif callback.data == "admin_show_all_reviews_without_answers":
+        await show_admin_reviews(callback, state, "without_answers")
+    elif callback.data == "admin_show_all_questions":
+        await show_admin_questions(callback, state, "all")
+    elif callback.data == "admin_show_all_questions_without_answers":
+        await show_admin_questions(callback, state, "without_answers")
+    elif callback.data.startswith("admin_sort_new_"):
+        parts = callback.data.split("_")
+        history_type = parts[3]
+        filter_type = parts[4]
+        await display_admin_history(callback, state, "new")
+    elif callback.data.startswith("admin_sort_old_"):
+        parts = callback.data.split("_")
+        history_type = parts[3]
+        filter_type = parts[4]
+        await display_admin_history(callback, state, "old")
+    elif callback.data.startswith("admin_page_"):
+        parts = callback.data.split("_")
+        page = int(parts[2])
+        history_type = parts[3]
+        filter_type = parts[4]
+        data = await state.get_data()
+        await state.update_data(current_page=page)
+        await show_admin_history_page(callback, state)
+    elif callback.data.startswith("admin_back_to_filter_"):
+        history_type = callback.data.split("_")[3]
+        if history_type == "reviews":
+            await handle_admin_reviews(callback, state)
+        else:
+            await handle_admin_questions(callback, state)
+    elif callback.data.startswith("admin_back_to_sort_"):
+        parts = callback.data.split("_")
+        history_type = parts[4]
+        filter_type = parts[5]
+        if history_type == "reviews":
+            await show_admin_reviews(callback, state, filter_type)
+        else:
+            await show_admin_questions(callback, state, filter_type)
+    elif callback.data.startswith("admin_reply_"):
+        await handle_admin_reply(callback, state)
+    elif callback.data == "admin_cancel_reply":
+        await handle_admin_cancel_reply(callback, state)
+    elif callback.data.startswith("admin_back_to_history_"):
+        history_type = callback.data.split("_")[3]
+        if history_type == "reviews":
+            await show_admin_reviews(callback, state, "all")
+        else:
+            await show_admin_questions(callback, state, "all")
+
+
+# =============================================
+# Обработчик нажатий на кнопки пользователя
+# =============================================
+async def process_callback(callback: types.CallbackQuery, state: FSMContext):
+    """
+    Обработчик нажатий на инлайн кнопки.
+    Обрабатывает различные действия пользователя через кнопки меню.
+    
+    Args:
+        callback (types.CallbackQuery): Объект callback-запроса от кнопки
+        state (FSMContext): Контекст состояния FSM
+    """
+    user_id = callback.from_user.id
+    username = callback.from_user.username or callback.from_user.first_name
+
+    # Администратор ушел из ожидания ответа в меню пользователя
+    await release_pending_reply(state, user_id)
+    
+    # Проверяем права администратора
+    if await check_admin_rights(callback.message):
+        return
+
+    # Проверяем блокировку пользователя только для создания отзывов и вопросов
+    if callback.data in ["leave_review", "ask_question"]:
+        if await check_user_ban(user_id):
+            await safe_edit_message(
+                callback.message,
+                BANNED_USER_ERROR,
+                reply_markup=get_main_keyboard()
+            )
+            return
+
+    # Логируем действие пользователя
+    actions_logger.info(LOG_USER_ACTION.format(user_id=user_id, callback_data=callback.data))
+    
+    # Создаем клавиатуру с кнопкой "Назад"
+    back_keyboard = get_back_keyboard()
+    
+    # Обрабатываем различные типы действий
+    if callback.data == "leave_review":
+        # Проверяем, может ли пользователь оставить отзыв сегодня
+        if not await check_review_limit(user_id, callback.message, back_keyboard):
+            return
+            
+        # Пользователь хочет оставить отзыв
+        await safe_edit_message(
+            callback.message,
+            REVIEW_START_TEXT,
+            reply_markup=get_star_rating_keyboard()
+        )
+    elif callback.data.startswith("rating_"):
+        # Проверяем, может ли пользователь оставить отзыв сегодня
+        if not await check_review_limit(user_id, callback.message, back_keyboard):
+            return
+            
+        # Пользователь выбрал оценку
+        rating = int(callback.data.split("_")[1])
+        await state.set_state(ReviewStates.waiting_for_review_text)
+        await start_submission(state)
+        # Оценка хранится в данных состояния до отправки отзыва
+        await state.update_data(rating=rating)
+        await safe_edit_message(
+            callback.message,
+            get_review_rating_text(rating),
+            reply_markup=get_review_options_keyboard()
+        )
+    elif callback.data == "skip_review_text":
+        # Двойное нажатие обрабатывается по очереди: второе нажатие
+        # увидит уже очищенный рейтинг или будет отклонено по ключу отправки
+        async with submission_locks(user_id):
+            # Проверяем, может ли пользователь оставить отзыв сегодня
+            if not await check_review_limit(user_id, callback.message, back_keyboard):
+                return
+                
+            # Пользователь решил не писать отзыв
+            data = await state.get_data()
+            rating = data.get("rating")
+            if not rating:
+                return
+            submission_key = data.get("submission_key")
+            review_id = await create_review(user_id, username, rating, submission_key=submission_key)
+            await state.clear()
+            if review_id is None:
+                # Отзыв с этим ключом уже сохранен
+                return
+            review_quota.record(user_id)
+            await safe_edit_message(
+                callback.message,
+                SUCCESS_RATING_TEXT,
+                reply_markup=get_main_keyboard()
+            )
+            
+            # Получаем данные отзыва и формируем текст уведомления
+            review = await get_review_by_id(review_id)
+            notification_text = render_card(LAYOUT_ADMIN, review)
+            
+        # Получаем всех администраторов и отправляем им уведомления
+        for admin_id in await get_admin_ids():
+            try:
+                await callback.bot.send_message(admin_id, notification_text, reply_markup=get_notification_keyboard())
+            except:
+                continue
+    elif callback.data == "ask_question":
+        # Пользователь хочет задать вопрос
+        await state.set_state(QuestionStates.waiting_for_question_text)
+        await start_submission(state)
+        await safe_edit_message(
+            callback.message,
+            QUESTION_START_TEXT,
+            reply_markup=back_keyboard
+        )
+    elif callback.data == "my_reviews":
+        # Пользователь хочет посмотреть историю
+        await state.set_state(HistoryStates.waiting_for_history_type)
+        await safe_edit_message(
+            callback.message,
+            HISTORY_CHOOSE_TYPE_TEXT,
+            reply_markup=get_history_type_keyboard()
+        )
+    elif callback.data == "back_to_history":
+        # Возвращаемся к выбору типа истории
+        await state.set_state(HistoryStates.waiting_for_history_type)
+        await safe_edit_message(
+            callback.message,
+            HISTORY_CHOOSE_TYPE_TEXT,
+            reply_markup=get_history_type_keyboard()
+        )
+    elif callback.data.startswith("history_"):
+        # Пользователь выбрал тип истории
+        history_type = callback.data.split("_")[1]  # 'reviews' или 'questions'
+        await state.set_state(HistoryStates.waiting_for_filter_type)
+        await safe_edit_message(
+            callback.message,
+            HISTORY_CHOOSE_FILTER_TEXT.format(history_type=HISTORY_TYPE_NAMES[history_type]),
+            reply_markup=await get_filter_type_keyboard(history_type, user_id)
+        )
+    elif callback.data.startswith("filter_"):
+        # Пользователь выбрал фильтр
+        _, filter_type, history_type = callback.data.split("_")
+        await state.set_state(HistoryStates.waiting_for_sort_type)
+        await safe_edit_message(
+            callback.message,
+            HISTORY_CHOOSE_SORT_TEXT.format(history_type=HISTORY_TYPE_NAMES[history_type]),
+            reply_markup=get_sort_type_keyboard(history_type, filter_type)
+        )
+    elif callback.data.startswith("sort_"):
+        # Пользователь выбрал сортировку
+        _, sort_type, history_type, filter_type = callback.data.split("_")
+        user_id = callback.from_user.id
+        
+        # Получаем данные в зависимости от выбранных параметров
+        if history_type == "reviews":
+            items = await get_user_reviews(
+                user_id,
+                with_responses_only=(filter_type == "responses"),
+                sort_by_date=(sort_type == "new")
+            )
+            if not items:
+                text = HISTORY_NO_REVIEWS_TEXT
+                keyboard = get_back_keyboard("back_to_history")
+            else:
+                # Разбиваем на страницы
+                pages = split_items_into_pages(items, format_review)
+                current_page = pages[0]
+                text = HISTORY_REVIEWS_HEADER + "".join(current_page)
+                
+                # Создаем клавиатуру с пагинацией
+                keyboard = get_pagination_keyboard(
+                    page_number=1,
+                    total_pages=len(pages),
+                    history_type=history_type,
+                    filter_type=filter_type,
+                    sort_type=sort_type
+                )
+        else:  # questions
+            items = await get_user_questions(
+                user_id,
+                with_responses_only=(filter_type == "responses"),
+                sort_by_date=(sort_type == "new")
+            )
+            if not items:
+                text = HISTORY_NO_QUESTIONS_TEXT
+                keyboard = get_back_keyboard("back_to_history")
+            else:
+                # Разбиваем на страницы
+                pages = split_items_into_pages(items, format_question)
+                current_page = pages[0]
+                text = HISTORY_QUESTIONS_HEADER + "".join(current_page)
+                
+                # Создаем клавиатуру с пагинацией
+                keyboard = get_pagination_keyboard(
+                    page_number=1,
+                    total_pages=len(pages),
+                    history_type=history_type,
+                    filter_type=filter_type,
+                    sort_type=sort_type
+                )
+        
+        await safe_edit_message(
+            callback.message,
+            text,
+            reply_markup=keyboard
+        )
+    elif callback.data.startswith("page_"):
+        # Обработка переключения страниц
+        _, page_number, history_type, filter_type, sort_type = callback.data.split("_")
+        page_number = int(page_number)
+        user_id = callback.from_user.id
+        
+        # Получаем данные в зависимости от выбранных параметров
+        if history_type == "reviews":
+            items = await get_user_reviews(
+                user_id,
+                with_responses_only=(filter_type == "responses"),
+                sort_by_date=(sort_type == "new")
+            )
+            pages = split_items_into_pages(items, format_review)
+            text = HISTORY_REVIEWS_HEADER + "".join(pages[page_number-1])
+        else:  # questions
+            items = await get_user_questions(
+                user_id,
+                with_responses_only=(filter_type == "responses"),
+                sort_by_date=(sort_type == "new")
+            )
+            pages = split_items_into_pages(items, format_question)
+            text = HISTORY_QUESTIONS_HEADER + "".join(pages[page_number-1])
+        
+        # Создаем клавиатуру с пагинацией
+        keyboard = get_pagination_keyboard(
+            page_number=page_number,
+            total_pages=len(pages),
+            history_type=history_type,
+            filter_type=filter_type,
+            sort_type=sort_type
+        )
+        
+        await safe_edit_message(
+            callback.message,
+            text,
+            reply_markup=keyboard
+        )
+    elif callback.data.startswith("back_to_filter_"):
+        # Возвращаемся к выбору фильтра
+        history_type = callback.data.split("_")[-1]
+        await state.set_state(HistoryStates.waiting_for_filter_type)
+        await safe_edit_message(
+            callback.message,
+            HISTORY_CHOOSE_FILTER_TEXT.format(history_type=HISTORY_TYPE_NAMES[history_type]),
+            reply_markup=await get_filter_type_keyboard(history_type, user_id)
+        )
+
+# =============================================
+# Обработчики текстовых сообщений
+# =============================================
+async def process_review_text(message: types.Message, state: FSMContext):
+    """
+    Обработчик текста отзыва.
+    """
+    await handle_text_message(
+        message=message,
+        state=state,
+        create_func=create_review,
+        success_text=SUCCESS_REVIEW_TEXT,
+        error_text=ERROR_TEXT,
+        with_rating=True
+    )
+
+async def process_question_text(message: types.Message, state: FSMContext):
+    """
+    Обработчик текста вопроса.
+    """
+    await handle_text_message(
+        message=message,
+        state=state,
+        create_func=create_question,
+        success_text=SUCCESS_QUESTION_TEXT,
+        error_text=ERROR_TEXT
+    )
+
+async def process_admin_reply(message: types.Message, state: FSMContext):
+    await handle_admin_reply_text(message, state)
+
+# =============================================
+# Регистрация обработчиков
+# =============================================
+def create_router() -> Router:
+    """
+    Создает роутер со всеми обработчиками бота.
+    Роутер создается для каждого экземпляра бота (см. create_app в src/app.py),
+    потому что один роутер можно подключить только к одному диспетчеру.
+
+    Returns:
+        Router: Роутер с обработчиками команд, кнопок и текстовых сообщений
+    """
+    router = Router(name="emoneybot")
+
+    router.message.register(cmd_start, Command("start"))
+
+    router.callback_query.register(handle_back_to_main, F.data == "back_to_main")
+    router.callback_query.register(delete_notification, F.data == "delete_notification")
+    router.callback_query.register(process_admin_callback, F.data.startswith("admin_"))
+    # Остальные кнопки (регистрируется последним)
+    router.callback_query.register(process_callback)
+
+    router.message.register(process_review_text, ReviewStates.waiting_for_review_text)
+    router.message.register(process_question_text, QuestionStates.waiting_for_question_text)
+    router.message.register(process_admin_reply, StateFilter(AdminHistoryStates.waiting_for_reply))
+    return router
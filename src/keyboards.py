@@ -1,6 +1,9 @@
 # =============================================
 # Импорт необходимых библиотек
 # =============================================
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from src.messages import (
     BUTTON_BACK, BUTTON_SHOW_ALL, BUTTON_WITH_RESPONSES,
@@ -8,9 +11,84 @@ from src.messages import (
 )
 from src.database import has_questions_with_responses, has_reviews_with_responses
 
+# =============================================
+# Реестр кэшируемых клавиатур
+# =============================================
+# Статические клавиатуры создаются один раз, параметризованные - кэшируются
+# по значениям аргументов. Клавиатуры aiogram - изменяемые pydantic-модели
+# (frozen=False), поэтому кэш хранит образец, а каждый вызов получает его копию:
+# правка полученной клавиатуры (новая кнопка, другой текст) не меняет клавиатуру
+# для остальных обработчиков, пользователей и ботов.
+_keyboard_registry: Dict[str, Callable] = {}
+
+# Сколько вариантов каждой параметризованной клавиатуры хранить.
+# Аргументы часто приходят из callback_data, поэтому кэш всегда ограничен.
+KEYBOARD_CACHE_SIZE = 1024
+
+
+# Поля кнопки, которые хранят строки или флаги: такую кнопку достаточно скопировать поверхностно
+_PLAIN_BUTTON_FIELDS = frozenset((
+    "text", "url", "callback_data", "switch_inline_query", "switch_inline_query_current_chat", "pay"
+))
+
+
+def _copy_markup(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    """
+    Копирует клавиатуру: строки и кнопки - новые объекты. Кнопки с вложенными
+    объектами (web_app, login_url и т.п.) копируются полностью. Это в несколько раз
+    быстрее, чем model_copy(deep=True) или повторная сборка с валидацией.
+
+    Args:
+        markup (InlineKeyboardMarkup): Образец из кэша
+
+    Returns:
+        InlineKeyboardMarkup: Независимая копия
+    """
+    return markup.model_copy(update={"inline_keyboard": [
+        [
+            button.model_copy(deep=not button.model_fields_set <= _PLAIN_BUTTON_FIELDS)
+            for button in row
+        ]
+        for row in markup.inline_keyboard
+    ]})
+
+
+def cached_keyboard(maxsize: Optional[int] = None) -> Callable:
+    """
+    Декоратор, который кэширует результат функции-конструктора клавиатуры
+    и регистрирует ее в реестре клавиатур. Каждый вызов возвращает новую
+    копию кэшированной клавиатуры, поэтому ее можно свободно изменять.
+
+    Args:
+        maxsize (int, optional): Размер кэша (None - без ограничения, для статических клавиатур)
+    """
+    def decorator(func: Callable) -> Callable:
+        cached = lru_cache(maxsize=maxsize)(func)
+        _keyboard_registry[func.__qualname__] = cached
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> InlineKeyboardMarkup:
+            return _copy_markup(cached(*args, **kwargs))
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
+
+
+def keyboard_cache_info() -> Dict[str, tuple]:
+    """
+    Возвращает статистику кэша по каждой зарегистрированной клавиатуре.
+
+    Returns:
+        Dict[str, tuple]: Имя функции -> (hits, misses, maxsize, currsize)
+    """
+    return {name: func.cache_info() for name, func in _keyboard_registry.items()}
+
 # =============================================
 # Основная клавиатура
 # =============================================
+@cached_keyboard()
 def get_main_keyboard() -> InlineKeyboardMarkup:
     """
     Создает основную клавиатуру бота с кнопками для взаимодействия.
@@ -31,6 +109,7 @@ def get_main_keyboard() -> InlineKeyboardMarkup:
 # =============================================
 # Клавиатура с оценками
 # =============================================
+@cached_keyboard()
 def get_star_rating_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с оценками в виде звезд от 1 до 5.
@@ -50,6 +129,7 @@ def get_star_rating_keyboard() -> InlineKeyboardMarkup:
 # =============================================
 # Клавиатура с опциями для отзыва
 # =============================================
+@cached_keyboard()
 def get_review_options_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с опциями для отзыва.
@@ -65,6 +145,7 @@ def get_review_options_keyboard() -> InlineKeyboardMarkup:
 # =============================================
 # Клавиатура для выбора типа истории
 # =============================================
+@cached_keyboard()
 def get_history_type_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора типа истории (отзывы или вопросы).
@@ -92,18 +173,29 @@ async def get_filter_type_keyboard(history_type: str, user_id: int) -> InlineKey
         history_type (str): Тип истории ('reviews' или 'questions')
         user_id (int): ID пользователя
     """
-    keyboard = []
-    
-    # Добавляем кнопку "Показать все"
-    keyboard.append([InlineKeyboardButton(text=BUTTON_SHOW_ALL, callback_data=f"filter_all_{history_type}")])
-    
     # Проверяем наличие отзывов/вопросов с ответами
-    has_responses = False
     if history_type == "reviews":
         has_responses = await has_reviews_with_responses(user_id)
     else:  # questions
         has_responses = await has_questions_with_responses(user_id)
     
+    return _build_filter_type_keyboard(history_type, has_responses)
+
+
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
+def _build_filter_type_keyboard(history_type: str, has_responses: bool) -> InlineKeyboardMarkup:
+    """
+    Строит клавиатуру выбора фильтра. Каждый вариант создается один раз.
+    
+    Args:
+        history_type (str): Тип истории ('reviews' или 'questions')
+        has_responses (bool): Показывать ли кнопку "Только с ответами"
+    """
+    keyboard = []
+    
+    # Добавляем кнопку "Показать все"
+    keyboard.append([InlineKeyboardButton(text=BUTTON_SHOW_ALL, callback_data=f"filter_all_{history_type}")])
+    
     # Добавляем кнопку "Только с ответами" только если есть отзывы/вопросы с ответами
     if has_responses:
         keyboard.append([InlineKeyboardButton(text=BUTTON_WITH_RESPONSES, callback_data=f"filter_responses_{history_type}")])
@@ -116,6 +208,7 @@ async def get_filter_type_keyboard(history_type: str, user_id: int) -> InlineKey
 # =============================================
 # Клавиатура для выбора сортировки
 # =============================================
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_sort_type_keyboard(history_type: str, filter_type: str) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора сортировки.
@@ -134,6 +227,7 @@ def get_sort_type_keyboard(history_type: str, filter_type: str) -> InlineKeyboar
 # =============================================
 # Клавиатура для навигации по страницам
 # =============================================
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_pagination_keyboard(page_number: int, total_pages: int, history_type: str, filter_type: str, sort_type: str) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для навигации по страницам.
@@ -183,6 +277,7 @@ def get_pagination_keyboard(page_number: int, total_pages: int, history_type: st
 # =============================================
 # Клавиатура с кнопкой "Назад"
 # =============================================
+@cached_keyboard(maxsize=KEYBOARD_CACHE_SIZE)
 def get_back_keyboard(callback_data: str = "back_to_main") -> InlineKeyboardMarkup:
     """
     Создает клавиатуру с кнопкой "Назад".
@@ -195,4 +290,19 @@ def get_back_keyboard(callback_data: str = "back_to_main") -> InlineKeyboardMark
     """
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=BUTTON_BACK, callback_data=callback_data)]
-    ]) 
\ No newline at end of file
+    ]) 
+
+# =============================================
+# Клавиатура для уведомлений
+# =============================================
+@cached_keyboard()
+def get_notification_keyboard() -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру уведомления с кнопкой "OK", которая удаляет уведомление.
+    
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с кнопкой "OK"
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ OK", callback_data="delete_notification")]
+    ])
@@ -0,0 +1,115 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Coroutine, Dict, Hashable, List, Set
+
+
+# =============================================
+# Блокировки по ключу
+# =============================================
+class KeyedLock:
+    """
+    Набор асинхронных блокировок, адресуемых по ключу (например, по ID пользователя).
+    Блокировка создается при первом обращении и удаляется, как только ее никто
+    не удерживает и не ожидает, поэтому память не растет с числом пользователей.
+    Ожидающие получают блокировку в порядке очереди (FIFO).
+    """
+
+    def __init__(self) -> None:
+        # ключ -> [блокировка, количество владельцев и ожидающих]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    @asynccontextmanager
+    async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        Захватывает блокировку для указанного ключа на время блока `async with`.
+
+        Args:
+            key (Hashable): Ключ блокировки
+        """
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def locked(self, key: Hashable) -> bool:
+        """
+        Проверяет, захвачена ли блокировка для ключа.
+
+        Args:
+            key (Hashable): Ключ блокировки
+
+        Returns:
+            bool: True если блокировка удерживается
+        """
+        entry = self._locks.get(key)
+        return bool(entry and entry[0].locked())
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# =============================================
+# Ограниченный набор задач
+# =============================================
+class BoundedTaskSet:
+    """
+    Набор фоновых задач ограниченного размера. Если в наборе уже `limit`
+    незавершенных задач, spawn() ждет завершения одной из них, поэтому
+    тот, кто создает задачи (цикл опроса Telegram), приостанавливается,
+    а число задач и занятая ими память не растут.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        Args:
+            limit (int): Сколько задач может выполняться одновременно
+        """
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def spawn(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """
+        Запускает корутину задачей, дождавшись свободного места в наборе.
+
+        Args:
+            coro (Coroutine): Корутина для запуска
+
+        Returns:
+            asyncio.Task: Запущенная задача
+        """
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            coro.close()
+            raise
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._slots.release()
+
+    def full(self) -> bool:
+        """True если новая задача будет ждать освобождения места"""
+        return self._slots.locked()
+
+    async def wait(self) -> None:
+        """Ждет завершения всех задач набора"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,172 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import json
+import logging
+import queue
+import random
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.tracing import UpdateContextFilter
+
+
+# =============================================
+# Форматирование и фильтры
+# =============================================
+class JsonFormatter(logging.Formatter):
+    """Записывает каждую запись лога одной строкой JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "update_id": getattr(record, "update_id", None),
+            "message": record.getMessage(),
+        }
+        if entry["update_id"] == "-":
+            entry["update_id"] = None
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только часть записей шумных логгеров (например, каждое нажатие кнопки).
+    Записи уровня ERROR и выше пропускаются всегда.
+    """
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        """
+        Args:
+            rates (Dict[str, float]): Имя логгера -> доля пропускаемых записей (от 0 до 1).
+                Правило действует и на дочерние логгеры ("bot" -> "bot.sql").
+        """
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            # Ищем правило для самого близкого родительского логгера
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Обработчик, который только кладет запись в очередь: запись в поток
+    или файл выполняет QueueListener в отдельном потоке. Если очередь
+    переполнена, запись отбрасывается, а не блокирует цикл событий.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# =============================================
+# Настройка логирования
+# =============================================
+class LogPipeline:
+    """Запущенный конвейер логирования: обработчик очереди, фильтр выборки и поток записи"""
+
+    def __init__(self, handler: DroppingQueueHandler, sampling: SamplingFilter, listener: QueueListener) -> None:
+        self.handler = handler
+        self.sampling = sampling
+        self.listener = listener
+
+    def stop(self) -> None:
+        """Дописывает оставшиеся в очереди записи и останавливает поток записи"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+def setup_logging(
+    level: str,
+    fmt: str,
+    datefmt: str,
+    json_format: bool = False,
+    log_file: Optional[str] = None,
+    max_bytes: int = 0,
+    backup_count: int = 0,
+    queue_size: int = 0,
+    sampling: Optional[Dict[str, float]] = None
+) -> LogPipeline:
+    """
+    Настраивает корневой логгер: записи кладутся в очередь, а выводятся
+    в stderr и (если задан log_file) в файл с ротацией отдельным потоком,
+    поэтому запись лога не блокирует цикл событий.
+
+    ID обновления и выборка шумных логгеров применяются до постановки в очередь:
+    ID берется из контекста задачи, а отброшенные записи не занимают очередь.
+
+    Args:
+        level (str): Уровень логирования
+        fmt (str): Формат текстовых логов
+        datefmt (str): Формат даты текстовых логов
+        json_format (bool): Писать записи в формате JSON (одна запись - одна строка)
+        log_file (str, optional): Файл лога (None - только stderr)
+        max_bytes (int): Размер файла, после которого он ротируется (0 - без ротации)
+        backup_count (int): Сколько старых файлов хранить
+        queue_size (int): Размер очереди записей (0 - без ограничения)
+        sampling (Dict[str, float], optional): Доля пропускаемых записей по логгерам
+
+    Returns:
+        LogPipeline: Конвейер логирования (stop() при завершении работы)
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(fmt, datefmt)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(UpdateContextFilter())
+    sampling_filter = SamplingFilter(sampling or {})
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return LogPipeline(queue_handler, sampling_filter, listener)
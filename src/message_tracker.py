@@ -0,0 +1,158 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import DeleteMessage, DeleteMessages, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.config import TRACKED_CHATS_LIMIT, TRACKED_MESSAGES_PER_CHAT
+from src.database import add_tracked_message
+
+logger = logging.getLogger('bot.messages')
+
+
+# =============================================
+# Учет отправленных ботом сообщений
+# =============================================
+class MessageTracker:
+    """
+    Хранит ID последних сообщений, отправленных ботом в каждый чат.
+    Для каждого чата ведется кольцевой буфер ограниченного размера,
+    число чатов также ограничено (давно неактивные чаты вытесняются первыми).
+    Ключ чата включает ID бота, чтобы несколько ботов не смешивали свои сообщения.
+
+    В процессе-обработчике (src/scaleout.py) в памяти учитываются только чаты,
+    которые обслуживает этот процесс (owns_chat). Сообщения в чужие чаты,
+    например уведомления администраторам, записываются в базу данных,
+    и процесс-владелец чата забирает их при очистке (pop_tracked_messages).
+    """
+
+    def __init__(self, per_chat: int, max_chats: int) -> None:
+        """
+        Args:
+            per_chat (int): Сколько последних сообщений помнить в каждом чате
+            max_chats (int): Сколько чатов помнить одновременно
+        """
+        self.per_chat = per_chat
+        self.max_chats = max_chats
+        self._chats: "OrderedDict[Tuple[int, int], Deque[int]]" = OrderedDict()
+        # ID чата -> обслуживает ли его этот процесс (None - все чаты, один процесс)
+        self.owns_chat: Optional[Callable[[int], bool]] = None
+
+    @property
+    def sharded(self) -> bool:
+        """True если чаты распределены между процессами-обработчиками"""
+        return self.owns_chat is not None
+
+    def is_local(self, chat_id: int) -> bool:
+        """
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            bool: True если сообщения чата учитываются в памяти этого процесса
+        """
+        return self.owns_chat is None or self.owns_chat(chat_id)
+
+    def add(self, bot_id: int, chat_id: int, message_id: int) -> None:
+        """
+        Запоминает сообщение бота в чате.
+
+        Args:
+            bot_id (int): ID бота
+            chat_id (int): ID чата
+            message_id (int): ID сообщения
+        """
+        key = (bot_id, chat_id)
+        ring = self._chats.get(key)
+        if ring is None:
+            ring = self._chats[key] = deque(maxlen=self.per_chat)
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(key)
+        if message_id not in ring:
+            ring.append(message_id)
+
+    def discard(self, bot_id: int, chat_id: int, message_ids: Iterable[int]) -> None:
+        """
+        Забывает сообщения, которые уже удалены.
+
+        Args:
+            bot_id (int): ID бота
+            chat_id (int): ID чата
+            message_ids (Iterable[int]): ID удаленных сообщений
+        """
+        ring = self._chats.get((bot_id, chat_id))
+        if ring is None:
+            return
+        for message_id in message_ids:
+            if message_id in ring:
+                ring.remove(message_id)
+        if not ring:
+            del self._chats[(bot_id, chat_id)]
+
+    def pop_all(self, bot_id: int, chat_id: int) -> List[int]:
+        """
+        Возвращает и забывает все известные сообщения бота в чате.
+
+        Args:
+            bot_id (int): ID бота
+            chat_id (int): ID чата
+
+        Returns:
+            List[int]: ID сообщений в порядке отправки
+        """
+        ring = self._chats.pop((bot_id, chat_id), None)
+        return list(ring) if ring else []
+
+
+class MessageTrackerMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: запоминает ID каждого сообщения, которое вернул
+    Bot API (sendMessage, sendDocument, editMessageText и т.д.), и забывает
+    сообщения после их удаления.
+    """
+
+    def __init__(self, tracker: MessageTracker) -> None:
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        # Сессия возвращает уже разобранный результат метода (Message, bool и т.д.)
+        result = await make_request(bot, method)
+
+        if isinstance(result, Message):
+            if self.tracker.is_local(result.chat.id):
+                self.tracker.add(bot.id, result.chat.id, result.message_id)
+            else:
+                try:
+                    await add_tracked_message(bot.id, result.chat.id, result.message_id, self.tracker.per_chat)
+                except Exception as e:
+                    # Сообщение уже отправлено: без учета оно просто не удалится при очистке чата
+                    logger.warning(f"Не удалось запомнить сообщение {result.message_id} в чате {result.chat.id}: {e}")
+        elif isinstance(method, DeleteMessage) and result:
+            self.tracker.discard(bot.id, method.chat_id, (method.message_id,))
+        elif isinstance(method, DeleteMessages) and result:
+            self.tracker.discard(bot.id, method.chat_id, method.message_ids)
+        return result
+
+
+# Общий учет сообщений бота
+message_tracker = MessageTracker(TRACKED_MESSAGES_PER_CHAT, TRACKED_CHATS_LIMIT)
@@ -75,6 +75,8 @@ REVIEW_LIMIT_TEXT = (
     "🔄 Чтобы обеспечить объективность оценок, новый отзыв можно будет оставить позже."
 )
 
+THROTTLE_TEXT = "⏳ Слишком быстро! Пожалуйста, подождите немного."
+
 BANNED_USER_ERROR = (
     "⚠️ Упс! Что-то пошло не так...\n\n"
     "🔧 К сожалению, в данный момент система не может обработать ваш запрос.\n\n"
@@ -144,6 +146,20 @@ QUESTION_FORMAT = (
     "{admin_response}" 
 )
 
+REVIEW_TEXT_FORMAT = "\n\n💭 Отзыв: {}"
+ADMIN_RESPONSE_FORMAT = "\n\n💬 Ответ администратора: {}"
+
+# Заголовки уведомлений пользователю об ответе администратора
+REVIEW_ANSWER_NOTIFICATION_HEADER = (
+    "✨ На ваш отзыв №{review_id} получен ответ!\n"
+    "─────────────────────\n"
+)
+
+QUESTION_ANSWER_NOTIFICATION_HEADER = (
+    "🤔 На ваш вопрос №{question_id} получен ответ!\n"
+    "─────────────────────\n"
+)
+
 # =============================================
 # Тексты для приветствий
 # =============================================
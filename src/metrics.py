@@ -0,0 +1,299 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.tracing import record_span
+
+# Границы корзин гистограмм задержек по умолчанию (в секундах)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Все зарегистрированные метрики в порядке создания
+_registry: List[Any] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# =============================================
+# Типы метрик
+# =============================================
+class Counter:
+    """Счетчик, который только увеличивается (например, число ошибок)"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        """
+        Args:
+            name (str): Имя метрики в формате Prometheus
+            documentation (str): Описание метрики
+            labelnames (Sequence[str]): Имена меток
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        _registry.append(self)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            *labels (str): Значения меток в порядке labelnames
+            amount (float): На сколько увеличить
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма распределения значений (например, задержек в секундах)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        """
+        Args:
+            name (str): Имя метрики в формате Prometheus
+            documentation (str): Описание метрики
+            labelnames (Sequence[str]): Имена меток
+            buckets (Sequence[float]): Верхние границы корзин по возрастанию
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [количество в каждой корзине (последняя - +Inf), сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Учитывает одно наблюдение.
+
+        Args:
+            value (float): Наблюдаемое значение
+            *labels (str): Значения меток в порядке labelnames
+        """
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def collect(self) -> Iterable[str]:
+        bucket_labels = self.labelnames + ("le",)
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_labels, labels + (_format_value(bound),))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+class CallbackMetric:
+    """
+    Метрика, значение которой читается в момент запроса /metrics
+    (размеры очередей, счетчики попаданий в кэши и т.п.).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ) -> None:
+        """
+        Args:
+            name (str): Имя метрики в формате Prometheus
+            documentation (str): Описание метрики
+            func (Callable): Возвращает значение или словарь {значения меток: значение}
+            labelnames (Sequence[str]): Имена меток
+            kind (str): Тип метрики ('gauge' или 'counter')
+        """
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        _registry.append(self)
+
+    def collect(self) -> Iterable[str]:
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+def render_metrics() -> str:
+    """
+    Формирует текст всех метрик в формате Prometheus (text exposition format 0.0.4).
+
+    Returns:
+        str: Текст для ответа на /metrics
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# =============================================
+# Основные метрики бота
+# =============================================
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика обновления", ("handler",)
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Исключения в обработчиках обновлений", ("handler", "error")
+)
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_duration_seconds", "Время выполнения функции src/database.py", ("query",)
+)
+DB_QUERY_ERRORS = Counter(
+    "bot_db_query_errors_total", "Ошибки функций src/database.py", ("query", "error")
+)
+API_LATENCY = Histogram(
+    "bot_api_request_duration_seconds", "Время запроса к Bot API", ("method",)
+)
+API_ERRORS = Counter(
+    "bot_api_errors_total", "Ошибки запросов к Bot API", ("method", "error")
+)
+LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds", "Задержка планирования задач в цикле событий"
+)
+LOOP_STALLS = Counter(
+    "bot_event_loop_stalls_total", "Блокировки цикла событий дольше LOOP_BLOCK_THRESHOLD_MS"
+)
+TENANT_UPDATES = Counter(
+    "bot_tenant_updates_total", "Обновления, полученные экземпляром бота", ("tenant",)
+)
+TENANT_UPDATE_LATENCY = Histogram(
+    "bot_tenant_update_duration_seconds", "Время обработки обновления экземпляром бота", ("tenant",)
+)
+UPDATES_FORWARDED = Counter(
+    "bot_updates_forwarded_total", "Обновления, переданные процессом приема обработчикам", ("worker",)
+)
+
+
+def timed_query(func: Callable) -> Callable:
+    """
+    Декоратор для функций src/database.py: измеряет время выполнения
+    и считает ошибки, используя имя функции как метку query.
+    Время также записывается в трассировку текущего обновления.
+    """
+    name = func.__name__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            DB_QUERY_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - started, name)
+            record_span(f"db.{name}", started)
+
+    return wrapper
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: измеряет время каждого запроса к Bot API
+    и считает ошибки по методам.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, name)
+            record_span(f"api.{name}", started)
+
+
+# =============================================
+# HTTP-сервер метрик
+# =============================================
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Запускает HTTP-сервер с метриками по адресу http://host:port/metrics.
+
+    Args:
+        host (str): Адрес для прослушивания
+        port (int): Порт для прослушивания
+
+    Returns:
+        web.AppRunner: Запущенный сервер (для остановки через cleanup())
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
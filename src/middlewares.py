@@ -0,0 +1,358 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.database import database_path, super_admin_id
+from src.locks import BoundedTaskSet, KeyedLock
+from src.messages import THROTTLE_TEXT
+from src.metrics import HANDLER_ERRORS, HANDLER_LATENCY, TENANT_UPDATE_LATENCY, TENANT_UPDATES
+from src.tracing import record_span
+
+logger = logging.getLogger('bot')
+
+
+# =============================================
+# Планировщик обработки обновлений
+# =============================================
+class BackpressureMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений, который регистрируется первым и ограничивает
+    число принятых, но еще не обработанных обновлений.
+
+    run_polling запускает опрос с handle_as_tasks=False и передает в данные
+    обновления набор задач `update_tasks` (BoundedTaskSet на MAX_PENDING_UPDATES).
+    Middleware запускает обработку обновления задачей из этого набора и возвращает
+    управление циклу опроса. Если набор заполнен, middleware ждет освобождения места,
+    и цикл опроса не запрашивает у Telegram новые обновления: очередь не растет.
+
+    При прямом вызове dp.feed_update (бенчмарки, процессы-обработчики src/scaleout.py)
+    набора нет, и обновление обрабатывается сразу.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        tasks: Optional[BoundedTaskSet] = data.get("update_tasks")
+        if tasks is None:
+            return await handler(event, data)
+        await tasks.spawn(self._process(handler, event, data))
+        return None
+
+    @staticmethod
+    async def _process(
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> None:
+        try:
+            await handler(event, data)
+        except Exception as e:
+            # Ошибку больше некому передать: цикл опроса уже получает следующие обновления
+            logger.error(f"Ошибка при обработке обновления {event.update_id}: {e}", exc_info=True)
+
+
+class SchedulerMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений, который управляет параллельной обработкой.
+
+    - Обновления разных пользователей обрабатываются параллельно.
+    - Обновления одного пользователя выполняются строго по очереди,
+      в порядке поступления (FIFO-блокировка на пользователя).
+    - Общее число одновременно работающих обработчиков ограничено семафором:
+      лишние обновления ждут своей очереди, а не открывают новые подключения к БД.
+
+    Регистрируется на `dp.update.outer_middleware` после встроенных middleware aiogram,
+    поэтому пользователь события уже доступен в `data["event_from_user"]`.
+    """
+
+    def __init__(self, max_concurrent: int, semaphore: Optional[asyncio.Semaphore] = None) -> None:
+        """
+        Args:
+            max_concurrent (int): Максимальное число одновременно обрабатываемых обновлений
+            semaphore (asyncio.Semaphore, optional): Общий семафор нескольких экземпляров бота
+                в одном процессе (None - собственный семафор на max_concurrent обновлений)
+        """
+        self.max_concurrent = max_concurrent
+        self._semaphore = semaphore or asyncio.Semaphore(max_concurrent)
+        self._user_locks = KeyedLock()
+        self.pending = 0    # Обновления, ожидающие своей очереди
+        self.in_flight = 0  # Обновления, которые обрабатываются прямо сейчас
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        # Служебные обновления без пользователя упорядочивать не нужно
+        user_lock = self._user_locks(user.id) if user else nullcontext()
+
+        self.pending += 1
+        started = False
+        queued_at = time.perf_counter()
+        try:
+            async with user_lock:
+                async with self._semaphore:
+                    # Обновление покинуло очередь и занимает слот обработки
+                    record_span("queue_wait", queued_at)
+                    self.pending -= 1
+                    self.in_flight += 1
+                    started = True
+                    # Встроенный FSM-middleware aiogram прочитал состояние до очереди.
+                    # Пока обновление ждало, предыдущее обновление пользователя
+                    # могло его изменить, поэтому перечитываем состояние под блокировкой.
+                    try:
+                        state = data.get("state")
+                        if state is not None:
+                            data["raw_state"] = await state.get_state()
+                        return await handler(event, data)
+                    finally:
+                        self.in_flight -= 1
+        finally:
+            if not started:
+                self.pending -= 1
+
+
+# =============================================
+# Ограничение частоты запросов (anti-flood)
+# =============================================
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений, ограничивающий частоту нажатий и команд.
+
+    Для каждой пары (пользователь, правило) ведется корзина токенов (token bucket):
+    каждое действие расходует один токен, токены пополняются с заданной скоростью.
+    Правило выбирается по самому длинному совпадающему префиксу callback_data
+    или текста сообщения. Правило по умолчанию не применяется к сообщениям,
+    отправленным в состоянии FSM: это ввод текста отзыва, вопроса или ответа,
+    и терять его нельзя. Если токенов нет, обработчик не вызывается:
+    на callback отправляется короткий ответ, на сообщение - одно предупреждение
+    за период исчерпания лимита, чтобы ответы не умножали флуд.
+
+    Регистрируется до SchedulerMiddleware, чтобы лишние обновления
+    не занимали очередь обработки.
+    """
+
+    # Через сколько добавлений корзин запускать очистку неактивных
+    PRUNE_EVERY = 1000
+
+    def __init__(
+        self,
+        rules: Dict[str, Tuple[float, float]],
+        default: Optional[Tuple[float, float]] = None
+    ) -> None:
+        """
+        Args:
+            rules (Dict[str, Tuple[float, float]]): Префикс -> (емкость корзины, токенов в секунду)
+            default (Tuple[float, float], optional): Правило для остальных действий
+                (None - остальные действия не ограничиваются)
+        """
+        # Длинные префиксы проверяем первыми: "admin_page_" важнее "admin_"
+        self.rules = sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+        self.default = default
+        # (user_id, префикс) -> [токены, время последнего обновления, предупрежден ли]
+        self._buckets: Dict[Tuple[int, str], list] = {}
+        self._added = 0
+        self.throttled = 0
+
+    def _match_rule(
+        self,
+        key: str,
+        use_default: bool = True
+    ) -> Optional[Tuple[str, Tuple[float, float]]]:
+        for prefix, rule in self.rules:
+            if key.startswith(prefix):
+                return prefix, rule
+        if use_default and self.default is not None:
+            return "", self.default
+        return None
+
+    def _consume(self, user_id: int, prefix: str, capacity: float, rate: float) -> bool:
+        """
+        Списывает токен из корзины пользователя.
+
+        Returns:
+            bool: True если действие разрешено, False если лимит превышен
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get((user_id, prefix))
+        if bucket is None:
+            self._buckets[(user_id, prefix)] = [capacity - 1, now, False]
+            self._added += 1
+            if self._added >= self.PRUNE_EVERY:
+                self._prune(now)
+            return True
+
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        bucket[2] = False
+        return True
+
+    def _should_warn(self, user_id: int, prefix: str) -> bool:
+        """
+        Проверяет, нужно ли предупредить пользователя об отклоненном сообщении.
+        Предупреждение отправляется один раз, пока корзина не пополнится.
+        """
+        bucket = self._buckets.get((user_id, prefix))
+        if bucket is None or bucket[2]:
+            return False
+        bucket[2] = True
+        return True
+
+    def _prune(self, now: float) -> None:
+        """
+        Удаляет корзины, которые уже успели полностью наполниться:
+        их состояние ничем не отличается от новой корзины.
+        """
+        self._added = 0
+        for key, (tokens, updated_at, _) in list(self._buckets.items()):
+            match = self._match_rule(key[1])
+            capacity, rate = match[1] if match else (0, 0)
+            if not rate or tokens + (now - updated_at) * rate >= capacity:
+                del self._buckets[key]
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if event.callback_query:
+            action = event.callback_query.data or ""
+            use_default = True
+        elif event.message:
+            action = event.message.text or ""
+            # Сообщение в состоянии FSM - это ввод пользователя, а не флуд
+            use_default = data.get("raw_state") is None
+        else:
+            return await handler(event, data)
+
+        user: User = data.get("event_from_user")
+        match = self._match_rule(action, use_default)
+        if user is None or match is None:
+            return await handler(event, data)
+
+        prefix, (capacity, rate) = match
+        if self._consume(user.id, prefix, capacity, rate):
+            return await handler(event, data)
+
+        self.throttled += 1
+        if event.callback_query:
+            # Короткий ответ на callback не создает новых сообщений в чате
+            await event.callback_query.answer(THROTTLE_TEXT)
+        elif self._should_warn(user.id, prefix):
+            await event.message.answer(THROTTLE_TEXT)
+        return None
+
+
+# =============================================
+# База данных экземпляра бота
+# =============================================
+class DatabaseContextMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений: на время обработки обновления задает
+    базу данных и супер-администратора экземпляра бота (src/database.py).
+    Регистрируется первым, поэтому все обращения к базе при обработке
+    обновления идут в базу того экземпляра, которому обновление адресовано.
+    """
+
+    def __init__(self, path: str, admin_id: int) -> None:
+        """
+        Args:
+            path (str): Путь к файлу базы данных экземпляра
+            admin_id (int): ID супер-администратора экземпляра (0 - не задан)
+        """
+        self.path = path
+        self.admin_id = admin_id
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        path_token = database_path.set(self.path)
+        admin_token = super_admin_id.set(self.admin_id)
+        try:
+            return await handler(event, data)
+        finally:
+            super_admin_id.reset(admin_token)
+            database_path.reset(path_token)
+
+
+class TenantMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений: считает обновления экземпляра бота
+    и полное время их обработки (с ожиданием в очереди) с меткой tenant.
+    """
+
+    def __init__(self, tenant: str) -> None:
+        """
+        Args:
+            tenant (str): Имя экземпляра бота
+        """
+        self.tenant = tenant
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        TENANT_UPDATES.inc(self.tenant)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            TENANT_UPDATE_LATENCY.observe(time.perf_counter() - started, self.tenant)
+
+
+# =============================================
+# Метрики обработчиков
+# =============================================
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware (регистрируется на dp.message и dp.callback_query):
+    измеряет время работы каждого обработчика и считает исключения.
+    Время ожидания в очереди SchedulerMiddleware сюда не входит.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+            record_span(f"handler.{name}", started)
@@ -0,0 +1,190 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.config import QUOTA_CACHE_SIZE, REVIEW_QUOTAS
+from src.database import database_path, get_recent_review_times
+from src.formatting import local_day_start, now_epoch
+
+
+# =============================================
+# Политики квот
+# =============================================
+class QuotaPolicy(ABC):
+    """
+    Политика квоты: не более `limit` отправок начиная с момента window_start().
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        Args:
+            limit (int): Сколько отправок разрешено в окне
+        """
+        if limit < 1:
+            raise ValueError("Лимит квоты должен быть не меньше 1")
+        self.limit = limit
+
+    @abstractmethod
+    def window_start(self, now: int) -> int:
+        """
+        Возвращает начало окна, в котором считаются отправки.
+
+        Args:
+            now (int): Текущее время в секундах с начала эпохи
+
+        Returns:
+            int: Начало окна в секундах с начала эпохи
+        """
+
+
+class CalendarDayQuota(QuotaPolicy):
+    """Не более N отправок за календарные сутки в часовом поясе бота (TIMEZONE)"""
+
+    def window_start(self, now: int) -> int:
+        return local_day_start(now)
+
+
+class RollingQuota(QuotaPolicy):
+    """Не более N отправок за скользящее окно заданной длины"""
+
+    def __init__(self, limit: int, window: int) -> None:
+        """
+        Args:
+            limit (int): Сколько отправок разрешено в окне
+            window (int): Длина окна в секундах
+        """
+        super().__init__(limit)
+        self.window = window
+
+    def window_start(self, now: int) -> int:
+        return now - self.window + 1
+
+
+def build_policies(rules: Iterable[Tuple]) -> List[QuotaPolicy]:
+    """
+    Создает политики квот из настроек вида ("day", N) или ("rolling", N, секунды).
+
+    Args:
+        rules (Iterable[Tuple]): Правила из конфигурации
+
+    Returns:
+        List[QuotaPolicy]: Политики квот
+    """
+    policies = []
+    for kind, *args in rules:
+        if kind == "day":
+            policies.append(CalendarDayQuota(*args))
+        elif kind == "rolling":
+            policies.append(RollingQuota(*args))
+        else:
+            raise ValueError(f"Неизвестный тип квоты: {kind}")
+    return policies
+
+
+# =============================================
+# Учет отправок пользователей
+# =============================================
+class SubmissionQuota:
+    """
+    Проверяет квоты отправок за постоянное время.
+
+    Для каждого пользователя в памяти хранится кольцевой буфер с временем
+    последних K отправок, где K - наибольший лимит среди политик. Политика
+    с лимитом N нарушена, если N-я с конца отправка попала в текущее окно,
+    поэтому проверка не зависит от числа отправок пользователя.
+
+    При первом обращении буфер заполняется одним запросом к базе данных
+    по индексу (user_id, created_at); число пользователей в памяти ограничено.
+    """
+
+    def __init__(
+        self,
+        policies: Sequence[QuotaPolicy],
+        loader: Callable[[int, int], Awaitable[List[int]]],
+        max_users: int,
+        scope: Optional[Callable[[], Hashable]] = None
+    ) -> None:
+        """
+        Args:
+            policies (Sequence[QuotaPolicy]): Политики, которые должны выполняться одновременно
+            loader (Callable): Функция (user_id, limit) -> время последних отправок от старых к новым
+            max_users (int): Сколько пользователей помнить одновременно
+            scope (Callable, optional): Возвращает источник данных текущего вызова
+                (например, базу данных экземпляра бота); буферы разных источников не смешиваются
+        """
+        self.policies = list(policies)
+        self.loader = loader
+        self.max_users = max_users
+        self.scope = scope
+        self.depth = max((policy.limit for policy in self.policies), default=0)
+        self._recent: "OrderedDict[Hashable, Deque[int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, user_id: int) -> Hashable:
+        return (self.scope(), user_id) if self.scope else user_id
+
+    async def _get_ring(self, user_id: int) -> Deque[int]:
+        key = self._key(user_id)
+        ring = self._recent.get(key)
+        if ring is not None:
+            self.hits += 1
+            self._recent.move_to_end(key)
+            return ring
+
+        self.misses += 1
+        times = await self.loader(user_id, self.depth)
+        # Пока шел запрос, буфер мог заполнить параллельный вызов
+        ring = self._recent.get(key)
+        if ring is None:
+            ring = self._recent[key] = deque(times, maxlen=self.depth)
+            if len(self._recent) > self.max_users:
+                self._recent.popitem(last=False)
+        return ring
+
+    async def allows(self, user_id: int, now: Optional[int] = None) -> bool:
+        """
+        Проверяет, может ли пользователь сделать еще одну отправку.
+
+        Args:
+            user_id (int): ID пользователя
+            now (int, optional): Текущее время в секундах с начала эпохи
+
+        Returns:
+            bool: True если все политики разрешают отправку
+        """
+        if not self.depth:
+            return True
+        ring = await self._get_ring(user_id)
+        if now is None:
+            now = now_epoch()
+        for policy in self.policies:
+            if len(ring) >= policy.limit and ring[-policy.limit] >= policy.window_start(now):
+                return False
+        return True
+
+    def record(self, user_id: int, created_at: Optional[int] = None) -> None:
+        """
+        Учитывает новую отправку пользователя.
+        Если пользователя нет в памяти, ничего не делает: при следующей проверке
+        отправка будет прочитана из базы данных.
+
+        Args:
+            user_id (int): ID пользователя
+            created_at (int, optional): Время отправки в секундах с начала эпохи
+        """
+        ring = self._recent.get(self._key(user_id))
+        if ring is not None:
+            ring.append(now_epoch() if created_at is None else created_at)
+
+
+# Квота на отзывы пользователей
+review_quota = SubmissionQuota(
+    build_policies(REVIEW_QUOTAS), get_recent_review_times, QUOTA_CACHE_SIZE, scope=database_path.get
+)
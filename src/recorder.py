@@ -0,0 +1,212 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TextIO
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger('bot.recorder')
+
+# Поля с именами пользователей и чатов
+_NAME_FIELDS = {"first_name", "last_name", "username", "title"}
+# Поля с текстом, который пишет пользователь
+_TEXT_FIELDS = {"text", "caption"}
+# Объекты, поле id которых - ID пользователя или чата
+_ID_OBJECTS = {"from", "chat", "user", "sender_chat"}
+
+
+# =============================================
+# Удаление персональных данных
+# =============================================
+class Scrubber:
+    """
+    Заменяет персональные данные в обновлении, сохраняя его форму:
+    - ID пользователей и чатов заменяются псевдонимами (одинаковый ID - одинаковый псевдоним,
+      поэтому порядок обновлений одного пользователя сохраняется);
+    - имена заменяются псевдонимами;
+    - тексты заменяются строкой той же длины, команды ("/start") сохраняются.
+    """
+
+    def __init__(self, salt: Optional[str] = None) -> None:
+        """
+        Args:
+            salt (str, optional): Секрет для псевдонимов (None - случайный на время работы процесса)
+        """
+        self.salt = (salt or secrets.token_hex(16)).encode()
+
+    def pseudo_id(self, value: int) -> int:
+        digest = hashlib.blake2b(str(value).encode(), digest_size=6, key=self.salt).digest()
+        # Сохраняем знак: ID групп и каналов отрицательные
+        pseudo = int.from_bytes(digest, "big") or 1
+        return -pseudo if value < 0 else pseudo
+
+    def pseudo_name(self, value: str) -> str:
+        return "u" + hashlib.blake2b(value.encode(), digest_size=4, key=self.salt).hexdigest()
+
+    def scrub(self, data: Any, key: Optional[str] = None) -> Any:
+        """
+        Возвращает копию данных обновления без персональных данных.
+
+        Args:
+            data (Any): Обновление в виде словаря (Update.model_dump)
+            key (str, optional): Имя поля, в котором лежат данные
+
+        Returns:
+            Any: Данные с замененными ID, именами и текстами
+        """
+        if isinstance(data, dict):
+            result = {}
+            for field, value in data.items():
+                if field == "id" and key in _ID_OBJECTS and isinstance(value, int):
+                    result[field] = self.pseudo_id(value)
+                elif field in _NAME_FIELDS and isinstance(value, str):
+                    result[field] = self.pseudo_name(value)
+                elif field in _TEXT_FIELDS and isinstance(value, str):
+                    result[field] = value if value.startswith("/") else "x" * len(value)
+                elif field == "entities" or field == "caption_entities":
+                    # Смещения сущностей остаются верными, содержимое ссылок удаляем
+                    result[field] = [{"type": entity.get("type"), "offset": entity.get("offset"),
+                                      "length": entity.get("length")} for entity in value]
+                elif field == "contact" or field == "location":
+                    continue
+                else:
+                    result[field] = self.scrub(value, field)
+            return result
+        if isinstance(data, list):
+            return [self.scrub(item, key) for item in data]
+        return data
+
+
+# =============================================
+# Middleware записи обновлений
+# =============================================
+class UpdateRecorder(BaseMiddleware):
+    """
+    Внешний middleware для обновлений: дописывает каждое входящее обновление
+    в журнал JSONL (одна строка - {"t": время получения, "update": обновление}).
+    Журнал с расширением .gz сжимается. Записанный журнал воспроизводится
+    через bench/replay.py.
+
+    Как и TraceExporter, сериализация, удаление персональных данных и запись
+    выполняются отдельным потоком, чтобы не блокировать цикл событий.
+    Если очередь переполнена, обновление в журнал не попадает.
+    """
+
+    # Признак остановки потока записи
+    _STOP = object()
+
+    def __init__(
+        self,
+        path: str,
+        scrub: bool = True,
+        salt: Optional[str] = None,
+        queue_size: int = 10000
+    ) -> None:
+        """
+        Args:
+            path (str): Файл журнала (дописывается)
+            scrub (bool): Удалять ли персональные данные перед записью
+            salt (str, optional): Секрет для псевдонимов ID и имен
+            queue_size (int): Сколько обновлений может ждать записи
+        """
+        self.path = path
+        self.scrubber = Scrubber(salt) if scrub else None
+        self.recorded = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, update: Update) -> None:
+        """
+        Ставит обновление в очередь на запись. Поток записи запускается при первом вызове.
+
+        Args:
+            update (Update): Входящее обновление
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="update-recorder", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((round(time.time(), 3), update))
+        except queue.Full:
+            self.dropped += 1
+
+    def _line(self, received: float, update: Update) -> str:
+        data = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+        if self.scrubber is not None:
+            data = self.scrubber.scrub(data)
+        return json.dumps({"t": received, "update": data}, ensure_ascii=False) + "\n"
+
+    def _run(self) -> None:
+        file: Optional[TextIO] = None
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is self._STOP:
+                batch.pop()
+                stopped = True
+            if not batch:
+                continue
+            try:
+                if file is None:
+                    opener = gzip.open if self.path.endswith(".gz") else open
+                    file = opener(self.path, "at", encoding="utf-8")
+                # Файл буферизован: запись на диск происходит блоками, а не на каждое обновление
+                file.write("".join(self._line(received, update) for received, update in batch))
+                self.recorded += len(batch)
+            except Exception as e:
+                # Поток записи не должен завершаться из-за одного неудачного пакета
+                self.dropped += len(batch)
+                logger.warning(f"Не удалось записать обновления ({len(batch)} шт.): {e}")
+        if file is not None:
+            file.close()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.record(event)
+        return await handler(event, data)
+
+    def close(self) -> None:
+        """Дописывает обновления из очереди, останавливает поток записи и закрывает журнал"""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Читает журнал, записанный UpdateRecorder.
+
+    Args:
+        path (str): Файл журнала (.jsonl или .jsonl.gz)
+
+    Returns:
+        Iterator[Dict[str, Any]]: Записи {"t": время получения, "update": обновление}
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
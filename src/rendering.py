@@ -0,0 +1,179 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple, Union
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.admin.admin_messages import (
+    ADMIN_HISTORY_QUESTION_TEMPLATE,
+    ADMIN_HISTORY_REVIEW_TEMPLATE,
+    ADMIN_HISTORY_STATUS_WITH_ANSWER,
+    ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
+)
+from src.config import RENDER_CACHE_SIZE
+from src.database import Question, Review, database_path
+from src.formatting import format_datetime
+from src.messages import (
+    ADMIN_RESPONSE_FORMAT,
+    QUESTION_ANSWER_NOTIFICATION_HEADER,
+    QUESTION_FORMAT,
+    REVIEW_ANSWER_NOTIFICATION_HEADER,
+    REVIEW_FORMAT,
+    REVIEW_TEXT_FORMAT
+)
+
+# =============================================
+# Варианты отображения карточек
+# =============================================
+LAYOUT_USER = "user"            # История пользователя
+LAYOUT_ADMIN = "admin"          # Панель и уведомления администратора
+LAYOUT_ANSWER = "answer"        # Уведомление пользователя об ответе
+
+# Заранее связанные методы форматирования шаблонов
+_format_review = REVIEW_FORMAT.format
+_format_question = QUESTION_FORMAT.format
+_format_admin_review = ADMIN_HISTORY_REVIEW_TEMPLATE.format
+_format_admin_question = ADMIN_HISTORY_QUESTION_TEMPLATE.format
+_format_review_text = REVIEW_TEXT_FORMAT.format
+_format_admin_response = ADMIN_RESPONSE_FORMAT.format
+_format_review_header = REVIEW_ANSWER_NOTIFICATION_HEADER.format
+_format_question_header = QUESTION_ANSWER_NOTIFICATION_HEADER.format
+
+# Строки со звездами для оценок от 0 до 5
+_STARS = tuple("⭐" * rating for rating in range(6))
+
+
+# =============================================
+# Построение карточек
+# =============================================
+def _stars(rating: int) -> str:
+    return _STARS[rating] if 0 <= rating < len(_STARS) else "⭐" * rating
+
+
+def _render_review(review: Review, layout: str) -> str:
+    review_text = _format_review_text(review.review_text) if review.review_text else ""
+    admin_response = review.admin_response
+    admin_response_text = _format_admin_response(admin_response) if admin_response else ""
+    date = format_datetime(review.created_at)
+
+    if layout == LAYOUT_ADMIN:
+        return _format_admin_review(
+            review_id=review.review_id,
+            username=review.username,
+            status=ADMIN_HISTORY_STATUS_WITH_ANSWER if admin_response else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER,
+            date=date,
+            rating=_stars(review.rating),
+            review_text=review_text,
+            admin_response=admin_response_text
+        )
+
+    card = _format_review(
+        date=date,
+        rating=_stars(review.rating),
+        review_text=review_text,
+        admin_response=admin_response_text
+    )
+    if layout == LAYOUT_ANSWER:
+        return _format_review_header(review_id=review.review_id) + card
+    return card
+
+
+def _render_question(question: Question, layout: str) -> str:
+    admin_response = question.admin_response
+    admin_response_text = _format_admin_response(admin_response) if admin_response else ""
+    date = format_datetime(question.created_at)
+
+    if layout == LAYOUT_ADMIN:
+        return _format_admin_question(
+            question_id=question.question_id,
+            username=question.username,
+            status=ADMIN_HISTORY_STATUS_WITH_ANSWER if admin_response else ADMIN_HISTORY_STATUS_WITHOUT_ANSWER,
+            date=date,
+            question_text=question.question_text,
+            admin_response=admin_response_text
+        )
+
+    card = _format_question(
+        date=date,
+        question_text=question.question_text,
+        admin_response=admin_response_text
+    )
+    if layout == LAYOUT_ANSWER:
+        return _format_question_header(question_id=question.question_id) + card
+    return card
+
+
+_RENDERERS: Dict[str, Callable[[Union[Review, Question], str], str]] = {
+    "reviews": _render_review,
+    "questions": _render_question,
+}
+
+
+# =============================================
+# Кэш отрисованных карточек
+# =============================================
+class CardCache:
+    """
+    LRU-кэш готовых текстов карточек.
+    Ключ - (база данных, тип, вариант отображения, ID, версия). Отзывы и вопросы
+    не меняются после создания, кроме однократного ответа администратора, поэтому
+    версия - это признак наличия ответа (0 или 1). База данных входит в ключ,
+    потому что ID разных экземпляров бота в одном процессе совпадают.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Args:
+            max_size (int): Сколько карточек хранить одновременно
+        """
+        self.max_size = max_size
+        self._cards: "OrderedDict[Tuple[str, str, str, int, int], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, layout: str, item: Union[Review, Question]) -> str:
+        """
+        Возвращает текст карточки, форматируя ее только при первом обращении.
+
+        Args:
+            layout (str): Вариант отображения (LAYOUT_USER, LAYOUT_ADMIN, LAYOUT_ANSWER)
+            item (Union[Review, Question]): Отзыв или вопрос из базы данных
+
+        Returns:
+            str: Текст карточки
+        """
+        history_type = item.history_type
+        key = (database_path.get(), history_type, layout, item.item_id, 1 if item.admin_response else 0)
+        card = self._cards.get(key)
+        if card is not None:
+            self.hits += 1
+            self._cards.move_to_end(key)
+            return card
+
+        self.misses += 1
+        card = _RENDERERS[history_type](item, layout)
+        self._cards[key] = card
+        if len(self._cards) > self.max_size:
+            self._cards.popitem(last=False)
+        return card
+
+
+# Общий кэш карточек
+card_cache = CardCache(RENDER_CACHE_SIZE)
+
+
+def render_card(layout: str, item: Union[Review, Question]) -> str:
+    """
+    Форматирует карточку отзыва или вопроса с использованием общего кэша.
+
+    Args:
+        layout (str): Вариант отображения (LAYOUT_USER, LAYOUT_ADMIN, LAYOUT_ANSWER)
+        item (Union[Review, Question]): Отзыв или вопрос из базы данных
+
+    Returns:
+        str: Текст карточки
+    """
+    return card_cache.render(layout, item)
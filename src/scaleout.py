@@ -0,0 +1,390 @@
+"""
+Работа бота в нескольких процессах.
+
+Процесс приема получает обновления от Telegram (опрос getUpdates) и распределяет
+их по процессам-обработчикам через очереди multiprocessing: обновления одного
+пользователя всегда попадают в один и тот же процесс, поэтому порядок их обработки
+сохраняется, а очереди пользователя и защита от флуда остаются в памяти этого процесса.
+Обработчики выполняют обычные обработчики бота (create_app) и работают с общей
+базой данных SQLite в режиме WAL; в ней же хранятся состояния FSM (SQLiteStorage).
+
+Запуск:
+    WORKER_PROCESSES=4 python -m src.scaleout
+"""
+
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from dataclasses import replace
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Chat, TelegramObject, Update, User
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.app import App, create_apps, create_session, load_configs, register_metrics
+from src.config import (
+    LOG_DATE_FORMAT,
+    LOG_FILE,
+    LOG_FILE_BACKUP_COUNT,
+    LOG_FILE_MAX_BYTES,
+    LOG_FORMAT,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLING,
+    LOOP_BLOCK_THRESHOLD_MS,
+    LOOP_LAG_INTERVAL,
+    MAX_PENDING_UPDATES,
+    METRICS_HOST,
+    METRICS_PORT,
+    TELEGRAM_API_SERVER,
+    WORKER_PROCESSES,
+    WORKER_QUEUE_SIZE
+)
+from src.database import database_path, init_db, super_admin_id
+from src.edit_cache import edit_cache
+from src.handlers import create_router
+from src.locks import BoundedTaskSet
+from src.log_pipeline import LogPipeline, setup_logging
+from src.message_tracker import message_tracker
+from src.metrics import UPDATES_FORWARDED, CallbackMetric, start_metrics_server
+from src.recorder import UpdateRecorder
+from src.watchdog import LoopWatchdog
+
+logger = logging.getLogger('bot.scaleout')
+
+# Сколько обновлений обработчик забирает из очереди за одно обращение
+_BATCH_SIZE = 100
+
+# Элемент очереди: (ID бота, обновление в JSON) или None - сигнал остановки
+QueueItem = Optional[Tuple[int, str]]
+
+
+def _setup_process_logging(log_file: Optional[str]) -> LogPipeline:
+    """
+    Настраивает логирование процесса так же, как main.py.
+
+    Args:
+        log_file (str, optional): Файл лога процесса (у каждого процесса свой:
+            ротация одного файла из нескольких процессов его портит)
+
+    Returns:
+        LogPipeline: Конвейер логирования процесса
+    """
+    log_pipeline = setup_logging(
+        LOG_LEVEL,
+        LOG_FORMAT,
+        LOG_DATE_FORMAT,
+        json_format=LOG_JSON,
+        log_file=log_file,
+        max_bytes=LOG_FILE_MAX_BYTES,
+        backup_count=LOG_FILE_BACKUP_COUNT,
+        queue_size=LOG_QUEUE_SIZE,
+        sampling=LOG_SAMPLING
+    )
+    logging.getLogger('aiogram').setLevel(logging.WARNING)
+    logging.getLogger('aiohttp').setLevel(logging.WARNING)
+    return log_pipeline
+
+
+def _worker_log_file(index: int) -> Optional[str]:
+    if not LOG_FILE:
+        return None
+    root, extension = os.path.splitext(LOG_FILE)
+    return f"{root}.worker{index}{extension}"
+
+
+# =============================================
+# Процесс-обработчик
+# =============================================
+def _get_batch(updates: "multiprocessing.Queue[QueueItem]") -> List[QueueItem]:
+    """Ждет хотя бы одно обновление и забирает из очереди все готовые (не больше _BATCH_SIZE)"""
+    batch = [updates.get()]
+    while batch[-1] is not None and len(batch) < _BATCH_SIZE:
+        try:
+            batch.append(updates.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+async def _process(app: App, update: Update) -> None:
+    try:
+        await app.dp.feed_update(app.bot, update)
+    except Exception as e:
+        logger.error(f"Ошибка при обработке обновления {update.update_id}: {e}", exc_info=True)
+
+
+def _owns_chat(index: int, workers: int, chat_id: int) -> bool:
+    """Обслуживает ли обработчик чат: личный чат совпадает с ID пользователя (см. shard_for)"""
+    return chat_id % workers == index
+
+
+async def _serve_worker(
+    index: int,
+    workers: int,
+    updates: "multiprocessing.Queue[QueueItem]",
+    log_pipeline: LogPipeline
+) -> None:
+    # Сообщения в чатах других обработчиков учитываются в базе данных (src/message_tracker.py),
+    # а отпечатки их содержимого не хранятся (src/edit_cache.py)
+    message_tracker.owns_chat = edit_cache.owns_chat = partial(_owns_chat, index, workers)
+
+    # Журнал обновлений ведет процесс приема. Состояния FSM хранятся в базе данных:
+    # они переживают перезапуск обработчика и не зависят от распределения обновлений
+    apps = create_apps([replace(config, record_path=None) for config in load_configs()], persistent_states=True)
+    apps_by_bot: Dict[int, App] = {app.bot.id: app for app in apps}
+    register_metrics(apps, log_pipeline)
+
+    watchdog = LoopWatchdog(LOOP_LAG_INTERVAL, LOOP_BLOCK_THRESHOLD_MS)
+    watchdog.start()
+    metrics_server = None
+    if METRICS_PORT:
+        port = METRICS_PORT + 1 + index
+        metrics_server = await start_metrics_server(METRICS_HOST, port)
+        logger.info(f"Метрики обработчика {index} доступны на http://{METRICS_HOST}:{port}/metrics")
+
+    loop = asyncio.get_running_loop()
+    # Когда обрабатывается MAX_PENDING_UPDATES обновлений, обработчик перестает забирать
+    # новые из очереди: очередь заполняется, и процесс приема приостанавливает опрос
+    tasks = BoundedTaskSet(MAX_PENDING_UPDATES)
+    running = True
+    while running:
+        # Очередь multiprocessing блокирующая, поэтому ждем ее в отдельном потоке
+        for item in await loop.run_in_executor(None, _get_batch, updates):
+            if item is None:
+                running = False
+                break
+            bot_id, raw_update = item
+            app = apps_by_bot[bot_id]
+            update = Update.model_validate_json(raw_update, context={"bot": app.bot})
+            # Задачи создаются в порядке поступления: очередь пользователя
+            # в SchedulerMiddleware сохраняет этот порядок
+            await tasks.spawn(_process(app, update))
+
+    # Дорабатываем полученные обновления и останавливаемся
+    await tasks.wait()
+    await watchdog.stop()
+    if metrics_server is not None:
+        await metrics_server.cleanup()
+    for app in apps:
+        await app.close()
+
+
+def worker_main(index: int, workers: int, updates: "multiprocessing.Queue[QueueItem]") -> None:
+    """
+    Точка входа процесса-обработчика.
+
+    Args:
+        index (int): Номер обработчика
+        workers (int): Число обработчиков
+        updates (multiprocessing.Queue): Очередь обновлений этого обработчика
+    """
+    # Ctrl+C и SIGTERM получает вся группа процессов; обработчик останавливается
+    # по сигналу из очереди, когда процесс приема перестал получать обновления
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    log_pipeline = _setup_process_logging(_worker_log_file(index))
+    try:
+        asyncio.run(_serve_worker(index, workers, updates, log_pipeline))
+    finally:
+        log_pipeline.stop()
+
+
+# =============================================
+# Процесс приема
+# =============================================
+def shard_for(user: Optional[User], chat: Optional[Chat], workers: int) -> int:
+    """
+    Выбирает обработчик для обновления.
+
+    Args:
+        user (User, optional): Пользователь, от которого пришло обновление
+        chat (Chat, optional): Чат обновления (для обновлений без пользователя)
+        workers (int): Число обработчиков
+
+    Returns:
+        int: Номер обработчика
+    """
+    if user is not None:
+        return user.id % workers
+    if chat is not None:
+        return chat.id % workers
+    return 0
+
+
+class UpdateDistributor(BaseMiddleware):
+    """
+    Внешний middleware для обновлений процесса приема: вместо обработки
+    кладет обновление в очередь обработчика, выбранного по ID пользователя.
+    Если очередь переполнена, ждет ее освобождения: опрос Telegram
+    при этом приостанавливается, и обновления не теряются.
+    """
+
+    def __init__(
+        self,
+        queues: List["multiprocessing.Queue[QueueItem]"],
+        recorders: Dict[int, UpdateRecorder]
+    ) -> None:
+        """
+        Args:
+            queues (List[multiprocessing.Queue]): Очереди обработчиков
+            recorders (Dict[int, UpdateRecorder]): ID бота -> журнал его обновлений
+        """
+        self.queues = queues
+        self.recorders = recorders
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        bot: Bot = data["bot"]
+        recorder = self.recorders.get(bot.id)
+        if recorder is not None:
+            recorder.record(event)
+
+        worker = shard_for(data.get("event_from_user"), data.get("event_chat"), len(self.queues))
+        item = (bot.id, event.model_dump_json(exclude_none=True, by_alias=True))
+        while True:
+            try:
+                self.queues[worker].put_nowait(item)
+                break
+            except queue.Full:
+                await asyncio.sleep(0.01)
+        UPDATES_FORWARDED.inc(str(worker))
+        return None
+
+
+def _queue_size(updates: "multiprocessing.Queue[QueueItem]") -> int:
+    try:
+        return updates.qsize()
+    except NotImplementedError:
+        # qsize не поддерживается в macOS
+        return -1
+
+
+class Ingress:
+    """Процесс приема: запускает обработчики, получает обновления и распределяет их"""
+
+    def __init__(self, workers: int) -> None:
+        """
+        Args:
+            workers (int): Число процессов-обработчиков
+        """
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+        self.processes: List[Any] = [None] * workers
+        self.stopping = False
+
+    def _start_worker(self, index: int) -> None:
+        process = self.context.Process(
+            target=worker_main,
+            args=(index, len(self.queues), self.queues[index]),
+            name=f"worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self.processes[index] = process
+
+    async def _supervise(self) -> None:
+        """Перезапускает обработчики, завершившиеся с ошибкой: их очередь не должна переполниться"""
+        while not self.stopping:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self.processes):
+                if not self.stopping and not process.is_alive():
+                    logger.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапускаем")
+                    self._start_worker(index)
+
+    async def run(self) -> None:
+        configs = load_configs()
+
+        # Базы данных создаются здесь один раз, а не каждым обработчиком
+        for config in configs:
+            path_token = database_path.set(config.database_path)
+            admin_token = super_admin_id.set(config.super_admin_id)
+            try:
+                await init_db()
+            finally:
+                super_admin_id.reset(admin_token)
+                database_path.reset(path_token)
+        logger.info(f"Базы данных успешно инициализированы (ботов: {len(configs)})")
+
+        for index in range(len(self.queues)):
+            self._start_worker(index)
+        CallbackMetric(
+            "bot_worker_queue_size", "Обновления в очереди обработчика",
+            lambda: {(str(index),): _queue_size(updates) for index, updates in enumerate(self.queues)},
+            labelnames=("worker",)
+        )
+
+        session = create_session(TELEGRAM_API_SERVER)
+        bots = [Bot(token=config.token, session=session) for config in configs]
+        recorders = {
+            bot.id: UpdateRecorder(config.record_path, config.record_scrub, config.record_salt)
+            for bot, config in zip(bots, configs) if config.record_path
+        }
+        dp = Dispatcher()
+        dp.update.outer_middleware(UpdateDistributor(self.queues, recorders))
+
+        # Запрашиваем у Telegram только те типы обновлений, которые обрабатывают обработчики
+        handlers = Dispatcher()
+        handlers.include_router(create_router())
+        allowed_updates = handlers.resolve_used_update_types()
+
+        supervisor = asyncio.create_task(self._supervise())
+        try:
+            logger.info(f"Бот запущен: обработчиков {len(self.queues)}")
+            # Обновления кладутся в очереди по одному в порядке получения
+            await dp.start_polling(*bots, handle_as_tasks=False, allowed_updates=allowed_updates)
+        finally:
+            self.stopping = True
+            supervisor.cancel()
+            for updates in self.queues:
+                updates.put(None)
+            for process in self.processes:
+                await asyncio.get_running_loop().run_in_executor(None, process.join)
+            for recorder in recorders.values():
+                recorder.close()
+            logger.info("Бот остановлен")
+
+
+async def _run_ingress() -> None:
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        logger.info(f"Метрики процесса приема доступны на http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    try:
+        await Ingress(max(1, WORKER_PROCESSES)).run()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+
+def main() -> None:
+    log_pipeline = _setup_process_logging(LOG_FILE)
+    try:
+        asyncio.run(_run_ingress())
+    except Exception as e:
+        logger.error(f"Произошла ошибка: {e}", exc_info=True)
+    finally:
+        log_pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+# =============================================
+# Сторонние библиотеки
+# =============================================
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger('bot.trace')
+
+
+# =============================================
+# Контекст обработки обновления
+# =============================================
+class Trace:
+    """
+    Трассировка одного обновления: ID обновления и список интервалов (span)
+    с временем работы обработчиков, запросов к базе данных и к Bot API.
+    """
+
+    # Сколько интервалов хранить в одной трассировке
+    MAX_SPANS = 500
+
+    def __init__(self, update_id: int) -> None:
+        """
+        Args:
+            update_id (int): ID обновления Telegram
+        """
+        self.update_id = update_id
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+
+    def add_span(self, name: str, started: float, finished: float, attrs: Dict[str, Any]) -> None:
+        """
+        Добавляет завершенный интервал.
+
+        Args:
+            name (str): Название интервала (например, "db.get_user")
+            started (float): Начало по time.perf_counter()
+            finished (float): Конец по time.perf_counter()
+            attrs (Dict[str, Any]): Дополнительные атрибуты
+        """
+        if len(self.spans) >= self.MAX_SPANS:
+            self.dropped += 1
+            return
+        span = {
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round((finished - started) * 1000, 3),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            "update_id": self.update_id,
+            "started_at": self.wall_started,
+            "duration_ms": round(duration * 1000, 3),
+            "spans": self.spans,
+            "dropped_spans": self.dropped,
+        }
+
+
+# Трассировка обновления, которое обрабатывается в текущей задаче
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_update_id() -> Optional[int]:
+    """
+    Возвращает ID обновления, которое обрабатывается в текущей задаче.
+
+    Returns:
+        int: ID обновления или None вне обработки обновления
+    """
+    trace = current_trace.get()
+    return trace.update_id if trace else None
+
+
+def record_span(name: str, started: float, **attrs: Any) -> None:
+    """
+    Записывает интервал, который начался в `started` и закончился сейчас.
+    Вне обработки обновления ничего не делает.
+
+    Args:
+        name (str): Название интервала
+        started (float): Начало по time.perf_counter()
+        **attrs: Дополнительные атрибуты интервала
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_span(name, started, time.perf_counter(), attrs)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """
+    Записывает интервал на время блока `with`.
+
+    Args:
+        name (str): Название интервала
+        **attrs: Дополнительные атрибуты интервала
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, started, **attrs)
+
+
+class UpdateContextFilter(logging.Filter):
+    """
+    Фильтр для обработчиков логов: добавляет в каждую запись поле update_id
+    (ID обрабатываемого обновления или "-"), чтобы строки лога одного
+    нажатия можно было собрать вместе.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "update_id"):
+            update_id = current_update_id()
+            record.update_id = update_id if update_id is not None else "-"
+        return True
+
+
+# =============================================
+# Выгрузка трассировок
+# =============================================
+class TraceExporter:
+    """
+    Дописывает трассировки в файл построчно в формате JSON отдельным потоком,
+    чтобы сериализация и запись на диск не блокировали цикл событий.
+    Поток забирает из очереди все накопившиеся трассировки и дописывает их
+    одним вызовом write в файл, открытый на дозапись (O_APPEND): строки
+    не перемешиваются, даже если в файл пишут несколько процессов.
+    Если очередь переполнена, трассировка отбрасывается.
+    """
+
+    # Признак остановки потока записи
+    _STOP = object()
+
+    def __init__(self, path: str, queue_size: int = 10000) -> None:
+        """
+        Args:
+            path (str): Файл для выгрузки трассировок (дописывается)
+            queue_size (int): Сколько трассировок может ждать записи
+        """
+        self.path = path
+        self.exported = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        """
+        Ставит трассировку в очередь на запись. Поток записи запускается при первом вызове.
+
+        Args:
+            trace (Dict[str, Any]): Трассировка (Trace.to_dict)
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        fd = None
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is self._STOP:
+                batch.pop()
+                stopped = True
+            if not batch:
+                continue
+            data = "".join(json.dumps(trace, ensure_ascii=False) + "\n" for trace in batch).encode("utf-8")
+            try:
+                if fd is None:
+                    fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                os.write(fd, data)
+                self.exported += len(batch)
+            except OSError as e:
+                self.dropped += len(batch)
+                logger.warning(f"Не удалось выгрузить трассировки ({len(batch)} шт.): {e}")
+        if fd is not None:
+            os.close(fd)
+
+    def close(self) -> None:
+        """Дописывает трассировки из очереди и останавливает поток записи"""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+
+# =============================================
+# Middleware трассировки
+# =============================================
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для обновлений: открывает трассировку на время обработки
+    обновления. Регистрируется сразу после BackpressureMiddleware, чтобы
+    в трассировку попали остальные middleware (база данных, метрики, запись,
+    защита от флуда), ожидание в очереди и все обработчики. Ожидание места
+    в BackpressureMiddleware в трассировку не входит.
+    Если задан TRACE_EXPORT_PATH, трассировки обновлений дольше
+    TRACE_EXPORT_MIN_MS выгружаются через TraceExporter.
+    """
+
+    def __init__(self, export_path: Optional[str] = None, min_duration_ms: float = 0) -> None:
+        """
+        Args:
+            export_path (str, optional): Файл для выгрузки трассировок (None - не выгружать)
+            min_duration_ms (float): Выгружать только обновления не короче этого времени
+        """
+        self.exporter = TraceExporter(export_path) if export_path else None
+        self.min_duration = min_duration_ms / 1000
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        trace = Trace(event.update_id)
+        token = current_trace.set(trace)
+        try:
+            return await handler(event, data)
+        finally:
+            current_trace.reset(token)
+            duration = time.perf_counter() - trace.started
+            if self.exporter and duration >= self.min_duration:
+                self.exporter.export(trace.to_dict(duration))
+
+    def close(self) -> None:
+        """Дописывает выгружаемые трассировки"""
+        if self.exporter:
+            self.exporter.close()
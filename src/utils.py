@@ -1,37 +1,52 @@
 # =============================================
 # Стандартные библиотеки Python
 # =============================================
-from asyncio.log import logger
 from datetime import datetime
 import logging
-from typing import Optional, List, Callable, Dict, Any, Union
+from typing import Optional, List, Callable, Any, Union
+from uuid import uuid4
 
 # =============================================
 # Сторонние библиотеки
 # =============================================
-from aiogram import types
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+from aiogram import Bot, types
+from aiogram.types import InlineKeyboardMarkup, Message
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-import aiosqlite
-from pytz import timezone
 
 # =============================================
 # Внутренние модули
 # =============================================
-from src.admin.admin_messages import ADMIN_HISTORY_QUESTION_TEMPLATE, ADMIN_HISTORY_REVIEW_TEMPLATE, ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
 from src.admin.admin_utils import show_admin_menu
 from src.config import (
-    DATABASE_PATH,
     LOG_MESSAGE_DELETE_ERROR,
     LOG_MESSAGE_EDIT_ERROR,
-    LOG_DB_ERROR,
-    bot
+    LOG_DB_ERROR
 )
-from src.database import add_user, check_super_admin, get_questions_by_id, get_review_by_id, get_user, can_leave_review_today
-from src.keyboards import get_main_keyboard
+from src.database import (
+    Question, Review, add_user, check_super_admin, get_admin_ids,
+    get_questions_by_id, get_review_by_id, get_user, pop_tracked_messages
+)
+from src.keyboards import get_main_keyboard, get_notification_keyboard
+from src.edit_cache import edit_cache
+from src.formatting import LOCAL_TZ
+from src.locks import KeyedLock
+from src.message_tracker import message_tracker
 from src.messages import *
-from src.formatting import format_datetime
+from src.quota import review_quota
+from src.rendering import LAYOUT_USER, LAYOUT_ADMIN, render_card
+
+# Блокировки на время создания отзыва или вопроса пользователем.
+# Вместе с ключом отправки не дают записать одно обращение дважды.
+submission_locks = KeyedLock()
+
+# Максимальное число сообщений в одном запросе deleteMessages
+DELETE_MESSAGES_BATCH = 100
+
+logger = logging.getLogger('bot')
+# Неудачные удаления и редактирования сообщений случаются часто,
+# поэтому пишутся в отдельный логгер, который можно прореживать (LOG_SAMPLING)
+messages_logger = logging.getLogger('bot.messages')
 
 
 # =============================================
@@ -48,7 +63,7 @@ async def handle_main_menu(message: Union[types.Message, types.CallbackQuery], i
     """
     # Очищаем последние сообщения только для команды start
     if is_start:
-        await delete_last_messages(message.chat.id, message.message_id)
+        await delete_last_messages(message.bot, message.chat.id, message.message_id)
         
         # Проверяем существование пользователя и регистрируем если его нет
         user = await get_user(message.from_user.id)
@@ -61,8 +76,7 @@ async def handle_main_menu(message: Union[types.Message, types.CallbackQuery], i
             return
 
     # Определяем текущее время суток для персонализированного приветствия
-    tyumen_tz = timezone('Asia/Yekaterinburg')
-    current_hour = datetime.now(tyumen_tz).hour
+    current_hour = datetime.now(LOCAL_TZ).hour
     
     # Выбираем подходящее приветствие в зависимости от времени суток
     greeting = (
@@ -86,32 +100,37 @@ async def handle_main_menu(message: Union[types.Message, types.CallbackQuery], i
 # =============================================
 # Управление сообщениями в чате
 # =============================================
-async def delete_last_messages(chat_id: int, message_id: int, count: int = 5) -> None:
+async def delete_last_messages(bot: Bot, chat_id: int, message_id: int) -> None:
     """
-    Удаляет последние сообщения в чате.
+    Удаляет последние сообщения бота в чате и сообщение пользователя.
     Используется для очистки истории сообщений после выполнения команд.
+    Удаляются только сообщения, которые бот действительно отправил
+    (их учитывает message_tracker, а в режиме нескольких процессов -
+    еще и база данных), одним запросом deleteMessages.
     
     Args:
+        bot (Bot): Бот, который обрабатывает обновление
         chat_id (int): ID чата, в котором нужно удалить сообщения
-        message_id (int): ID последнего сообщения, с которого начинается удаление
-        count (int): Количество сообщений для удаления (по умолчанию 5)
+        message_id (int): ID сообщения пользователя, которое тоже нужно удалить
     """
-    error_count = 0
-    current_message_id = message_id
+    message_ids = message_tracker.pop_all(bot.id, chat_id)
+    if message_tracker.sharded:
+        # Сообщения, которые отправили в этот чат другие процессы-обработчики
+        message_ids = sorted(set(message_ids).union(await pop_tracked_messages(bot.id, chat_id)))
+    if message_id not in message_ids:
+        message_ids.append(message_id)
     
-    # Пытаемся удалить сообщения, пока не достигнем лимита ошибок
-    while error_count < count:
+    # deleteMessages принимает не более 100 ID за один запрос
+    for start in range(0, len(message_ids), DELETE_MESSAGES_BATCH):
+        batch = message_ids[start:start + DELETE_MESSAGES_BATCH]
         try:
-            await bot.delete_message(chat_id=chat_id, message_id=current_message_id)
-            current_message_id -= 1
+            await bot.delete_messages(chat_id=chat_id, message_ids=batch)
         except Exception as e:
-            # Логируем ошибку удаления сообщения
-            logging.warning(LOG_MESSAGE_DELETE_ERROR.format(
-                message_id=current_message_id,
+            # Логируем ошибку удаления сообщений
+            messages_logger.warning(LOG_MESSAGE_DELETE_ERROR.format(
+                message_id=batch,
                 error=e
             ))
-            current_message_id -= 1
-            error_count += 1
 
 
 async def safe_edit_message(
@@ -122,18 +141,29 @@ async def safe_edit_message(
     """
     Безопасно редактирует сообщение с обработкой ошибок TelegramBadRequest.
     Используется для обновления сообщений без вызова исключений.
+    Если сообщение уже показывает тот же текст и клавиатуру (по данным edit_cache),
+    запрос к Telegram не отправляется.
     
     Args:
         message (Message): Сообщение для редактирования
         text (str): Новый текст сообщения
         reply_markup (InlineKeyboardMarkup, optional): Новая клавиатура
     """
+    key = (message.bot.id, message.chat.id, message.message_id)
+    fingerprint = edit_cache.fingerprint(text, reply_markup)
+    if edit_cache.is_current(key, fingerprint):
+        edit_cache.calls_saved += 1
+        return
+
+    edit_cache.calls_made += 1
     try:
         await message.edit_text(text, reply_markup=reply_markup)
     except TelegramBadRequest as e:
         # Игнорируем ошибку, если сообщение не было изменено
         if "message is not modified" not in str(e):
-            logging.warning(LOG_MESSAGE_EDIT_ERROR.format(error=e))
+            messages_logger.warning(LOG_MESSAGE_EDIT_ERROR.format(error=e))
+        else:
+            edit_cache.store(key, fingerprint)
 
 # =============================================
 # Проверки пользователей и прав доступа
@@ -150,7 +180,7 @@ async def check_user_ban(user_id: int) -> bool:
         bool: True если пользователь заблокирован, False если нет
     """
     user = await get_user(user_id)
-    return user and user[3]  # user[3] - это поле is_banned в базе данных
+    return bool(user and user.is_banned)
 
 
 async def check_review_limit(
@@ -159,8 +189,8 @@ async def check_review_limit(
     keyboard: InlineKeyboardMarkup
 ) -> bool:
     """
-    Проверяет, может ли пользователь оставить отзыв сегодня.
-    Ограничивает количество отзывов от одного пользователя в день.
+    Проверяет, может ли пользователь оставить отзыв.
+    Ограничивает количество отзывов от одного пользователя по квотам REVIEW_QUOTAS.
     
     Args:
         user_id (int): ID пользователя
@@ -170,7 +200,7 @@ async def check_review_limit(
     Returns:
         bool: True если пользователь может оставить отзыв, False если нет
     """
-    if not await can_leave_review_today(user_id):
+    if not await review_quota.allows(user_id):
         await safe_edit_message(
             message,
             REVIEW_LIMIT_TEXT,
@@ -197,7 +227,7 @@ async def check_admin_rights(message: Union[Message, types.CallbackQuery]) -> bo
     # Проверяем и обновляем права супер-администратора
     await check_super_admin()
     
-    if user and user[2] > 0:  # user[2] - это поле admin_rights в базе данных
+    if user and user.admin_level > 0:
         await show_admin_menu(message, user_id, message.from_user.is_bot)
         return True
     return False
@@ -217,7 +247,7 @@ async def check_user_rights(message: Union[Message, types.CallbackQuery]) -> boo
     user_id = message.chat.id if message.from_user.is_bot else message.from_user.id
     user = await get_user(user_id)
     
-    if user and user[2] < 1:  # user[2] - это поле admin_rights в базе данных
+    if user and user.admin_level < 1:
         await handle_main_menu(message, is_start=False)
         return True
     return False
@@ -225,13 +255,25 @@ async def check_user_rights(message: Union[Message, types.CallbackQuery]) -> boo
 # =============================================
 # Обработка пользовательского ввода
 # =============================================
+async def start_submission(state: FSMContext) -> None:
+    """
+    Выдает новый ключ отправки для создаваемого отзыва или вопроса.
+    Ключ сохраняется в состоянии FSM и передается в базу данных при записи:
+    повторная запись с тем же ключом игнорируется.
+
+    Args:
+        state (FSMContext): Контекст состояния FSM
+    """
+    await state.update_data(submission_key=uuid4().hex)
+
+
 async def handle_text_message(
     message: Message,
     state: Any,
     create_func: Callable,
     success_text: str,
     error_text: str,
-    user_ratings: Optional[Dict[int, int]] = None
+    with_rating: bool = False
 ) -> None:
     """
     Обрабатывает текстовые сообщения (отзывы и вопросы).
@@ -243,14 +285,13 @@ async def handle_text_message(
         create_func (Callable): Функция для создания записи в базе данных
         success_text (str): Текст успешного создания записи
         error_text (str): Текст ошибки при создании записи
-        user_ratings (Dict[int, int], optional): Словарь с рейтингами пользователей
+        with_rating (bool): True для отзыва: оценка берется из данных состояния FSM
     """
     # Получаем информацию о пользователе
     user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
     
     # Очищаем предыдущие сообщения
-    await delete_last_messages(message.chat.id, message.message_id)
+    await delete_last_messages(message.bot, message.chat.id, message.message_id)
     
     # Проверяем блокировку пользователя
     if await check_user_ban(user_id):
@@ -261,17 +302,51 @@ async def handle_text_message(
         await state.clear()
         return
 
+    async with submission_locks(user_id):
+        await _submit_text_message(
+            message, state, create_func, success_text, error_text, with_rating
+        )
+
+
+async def _submit_text_message(
+    message: Message,
+    state: Any,
+    create_func: Callable,
+    success_text: str,
+    error_text: str,
+    with_rating: bool
+) -> None:
+    """
+    Создает запись из текстового сообщения и уведомляет администраторов.
+    Вызывается под блокировкой пользователя из submission_locks.
+    """
+    user_id = message.from_user.id
+    username = message.from_user.username or message.from_user.first_name
+    data = await state.get_data()
+    submission_key = data.get("submission_key")
+
     try:
         # Создаем запись в базе данных
-        if user_ratings:
-            rating = user_ratings.get(user_id)
+        if with_rating:
+            rating = data.get("rating")
             if not rating:
                 await message.answer(error_text)
                 await state.clear()
                 return
-            item_id = await create_func(user_id, username, rating, message.text)
+            # Квота могла исчерпаться, пока пользователь писал текст отзыва
+            if not await review_quota.allows(user_id):
+                await message.answer(REVIEW_LIMIT_TEXT, reply_markup=get_main_keyboard())
+                await state.clear()
+                return
+            item_id = await create_func(user_id, username, rating, message.text, submission_key=submission_key)
         else:
-            item_id = await create_func(user_id, username, message.text)
+            item_id = await create_func(user_id, username, message.text, submission_key=submission_key)
+
+        # Запись с этим ключом уже создана: повторная доставка или двойная отправка
+        if item_id is None:
+            return
+        if with_rating:
+            review_quota.record(user_id)
             
         # Отправляем сообщение об успехе
         await message.answer(
@@ -280,117 +355,61 @@ async def handle_text_message(
         )
         
         # Определяем тип записи (отзыв или вопрос)
-        history_type = "reviews" if user_ratings else "questions"
+        history_type = "reviews" if with_rating else "questions"
         
-        # Получаем данные записи для уведомления
+        # Получаем данные записи и формируем текст уведомления
         if history_type == "reviews":
             item = await get_review_by_id(item_id)
-            status = ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-            item_text = f"\n\n💭 Отзыв: {item[4]}" if item[4] else ""
-            
-            # Формируем текст уведомления
-            notification_text = ADMIN_HISTORY_REVIEW_TEMPLATE.format(
-                review_id=item[0],
-                username=item[2],
-                status=status,
-                date=format_datetime(item[6]),
-                rating="⭐" * item[3],
-                review_text=item_text,
-                admin_response=""
-            )
         else:
             item = await get_questions_by_id(item_id)
-            status = ADMIN_HISTORY_STATUS_WITHOUT_ANSWER
-            
-            # Формируем текст уведомления
-            notification_text = ADMIN_HISTORY_QUESTION_TEMPLATE.format(
-                question_id=item[0],
-                username=item[2],
-                status=status,
-                date=format_datetime(item[5]),
-                question_text=f"{item[3]}",
-                admin_response=""
-            )
+        notification_text = render_card(LAYOUT_ADMIN, item)
         
         # Получаем всех администраторов и отправляем им уведомления
-        async with aiosqlite.connect(DATABASE_PATH) as db:
-            async with db.execute('SELECT user_id FROM users WHERE admin_level > 0') as cursor:
-                admins = await cursor.fetchall()
-                for admin in admins:
-                    try:
-                        # Создаем кнопку для удаления уведомления
-                        keyboard = InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [InlineKeyboardButton(text="✅ OK", callback_data="delete_notification")]
-                            ]
-                        )
-                        await bot.send_message(admin[0], notification_text, reply_markup=keyboard)
-                    except Exception as e:
-                        logger.error(f"Ошибка при отправке уведомления администратору: {e}")
-                        continue
+        for admin_id in await get_admin_ids():
+            try:
+                # Кнопка "OK" удаляет уведомление
+                await message.bot.send_message(admin_id, notification_text, reply_markup=get_notification_keyboard())
+            except Exception as e:
+                logger.error(f"Ошибка при отправке уведомления администратору: {e}")
+                continue
                         
     except Exception as e:
         # Логируем ошибку и отправляем сообщение пользователю
-        logging.error(LOG_DB_ERROR.format(error=e))
+        logger.error(LOG_DB_ERROR.format(error=e))
         await message.answer(error_text)
     finally:
-        # Очищаем состояние и удаляем рейтинг пользователя
+        # Очищаем состояние вместе с оценкой и ключом отправки
         await state.clear()
-        if user_ratings:
-            user_ratings.pop(user_id, None)
 
 # =============================================
 # Форматирование данных
 # =============================================
-def format_review(review: tuple) -> str:
+def format_review(review: Review) -> str:
     """
-    Форматирует отзыв для отображения.
+    Форматирует отзыв для отображения в истории пользователя.
     Создает читаемое представление отзыва с эмодзи и форматированием.
     
     Args:
-        review (tuple): Данные отзыва из базы данных
+        review (Review): Данные отзыва из базы данных
         
     Returns:
         str: Отформатированный текст отзыва с датой, рейтингом и текстом
     """
-    review_id, user_id, username, rating, review_text, admin_response, created_at = review
-
-    # Форматируем отзыв
-    review_text = f"\n\n💭 Отзыв: {review_text}" if review_text else ""
-    # Форматируем ответ администратора
-    admin_response_text = f"\n\n💬 Ответ администратора: {admin_response}" if admin_response else ""
-    
-    # Используем формат из messages.py
-    return REVIEW_FORMAT.format(
-        date=format_datetime(created_at),
-        rating="⭐" * rating,
-        review_text=review_text,
-        admin_response=admin_response_text
-    )
+    return render_card(LAYOUT_USER, review)
 
 
-def format_question(question: tuple) -> str:
+def format_question(question: Question) -> str:
     """
-    Форматирует вопрос для отображения.
+    Форматирует вопрос для отображения в истории пользователя.
     Создает читаемое представление вопроса с эмодзи и форматированием.
     
     Args:
-        question (tuple): Данные вопроса из базы данных
+        question (Question): Данные вопроса из базы данных
         
     Returns:
         str: Отформатированный текст вопроса с датой и текстом
     """
-    question_id, user_id, username, question_text, admin_response, created_at = question
-    
-    # Форматируем ответ администратора
-    admin_response_text = f"\n\n💬 Ответ администратора: {admin_response}" if admin_response else ""
-    
-    # Используем формат из messages.py
-    return QUESTION_FORMAT.format(
-        date=format_datetime(created_at),
-        question_text=question_text,
-        admin_response=admin_response_text
-    )
+    return render_card(LAYOUT_USER, question)
 
 # =============================================
 # Пагинация и навигация
@@ -0,0 +1,133 @@
+# =============================================
+# Стандартные библиотеки Python
+# =============================================
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+from typing import Optional
+
+# =============================================
+# Внутренние модули
+# =============================================
+from src.metrics import LOOP_LAG, LOOP_STALLS
+from src.tracing import Trace, TracingMiddleware
+
+logger = logging.getLogger('bot.watchdog')
+
+
+def _blocked_update_id(frame: Optional[FrameType]) -> Optional[int]:
+    """
+    Ищет в стеке потока цикла событий вызов TracingMiddleware
+    и возвращает ID обновления, которое он обрабатывает.
+
+    Args:
+        frame (FrameType): Текущий (самый вложенный) кадр стека
+
+    Returns:
+        int: ID обновления или None, если блокировка вне обработки обновления
+    """
+    tracing_code = TracingMiddleware.__call__.__code__
+    while frame is not None:
+        if frame.f_code is tracing_code:
+            trace = frame.f_locals.get("trace")
+            return trace.update_id if isinstance(trace, Trace) else None
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """
+    Контроль отзывчивости цикла событий.
+
+    - Задача в цикле событий просыпается каждые `interval` секунд и измеряет,
+      на сколько позже положенного она была запущена (задержка планирования).
+      Задержка записывается в метрику bot_event_loop_lag_seconds.
+    - Отдельный поток следит за отметками этой задачи. Если цикл событий не отвечает
+      дольше `block_threshold_ms`, поток снимает стек потока цикла событий
+      (sys._current_frames) и пишет его в лог: в стеке видны обработчик
+      или синхронный вызов, который блокирует цикл. Каждая блокировка
+      записывается в лог один раз.
+    """
+
+    def __init__(self, interval: float, block_threshold_ms: float) -> None:
+        """
+        Args:
+            interval (float): Период измерения задержки в секундах
+            block_threshold_ms (float): Порог блокировки в миллисекундах (0 - стек не снимать)
+        """
+        self.interval = interval
+        self.block_threshold = block_threshold_ms / 1000
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Запускает измерение задержки и поток контроля. Вызывается из работающего цикла событий."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure_lag(), name="loop-watchdog")
+        if self.block_threshold:
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    async def stop(self) -> None:
+        """Останавливает измерение задержки и поток контроля"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    async def _measure_lag(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self._heartbeat = now
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+            if self.block_threshold and lag >= self.block_threshold:
+                logger.warning(f"Цикл событий не отвечал {lag * 1000:.0f} мс")
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        poll = min(self.interval, self.block_threshold) / 2
+        while not self._stopped.wait(poll):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.block_threshold or heartbeat == reported_heartbeat:
+                continue
+            # Эта блокировка уже записана, если отметка с тех пор не обновлялась
+            reported_heartbeat = heartbeat
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            try:
+                stack = "".join(traceback.format_stack(frame))
+                update_id = _blocked_update_id(frame)
+            finally:
+                del frame
+
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            logger.warning(
+                f"Цикл событий заблокирован дольше {blocked * 1000:.0f} мс. "
+                f"Стек потока цикла событий:\n{stack}",
+                extra={"update_id": update_id if update_id is not None else "-"}
+            )
@@ -0,0 +1,21 @@
+# =============================================
+# Общие фикстуры тестов
+# =============================================
+import asyncio
+
+import pytest
+
+from src.database import database_path, init_db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    Временная база данных: путь задается через database_path на время теста,
+    поэтому все функции src/database.py работают с ней, а не с data/bot_database.db.
+    """
+    path = str(tmp_path / "bot_database.db")
+    token = database_path.set(path)
+    asyncio.run(init_db())
+    yield path
+    database_path.reset(token)
@@ -0,0 +1,70 @@
+# =============================================
+# Хранилище состояний FSM в базе данных
+# =============================================
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from src.admin.main_admin import display_admin_history, show_admin_history_page
+from src.database import add_review_response, add_user, create_review
+from src.fsm_storage import SQLiteStorage
+
+
+class _Message:
+    def __init__(self) -> None:
+        self.texts = []
+
+    async def edit_text(self, text, reply_markup=None):
+        self.texts.append(text)
+
+
+def test_concurrent_writes_are_all_committed(db_path):
+    async def write_concurrently():
+        storage = SQLiteStorage(db_path)
+        keys = [StorageKey(bot_id=1, chat_id=user_id, user_id=user_id) for user_id in range(50)]
+        await asyncio.gather(*(storage.set_data(key, {"page": key.user_id}) for key in keys))
+        db = await storage._connection()
+        async with db.execute('PRAGMA journal_mode') as cursor:
+            journal_mode = (await cursor.fetchone())[0]
+        await storage.close()
+
+        # Новое подключение видит только зафиксированные записи
+        reopened = SQLiteStorage(db_path)
+        pages = [(await reopened.get_data(key))["page"] for key in keys]
+        await reopened.close()
+        return journal_mode, pages
+
+    journal_mode, pages = asyncio.run(write_concurrently())
+
+    assert journal_mode == "wal"
+    assert pages == list(range(50))
+
+
+def test_admin_history_keeps_only_ids_in_state(db_path):
+    async def browse_history():
+        await add_user(100, "admin")
+        first = await create_review(1, "user", 5, "first review")
+        second = await create_review(2, "user", 4, "second review")
+        storage = SQLiteStorage(db_path)
+        state = FSMContext(storage, StorageKey(bot_id=1, chat_id=100, user_id=100))
+        await state.update_data(filter_type="all", history_type="reviews")
+        callback = SimpleNamespace(from_user=SimpleNamespace(id=100), message=_Message())
+
+        await display_admin_history(callback, state, "old")
+        data = await state.get_data()
+
+        # Ответ, добавленный после открытия истории, виден на следующей странице
+        await add_review_response(second, "thanks")
+        await state.update_data(current_page=1)
+        await show_admin_history_page(callback, state)
+        await storage.close()
+        return data, [first, second], callback.message.texts
+
+    data, ids, texts = asyncio.run(browse_history())
+
+    assert data["item_ids"] == ids
+    assert "items" not in data
+    assert "first review" in texts[0]
+    assert "second review" in texts[1] and "thanks" in texts[1]
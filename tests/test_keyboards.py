@@ -0,0 +1,37 @@
+# =============================================
+# Кэш клавиатур
+# =============================================
+from aiogram.types import InlineKeyboardButton
+
+from src.admin.admin_keyboards import get_admin_menu_keyboard
+from src.keyboards import get_main_keyboard, get_pagination_keyboard, keyboard_cache_info
+
+
+def test_changing_returned_markup_does_not_affect_next_call():
+    first = get_main_keyboard()
+    expected = first.model_dump_json()
+
+    first.inline_keyboard.append([InlineKeyboardButton(text="extra", callback_data="extra")])
+    first.inline_keyboard[0][0].text = "changed"
+    first.inline_keyboard[0].pop()
+
+    assert get_main_keyboard().model_dump_json() == expected
+
+
+def test_parameterized_and_admin_keyboards_are_copies():
+    first = get_pagination_keyboard(1, 5, "reviews", "all", "new")
+    expected = first.model_dump_json()
+    first.inline_keyboard.clear()
+    assert get_pagination_keyboard(1, 5, "reviews", "all", "new").model_dump_json() == expected
+
+    admin = get_admin_menu_keyboard(3)
+    expected = admin.model_dump_json()
+    admin.inline_keyboard[0][0].callback_data = "changed"
+    assert get_admin_menu_keyboard(3).model_dump_json() == expected
+
+
+def test_markup_is_still_cached():
+    get_main_keyboard()
+    hits = keyboard_cache_info()["get_main_keyboard"].hits
+    get_main_keyboard()
+    assert keyboard_cache_info()["get_main_keyboard"].hits == hits + 1
@@ -0,0 +1,56 @@
+# =============================================
+# Журнал входящих обновлений
+# =============================================
+import threading
+import time
+
+from aiogram.types import Update
+
+from src.recorder import UpdateRecorder, read_records
+
+
+def _update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Ivan"},
+            "text": "hello",
+        },
+    })
+
+
+def test_updates_are_written_by_background_thread(tmp_path):
+    path = str(tmp_path / "updates.jsonl.gz")
+    recorder = UpdateRecorder(path, salt="test")
+    for update_id in range(5):
+        recorder.record(_update(update_id))
+    recorder.close()
+
+    records = list(read_records(path))
+    assert [record["update"]["update_id"] for record in records] == list(range(5))
+    assert records[0]["update"]["message"]["text"] == "xxxxx"
+    assert records[0]["update"]["message"]["chat"]["id"] != 42
+    assert recorder.recorded == 5 and recorder.dropped == 0
+
+
+def test_updates_are_dropped_when_queue_is_full(tmp_path):
+    path = str(tmp_path / "updates.jsonl")
+    recorder = UpdateRecorder(path, scrub=False, queue_size=2)
+    # Останавливаем поток записи на первом обновлении, чтобы очередь заполнилась
+    release = threading.Event()
+    line = recorder._line
+    recorder._line = lambda received, update: release.wait() and line(received, update)
+
+    recorder.record(_update(0))
+    while not recorder._queue.empty():
+        time.sleep(0.001)
+    for update_id in range(1, 5):
+        recorder.record(_update(update_id))
+    release.set()
+    recorder.close()
+
+    assert recorder.dropped == 2
+    assert [record["update"]["update_id"] for record in read_records(path)] == [0, 1, 2]
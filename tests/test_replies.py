@@ -0,0 +1,83 @@
+# =============================================
+# Ответы администраторов на обращения
+# =============================================
+import asyncio
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from src.admin.main_admin import AdminHistoryStates, release_pending_reply
+from src.database import add_review_response, claim_reply, create_review, release_reply_claim
+
+
+def test_two_admins_claiming_same_item_get_one_winner(db_path):
+    async def claim_concurrently():
+        review_id = await create_review(1, "user", 5, "text")
+        return await asyncio.gather(
+            claim_reply("reviews", review_id, 100, 600),
+            claim_reply("reviews", review_id, 200, 600),
+        )
+
+    assert sorted(asyncio.run(claim_concurrently())) == [False, True]
+
+
+def test_claim_is_free_after_release(db_path):
+    async def claim_release_claim():
+        review_id = await create_review(1, "user", 5, "text")
+        first = await claim_reply("reviews", review_id, 100, 600)
+        await release_reply_claim("reviews", review_id, 100)
+        second = await claim_reply("reviews", review_id, 200, 600)
+        return first, second
+
+    assert asyncio.run(claim_release_claim()) == (True, True)
+
+
+def test_expired_claim_can_be_taken_over(db_path):
+    async def claim_after_expiry():
+        review_id = await create_review(1, "user", 5, "text")
+        await claim_reply("reviews", review_id, 100, -1)
+        return await claim_reply("reviews", review_id, 200, 600)
+
+    assert asyncio.run(claim_after_expiry()) is True
+
+
+def test_second_response_does_not_overwrite_first(db_path):
+    async def answer_concurrently():
+        review_id = await create_review(1, "user", 5, "text")
+        return await asyncio.gather(
+            add_review_response(review_id, "first"),
+            add_review_response(review_id, "second"),
+        )
+
+    assert sorted(asyncio.run(answer_concurrently())) == [False, True]
+
+
+def test_leaving_reply_state_releases_claim(db_path):
+    async def claim_and_leave():
+        review_id = await create_review(1, "user", 5, "text")
+        state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=100, user_id=100))
+        await claim_reply("reviews", review_id, 100, 600)
+        await state.set_state(AdminHistoryStates.waiting_for_reply)
+        await state.update_data(reply_item_id=review_id, reply_history_type="reviews")
+
+        # Администратор ушел в главное меню, не ответив
+        left = await release_pending_reply(state, 100)
+        return left, await state.get_state(), await claim_reply("reviews", review_id, 200, 600)
+
+    left, state_after, taken_over = asyncio.run(claim_and_leave())
+
+    assert left is True
+    assert state_after == AdminHistoryStates.viewing_history.state
+    assert taken_over is True
+
+
+def test_leaving_other_state_keeps_claims(db_path):
+    async def leave_without_reply():
+        review_id = await create_review(1, "user", 5, "text")
+        state = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=100, user_id=100))
+        await claim_reply("reviews", review_id, 100, 600)
+        await state.set_state(AdminHistoryStates.viewing_history)
+        return await release_pending_reply(state, 100), await claim_reply("reviews", review_id, 200, 600)
+
+    assert asyncio.run(leave_without_reply()) == (False, False)
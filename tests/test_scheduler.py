@@ -0,0 +1,122 @@
+# =============================================
+# Порядок обработки обновлений одного пользователя
+# =============================================
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Chat, Message, Update, User
+
+from src.locks import BoundedTaskSet
+from src.middlewares import BackpressureMiddleware, SchedulerMiddleware
+
+
+class Dialog(StatesGroup):
+    waiting = State()
+
+
+def _update(update_id: int, text: str) -> Update:
+    user = User(id=1, is_bot=False, first_name="user")
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=user,
+            text=text,
+        ),
+    )
+
+
+def _dispatcher(scheduler: SchedulerMiddleware, seen: list) -> Dispatcher:
+    router = Router()
+
+    @router.message(StateFilter(None), F.text == "start")
+    async def start(message: Message, state: FSMContext) -> None:
+        # Пока первое обновление обрабатывается, второе ждет в очереди пользователя
+        await asyncio.sleep(0.05)
+        await state.set_state(Dialog.waiting)
+        seen.append("start")
+
+    @router.message(StateFilter(Dialog.waiting))
+    async def waiting(message: Message) -> None:
+        seen.append("waiting")
+
+    @router.message()
+    async def fallback(message: Message) -> None:
+        seen.append("no state")
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(scheduler)
+    dp.include_router(router)
+    return dp
+
+
+def test_state_is_reread_after_queue_wait():
+    async def feed_both():
+        seen = []
+        dp = _dispatcher(SchedulerMiddleware(10), seen)
+        bot = Bot(token="123:abc")
+        await asyncio.gather(
+            dp.feed_update(bot, _update(1, "start")),
+            dp.feed_update(bot, _update(2, "reply")),
+        )
+        return seen
+
+    assert asyncio.run(feed_both()) == ["start", "waiting"]
+
+
+def test_counters_return_to_zero():
+    async def feed_many():
+        scheduler = SchedulerMiddleware(2)
+        dp = _dispatcher(scheduler, [])
+        bot = Bot(token="123:abc")
+        await asyncio.gather(*(dp.feed_update(bot, _update(i, "reply")) for i in range(10)))
+        return scheduler.pending, scheduler.in_flight
+
+    assert asyncio.run(feed_many()) == (0, 0)
+
+
+def test_polling_stalls_when_pending_limit_is_reached():
+    async def poll():
+        release = asyncio.Event()
+        handled = []
+        router = Router()
+
+        @router.message()
+        async def slow(message: Message) -> None:
+            await release.wait()
+            handled.append(message.message_id)
+
+        dp = Dispatcher()
+        dp.update.outer_middleware(BackpressureMiddleware())
+        dp.update.outer_middleware(SchedulerMiddleware(10))
+        dp.include_router(router)
+        bot = Bot(token="123:abc")
+        tasks = BoundedTaskSet(3)
+        fed = []
+
+        # Так обновления подает цикл опроса aiogram при handle_as_tasks=False
+        async def polling_loop():
+            for update_id in range(10):
+                await dp.feed_update(bot, _update(update_id, "text"), update_tasks=tasks)
+                fed.append(update_id)
+
+        poller = asyncio.create_task(polling_loop())
+        await asyncio.sleep(0.05)
+        stalled = (len(fed), len(tasks), poller.done())
+
+        release.set()
+        await poller
+        await tasks.wait()
+        return stalled, len(handled), len(tasks)
+
+    stalled, handled, left = asyncio.run(poll())
+
+    assert stalled == (3, 3, False)
+    assert handled == 10
+    assert left == 0
@@ -0,0 +1,63 @@
+# =============================================
+# Защита от повторной записи отзывов и вопросов
+# =============================================
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.database import create_question, create_review
+
+
+def _count(path: str, table: str) -> int:
+    with sqlite3.connect(path) as db:
+        return db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_concurrent_duplicate_reviews_insert_one_row(db_path):
+    async def submit_twice():
+        return await asyncio.gather(*(
+            create_review(1, "user", 5, "text", submission_key="key") for _ in range(10)
+        ))
+
+    results = asyncio.run(submit_twice())
+
+    assert len([review_id for review_id in results if review_id is not None]) == 1
+    assert _count(db_path, "reviews") == 1
+
+
+def test_concurrent_duplicate_questions_insert_one_row(db_path):
+    async def submit_twice():
+        return await asyncio.gather(*(
+            create_question(1, "user", "question?", submission_key="key") for _ in range(10)
+        ))
+
+    results = asyncio.run(submit_twice())
+
+    assert len([question_id for question_id in results if question_id is not None]) == 1
+    assert _count(db_path, "questions") == 1
+
+
+def test_submission_key_is_per_user(db_path):
+    async def submit():
+        return [
+            await create_review(1, "first", 5, submission_key="key"),
+            await create_review(2, "second", 4, submission_key="key"),
+        ]
+
+    assert None not in asyncio.run(submit())
+    assert _count(db_path, "reviews") == 2
+
+
+def test_review_without_key_gets_one(db_path):
+    asyncio.run(create_review(1, "user", 5))
+
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT submission_key FROM reviews").fetchone()[0] is not None
+
+
+def test_null_submission_key_is_rejected(db_path):
+    with sqlite3.connect(db_path) as db, pytest.raises(sqlite3.IntegrityError):
+        db.execute(
+            "INSERT INTO reviews (user_id, username, rating, created_at) VALUES (1, 'user', 5, 0)"
+        )